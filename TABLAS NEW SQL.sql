@@ -442,3 +442,6 @@ ALTER TABLE compromiso_eliminado
 ADD COLUMN id_origen INTEGER,
 ADD COLUMN id_area INTEGER;
 
+
+-- Los cambios posteriores al esquema son migraciones versionadas en migraciones/;
+-- después de crear la base con este script se aplican con: flask --app app migrar
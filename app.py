@@ -1,4 +1,5 @@
 import os
+from functools import wraps
 from flask import Flask, request, jsonify, render_template, redirect, url_for, session
 from flask_wtf import CSRFProtect
 from flask_bcrypt import Bcrypt
@@ -9,6 +10,9 @@ from flask_admin.menu import MenuLink
 from config import Config
 from routes import auth, home, reunion, director_bp, reunion_routes
 from repositories.reunion_service import ReunionService
+from repositories import (departamento_tree, report_analytics, report_cache, report_executor,
+                          reporte_diario_repository, reporte_snapshot_repository)
+import migraciones
 from models import (
     User, Departamento, Persona, Compromiso, Reunion, Staff, Area, Origen, 
     CompromisoEliminado, CompromisosArchivados, Invitados, CompromisoModificaciones,
@@ -17,7 +21,9 @@ from models import (
 )
 from extensions import db, login_manager  # Asegúrate de importar login_manager
 from routes.auth_routes import login_required, set_alert
-from database import get_db_connection
+from database import get_db_connection, get_pool, get_replica_pool
+import database
+from utils import prepared_statements, sql_instrumentation
 
 # Inicializar LoginManager
 login_manager = LoginManager()
@@ -137,17 +143,30 @@ class InvitadosAdmin(CustomModelView):
         'telefono': 'Teléfono'
     }
 
+def es_administrador():
+    """True si el usuario de la sesión es el administrador (username '0')."""
+    if 'user_id' not in session:
+        return False
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute("SELECT username FROM users WHERE id_persona = %s", (session['user_id'],))
+    user = cur.fetchone()
+    cur.close()
+    return bool(user) and user[0] == '0'
+
+def admin_required(f):
+    """Restringe una ruta /admin/* al administrador, como las vistas de Flask-Admin."""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not es_administrador():
+            set_alert("No tienes permisos para acceder a esta página.", "danger")
+            return redirect(url_for('home.home_view'))
+        return f(*args, **kwargs)
+    return decorated_function
+
 class ProtectedAdminIndexView(AdminIndexView):
     def is_accessible(self):
-        if 'user_id' not in session:
-            return False
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT username FROM users WHERE id_persona = %s", (session['user_id'],))
-        user = cur.fetchone()
-        cur.close()
-        conn.close()
-        return user and user[0] == '0'
+        return es_administrador()
 
     def inaccessible_callback(self, name, **kwargs):
         set_alert("No tienes permisos para acceder a esta página.", "danger")
@@ -155,15 +174,7 @@ class ProtectedAdminIndexView(AdminIndexView):
 
 class ProtectedModelView(ModelView):
     def is_accessible(self):
-        if 'user_id' not in session:
-            return False
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT username FROM users WHERE id_persona = %s", (session['user_id'],))
-        user = cur.fetchone()
-        cur.close()
-        conn.close()
-        return user and user[0] == '0'
+        return es_administrador()
 
     def inaccessible_callback(self, name, **kwargs):
         set_alert("No tienes permisos para acceder a esta página.", "danger")
@@ -176,7 +187,17 @@ def create_app(config_class=Config):
     # Inicializar las extensiones
     bcrypt = Bcrypt(app)
     csrf = CSRFProtect(app)
+    sql_instrumentation.init_app(app)  # Conteo de queries y detector N+1 (antes de crear el engine)
     db.init_app(app)  # Asegúrate de inicializar db
+    database.init_app(app)  # Pool de conexiones psycopg2 por request (y reinicio tras fork)
+    prepared_statements.init_app(app)  # Caché de sentencias preparadas por conexión
+    report_executor.init_app(app)  # Ejecución secuencial/concurrente de /api/report_data
+    reporte_snapshot_repository.init_app(app)  # Snapshots de reportes y cota de antigüedad
+    report_cache.init_app(app)  # Caché de /api/report_data
+    report_analytics.init_app(app)  # Extracto de compromisos en memoria para reportes
+    departamento_tree.init_app(app)  # Árbol de departamentos en memoria
+    reporte_diario_repository.init_app(app)  # Comando reporte-diario-backfill
+    migraciones.init_app(app)  # Comando migrar (migraciones versionadas del esquema)
     login_manager.init_app(app)  # Inicializar LoginManager
 
     # Configuración de carpetas
@@ -256,7 +277,6 @@ def create_app(config_class=Config):
         cur.execute("SELECT username FROM users WHERE username = %s", (session['user_id'],))
         user = cur.fetchone()
         cur.close()
-        conn.close()
         if not user or user[1] != '0':
             set_alert("No tienes permisos para acceder a esta página.", "danger")
             return redirect(url_for('home.home_view'))
@@ -268,12 +288,27 @@ def create_app(config_class=Config):
         cur.execute("SELECT username FROM users WHERE username = %s", (session['user_id'],))
         user = cur.fetchone()
         cur.close()
-        conn.close()
         if not user or user[1] != '0':
             set_alert("No tienes permisos para acceder a esta página.", "danger")
             return redirect(url_for('home.home_view'))
         return redirect(url_for('auth.login'))
 
+    @app.route('/admin/db_pool')
+    @login_required
+    @admin_required
+    def admin_db_pool():
+        stats = get_pool().stats()
+        replica = get_replica_pool()
+        if replica is not None:
+            stats['replica'] = replica.stats()
+        return jsonify(stats)
+
+    @app.route('/admin/report_cache')
+    @login_required
+    @admin_required
+    def admin_report_cache():
+        return jsonify(report_cache.report_cache.stats())
+
     @app.route('/admin/logout')
     def admin_logout():
         logout_user()
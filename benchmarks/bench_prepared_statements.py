@@ -0,0 +1,90 @@
+# /benchmarks/bench_prepared_statements.py
+"""
+Compara el camino ad hoc (parseo + planificación en cada llamada) con el de
+sentencias preparadas para las consultas calientes de CompromisoRepository.
+
+Llama a los métodos reales del repositorio, activando y desactivando la caché
+de utils.prepared_statements. Como en generate_data, la base se indica siempre
+con --dsn y nunca se usa DB_CONFIG (cuyo valor por omisión es la base de
+producción); sólo se aceptan servidores locales salvo que se pase --i-know.
+
+    python -m benchmarks.bench_prepared_statements --dsn "host=/tmp/pgdata dbname=sgc_bench user=postgres" \\
+        --iterations 500 --departamento 200 --user 1 --compromiso 5
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2  # noqa: E402
+
+import database  # noqa: E402
+from benchmarks.generate_data import es_local  # noqa: E402
+from repositories.compromiso_repository import CompromisoRepository  # noqa: E402
+from utils import prepared_statements  # noqa: E402
+
+
+def _medir(funcion, iteraciones):
+    tiempos = []
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    tiempos.sort()
+    return {
+        'media': statistics.mean(tiempos),
+        'p50': tiempos[len(tiempos) // 2],
+        'p95': tiempos[int(len(tiempos) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn', required=True, help='base a medir, p. ej. "host=/tmp/pgdata dbname=sgc_bench"')
+    parser.add_argument('--i-know', action='store_true', help='permite un servidor que no es local')
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--departamento', type=int, required=True, help='id de departamento con compromisos')
+    parser.add_argument('--user', type=int, required=True, help='id de persona referente')
+    parser.add_argument('--compromiso', type=int, required=True, help='id de un compromiso existente')
+    args = parser.parse_args()
+
+    repo = CompromisoRepository()
+    casos = {
+        'fetch_compromisos_by_departamento': lambda: repo.fetch_compromisos_by_departamento(args.departamento),
+        'fetch_compromisos_by_departamento (search)': lambda: repo.fetch_compromisos_by_departamento(args.departamento, search='a'),
+        'fetch_compromisos_by_referente': lambda: repo.fetch_compromisos_by_referente(args.user),
+        'fetch_compromiso_by_id': lambda: repo.fetch_compromiso_by_id(args.compromiso),
+        'fetch_user_info': lambda: repo.fetch_user_info(args.user),
+    }
+
+    conn = psycopg2.connect(args.dsn)
+    if not es_local(conn.info.host) and not args.i_know:
+        conn.close()
+        sys.exit(f"{conn.info.host} no es un servidor local; use --i-know si realmente quiere "
+                 f"medir contra la base {conn.info.dbname} de ese servidor.")
+
+    print(f"{'consulta':<45} {'modo':<9} {'media ms':>9} {'p50 ms':>9} {'p95 ms':>9}")
+    try:
+        with database.connection(conn):
+            for nombre, funcion in casos.items():
+                resultados = {}
+                for modo, habilitado in (('ad hoc', False), ('preparada', True)):
+                    prepared_statements.configure(enabled=habilitado)
+                    for _ in range(args.warmup):
+                        funcion()
+                    resultados[modo] = _medir(funcion, args.iterations)
+                    conn.rollback()
+                    r = resultados[modo]
+                    print(f"{nombre:<45} {modo:<9} {r['media']:>9.3f} {r['p50']:>9.3f} {r['p95']:>9.3f}")
+                mejora = 1 - resultados['preparada']['media'] / resultados['ad hoc']['media']
+                print(f"{'':<45} {'mejora':<9} {mejora:>9.1%}")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+# /benchmarks/generate_data.py
+"""
+Generador de datos sintéticos para benchmarks.
+
+Crea un árbol de departamentos de profundidad configurable, personas con su
+departamento (un director por departamento), áreas y orígenes, compromisos
+con varios referentes (uno principal), reuniones, verificadores, historial de
+modificaciones y filas archivadas y eliminadas. Los ids de departamento
+siguen la convención de la aplicación: cada subárbol de primer nivel ocupa un
+bloque de 100 (200, 201, 202...).
+
+La base se indica siempre con --dsn (DSN o URI de libpq); nunca se usa la
+configuración de la aplicación (DB_CONFIG), cuyo valor por omisión es la base
+de producción. Sólo se aceptan servidores locales (socket Unix, localhost) salvo
+que se pase --i-know. Es determinista para una misma --seed.
+
+Al terminar reconstruye las tablas derivadas que leen los reportes (totales
+diarios y snapshots, ver migraciones/) con los mismos métodos que la
+aplicación, de modo que los benchmarks miden datos consistentes. La jerarquía
+de departamentos y las versiones de datos las mantienen los triggers.
+
+    python -m benchmarks.generate_data --dsn "host=/tmp/pgdata dbname=sgc_bench user=postgres" \\
+        --departamentos 60 --profundidad 4 --personas 2000 --compromisos 50000 --reuniones 3000 --truncate
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import psycopg2  # noqa: E402
+from psycopg2.extras import execute_values  # noqa: E402
+
+import database  # noqa: E402
+from repositories.reporte_diario_repository import ReporteDiarioRepository  # noqa: E402
+from repositories.reporte_snapshot_repository import ReporteSnapshotRepository  # noqa: E402
+
+ESTADOS = [('Pendiente', 55), ('Completado', 45)]
+PRIORIDADES = [('Alta', 25), ('Media', 50), ('Baja', 25)]
+NIVELES = ['SUBDIRECTOR/A', 'JEFE/A DE DEPARTAMENTO', 'JEFE/A DE UNIDAD']
+NOMBRES = ['Ana', 'Bruno', 'Carla', 'Diego', 'Elena', 'Felipe', 'Gabriela', 'Héctor', 'Isabel', 'Javier',
+           'Karina', 'Luis', 'María', 'Nicolás', 'Olga', 'Pedro', 'Rocío', 'Sebastián', 'Tamara', 'Víctor']
+APELLIDOS = ['González', 'Muñoz', 'Rojas', 'Díaz', 'Pérez', 'Soto', 'Contreras', 'Silva', 'Martínez', 'Sepúlveda',
+             'Morales', 'Rodríguez', 'López', 'Fuentes', 'Hernández', 'Torres', 'Araya', 'Flores', 'Espinoza', 'Valenzuela']
+PROFESIONES = ['Ingeniero/a', 'Abogado/a', 'Enfermero/a', 'Médico/a', 'Administrativo/a', 'Contador/a', 'Psicólogo/a']
+PALABRAS = ['revisar', 'informe', 'presupuesto', 'licitación', 'capacitación', 'protocolo', 'auditoría', 'convenio',
+            'indicadores', 'gestión', 'hospital', 'atención', 'listas de espera', 'compras', 'personal', 'calidad']
+
+# Tablas que se vacían con --truncate (hijas antes que padres)
+TABLAS = [
+    'compromiso_modificaciones', 'compromiso_verificador', 'compromiso_archivado_verificador',
+    'compromiso_eliminado_verificador', 'reunion_compromiso', 'reunion_compromiso_archivado',
+    'reunion_compromiso_eliminado', 'persona_compromiso', 'persona_compromiso_archivado',
+    'persona_compromiso_eliminado', 'compromiso', 'compromisos_archivados', 'compromiso_eliminado',
+    'reunion', 'staff_persona', 'staff', 'users', 'persona_departamento', 'persona', 'area', 'origen',
+    'departamento',
+]
+# Servidores que se consideran locales (además de los sockets Unix, que empiezan con /)
+HOSTS_LOCALES = {'localhost', '127.0.0.1', '::1'}
+# Secuencias que se ajustan al máximo id tras insertar con ids explícitos
+SECUENCIAS = ['departamento', 'persona', 'area', 'origen', 'compromiso', 'compromisos_archivados',
+              'compromiso_eliminado', 'reunion', 'staff', 'compromiso_verificador', 'compromiso_modificaciones']
+
+
+def _elegir(rng, pesos):
+    valores, w = zip(*pesos)
+    return rng.choices(valores, weights=w)[0]
+
+
+def _frase(rng, n=6):
+    return ' '.join(rng.choice(PALABRAS) for _ in range(n)).capitalize()
+
+
+def generar_departamentos(rng, total, profundidad):
+    """
+    Devuelve [(id, nombre, id_padre, nivel)]. La raíz es el 100; los hijos
+    directos ocupan los bloques 200, 300...; el resto de cada subárbol toma
+    ids consecutivos dentro de su bloque (o por sobre 100000 si se llena).
+    """
+    departamentos = [(100, 'Dirección de Servicio', None, 0)]
+    if total <= 1:
+        return departamentos
+    if profundidad <= 1:
+        primer_nivel = total - 1
+    else:
+        primer_nivel = max(1, min(total - 1, round((total - 1) ** 0.5)))
+    siguiente_en_bloque = {}
+    desborde = 100000
+    por_nivel = {0: [100]}
+    for i in range(primer_nivel):
+        dep_id = (i + 2) * 100
+        departamentos.append((dep_id, f'Subdirección {i + 1}', 100, 1))
+        siguiente_en_bloque[dep_id] = dep_id + 1
+        por_nivel.setdefault(1, []).append(dep_id)
+    bloque_de = {d: d for d in por_nivel[1]}
+    while len(departamentos) < total:
+        nivel = rng.randint(2, max(2, profundidad))
+        candidatos = por_nivel.get(nivel - 1) or por_nivel[max(k for k in por_nivel if k >= 1)]
+        padre = rng.choice(candidatos)
+        bloque = bloque_de[padre]
+        if siguiente_en_bloque[bloque] < bloque + 100:
+            dep_id = siguiente_en_bloque[bloque]
+            siguiente_en_bloque[bloque] += 1
+        else:
+            desborde += 1
+            dep_id = desborde
+        nivel_real = next(n for n, ids in por_nivel.items() if padre in ids) + 1
+        departamentos.append((dep_id, f'Departamento {dep_id}', padre, nivel_real))
+        por_nivel.setdefault(nivel_real, []).append(dep_id)
+        bloque_de[dep_id] = bloque
+    return departamentos
+
+
+def generar(conn, args):
+    rng = random.Random(args.seed)
+    ahora = datetime.now().replace(microsecond=0)
+    conteos = {}
+
+    with conn.cursor() as cur:
+        departamentos = generar_departamentos(rng, args.departamentos, args.profundidad)
+        execute_values(cur, "INSERT INTO departamento (id, name, id_departamento_padre) VALUES %s",
+                       [(d, n, p) for d, n, p, _ in departamentos])
+        dep_ids = [d[0] for d in departamentos]
+        nivel_dep = {d[0]: d[3] for d in departamentos}
+        conteos['departamento'] = len(dep_ids)
+
+        # Áreas y orígenes: dos de cada uno por departamento
+        areas, origenes = [], []
+        for dep in dep_ids:
+            for k in range(2):
+                areas.append((len(areas) + 1, f'Área {dep}-{k + 1}', dep))
+                origenes.append((len(origenes) + 1, f'Origen {dep}-{k + 1}', dep))
+        execute_values(cur, "INSERT INTO area (id, name, id_departamento) VALUES %s", areas)
+        execute_values(cur, "INSERT INTO origen (id, name, id_departamento) VALUES %s", origenes)
+        areas_de = {}
+        for a in areas:
+            areas_de.setdefault(a[2], []).append(a[0])
+        origenes_de = {}
+        for o in origenes:
+            origenes_de.setdefault(o[2], []).append(o[0])
+        conteos['area'] = len(areas)
+        conteos['origen'] = len(origenes)
+
+        # Personas: el primero de cada departamento es su director
+        personas, persona_dep = [], []
+        personas_de = {}
+        for i in range(1, max(args.personas, len(dep_ids)) + 1):
+            dep = dep_ids[i - 1] if i <= len(dep_ids) else rng.choice(dep_ids)
+            es_director = i <= len(dep_ids)
+            if es_director:
+                nivel = 'DIRECTOR DE SERVICIO' if dep == 100 else NIVELES[min(nivel_dep[dep], 3) - 1]
+            else:
+                nivel = 'FUNCIONARIO/A'
+            personas.append((
+                i, rng.choice(NOMBRES), f'{rng.choice(APELLIDOS)} {rng.choice(APELLIDOS)}',
+                str(10000000 + i), str(rng.randint(0, 9)), rng.choice(PROFESIONES),
+                f'persona{i}@example.cl', nivel.title(), str(200000 + i), nivel,
+            ))
+            persona_dep.append((i, dep, es_director))
+            personas_de.setdefault(dep, []).append(i)
+        execute_values(cur, """
+            INSERT INTO persona (id, name, lastname, rut, dv, profesion, correo, cargo, anexo_telefonico, nivel_jerarquico)
+            VALUES %s
+        """, personas)
+        execute_values(cur, "INSERT INTO persona_departamento (id_persona, id_departamento, es_director) VALUES %s", persona_dep)
+        persona_ids = [p[0] for p in personas]
+        conteos['persona'] = len(personas)
+
+        # Staff: uno por departamento de primer nivel
+        staffs = [(k + 1, f'Staff {d}') for k, d in enumerate(d for d in dep_ids if nivel_dep[d] <= 1)]
+        execute_values(cur, "INSERT INTO staff (id, name) VALUES %s", staffs)
+        staff_persona = set()
+        for s_id, _ in staffs:
+            for p in rng.sample(persona_ids, min(5, len(persona_ids))):
+                staff_persona.add((s_id, p))
+        execute_values(cur, "INSERT INTO staff_persona (id_staff, id_persona) VALUES %s", list(staff_persona))
+
+        # Reuniones
+        reuniones = []
+        for r in range(1, args.reuniones + 1):
+            dep = rng.choice(dep_ids)
+            fecha = ahora - timedelta(days=rng.randint(0, args.dias), hours=rng.randint(0, 23))
+            reuniones.append((
+                r, f'Reunión {r}', rng.choice(staffs)[0], rng.choice(areas_de[dep]), rng.choice(origenes_de[dep]),
+                fecha, f'Sala {rng.randint(1, 20)}', _frase(rng, 4), _frase(rng, 3), _frase(rng, 5), _frase(rng, 3),
+            ))
+        execute_values(cur, """
+            INSERT INTO reunion (id, nombre, id_staff, id_area, id_origen, fecha_creacion, lugar, asistentes,
+                                 proximas_reuniones, temas_analizado, tema)
+            VALUES %s
+        """, reuniones)
+        conteos['reunion'] = len(reuniones)
+
+        def compromisos_lote(desde, cantidad):
+            filas, referentes, en_reunion = [], [], []
+            for c in range(desde, desde + cantidad):
+                dep = rng.choice(dep_ids)
+                creado = ahora - timedelta(days=rng.randint(0, args.dias), minutes=rng.randint(0, 1439))
+                estado = _elegir(rng, ESTADOS)
+                filas.append((
+                    c, _frase(rng), estado, _elegir(rng, PRIORIDADES), creado,
+                    100 if estado == 'Completado' else rng.choice([0, 10, 25, 50, 75, 90]),
+                    creado + timedelta(days=rng.randint(7, 120)), _frase(rng, 4),
+                    _frase(rng, 3) if rng.random() < 0.3 else None, dep,
+                    rng.choice(origenes_de[dep]), rng.choice(areas_de[dep]),
+                ))
+                candidatos = personas_de.get(dep) or persona_ids
+                n_ref = min(rng.randint(1, 4), len(persona_ids))
+                elegidos = rng.sample(candidatos, min(n_ref, len(candidatos)))
+                while len(elegidos) < n_ref:
+                    p = rng.choice(persona_ids)
+                    if p not in elegidos:
+                        elegidos.append(p)
+                referentes.extend((p, c, k == 0) for k, p in enumerate(elegidos))
+                if reuniones and rng.random() < 0.6:
+                    en_reunion.append((rng.randint(1, len(reuniones)), c))
+            return filas, referentes, en_reunion
+
+        columnas = """(id, descripcion, estado, prioridad, fecha_creacion, avance, fecha_limite, comentario,
+                       comentario_direccion, id_departamento, id_origen, id_area)"""
+
+        # Compromisos vigentes, por lotes para acotar memoria
+        verificadores, modificaciones = [], []
+        lote = 5000
+        for desde in range(1, args.compromisos + 1, lote):
+            cantidad = min(lote, args.compromisos - desde + 1)
+            filas, referentes, en_reunion = compromisos_lote(desde, cantidad)
+            execute_values(cur, f"INSERT INTO compromiso {columnas} VALUES %s", filas, page_size=1000)
+            execute_values(cur, "INSERT INTO persona_compromiso (id_persona, id_compromiso, es_responsable_principal) VALUES %s",
+                           referentes, page_size=1000)
+            if en_reunion:
+                execute_values(cur, "INSERT INTO reunion_compromiso (id_reunion, id_compromiso) VALUES %s", en_reunion, page_size=1000)
+            for fila in filas:
+                c_id, creado = fila[0], fila[4]
+                if rng.random() < 0.3:
+                    for k in range(rng.randint(1, 3)):
+                        verificadores.append((c_id, f'verificador_{c_id}_{k}.pdf', f'uploads/verificador_{c_id}_{k}.pdf',
+                                              _frase(rng, 3), creado + timedelta(days=k + 1), rng.choice(persona_ids)))
+                for k in range(rng.randint(0, 3)):
+                    modificaciones.append((c_id, rng.choice(persona_ids), creado + timedelta(days=k + 1)))
+        if verificadores:
+            execute_values(cur, """
+                INSERT INTO compromiso_verificador (id_compromiso, nombre_archivo, ruta_archivo, descripcion, fecha_subida, subido_por)
+                VALUES %s
+            """, verificadores, page_size=1000)
+        if modificaciones:
+            execute_values(cur, "INSERT INTO compromiso_modificaciones (id_compromiso, id_usuario, fecha_modificacion) VALUES %s",
+                           modificaciones, page_size=1000)
+        conteos['compromiso'] = args.compromisos
+        conteos['compromiso_verificador'] = len(verificadores)
+        conteos['compromiso_modificaciones'] = len(modificaciones)
+
+        # Archivados y eliminados: mismas columnas, en sus propias tablas (ids aparte)
+        for tabla, tabla_pc, tabla_rc, tabla_ver, cantidad, extra_col in (
+            ('compromisos_archivados', 'persona_compromiso_archivado', 'reunion_compromiso_archivado',
+             'compromiso_archivado_verificador', args.archivados, 'fecha_archivado, archivado_por'),
+            ('compromiso_eliminado', 'persona_compromiso_eliminado', 'reunion_compromiso_eliminado',
+             'compromiso_eliminado_verificador', args.eliminados, 'fecha_eliminacion, eliminado_por'),
+        ):
+            if not cantidad:
+                conteos[tabla] = 0
+                continue
+            filas, referentes, en_reunion = compromisos_lote(1, cantidad)
+            filas = [f + (f[4] + timedelta(days=rng.randint(1, 60)), rng.choice(persona_ids)) for f in filas]
+            execute_values(cur, f"INSERT INTO {tabla} {columnas[:-1]}, {extra_col}) VALUES %s", filas, page_size=1000)
+            execute_values(cur, f"INSERT INTO {tabla_pc} (id_persona, id_compromiso, es_responsable_principal) VALUES %s",
+                           referentes, page_size=1000)
+            if en_reunion:
+                execute_values(cur, f"INSERT INTO {tabla_rc} (id_reunion, id_compromiso) VALUES %s", en_reunion, page_size=1000)
+            ver = [(f[0], f'verificador_{tabla}_{f[0]}.pdf', f'uploads/verificador_{tabla}_{f[0]}.pdf', None, f[4], f[-1])
+                   for f in filas if rng.random() < 0.3]
+            if ver:
+                execute_values(cur, f"""
+                    INSERT INTO {tabla_ver} (id_compromiso, nombre_archivo, ruta_archivo, descripcion, fecha_subida, subido_por)
+                    VALUES %s
+                """, ver, page_size=1000)
+            conteos[tabla] = cantidad
+
+        for tabla in SECUENCIAS:
+            cur.execute(f"SELECT setval(pg_get_serial_sequence('{tabla}', 'id'), COALESCE((SELECT MAX(id) FROM {tabla}), 1))")
+        cur.execute("ANALYZE")
+    return conteos
+
+
+def es_local(host):
+    """True si `host` (conn.info.host) es un socket Unix o la máquina local."""
+    return not host or host.startswith('/') or host in HOSTS_LOCALES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dsn', required=True, help='base a llenar, p. ej. "host=/tmp/pgdata dbname=sgc_bench"')
+    parser.add_argument('--i-know', action='store_true',
+                        help='permite un servidor que no es local (la base se modifica y con --truncate se vacía)')
+    parser.add_argument('--departamentos', type=int, default=60)
+    parser.add_argument('--profundidad', type=int, default=4, help='profundidad máxima del árbol (la raíz es 0)')
+    parser.add_argument('--personas', type=int, default=2000)
+    parser.add_argument('--compromisos', type=int, default=50000)
+    parser.add_argument('--reuniones', type=int, default=3000)
+    parser.add_argument('--archivados', type=int, default=2000)
+    parser.add_argument('--eliminados', type=int, default=1000)
+    parser.add_argument('--dias', type=int, default=730, help='antigüedad máxima de las fechas generadas')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--truncate', action='store_true',
+                        help='vacía las tablas antes de generar (BORRA TODOS LOS DATOS de la base configurada)')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    conn = psycopg2.connect(args.dsn)
+    try:
+        # Se revisa el servidor al que efectivamente se conectó (el DSN puede omitirlo: PGHOST)
+        if not es_local(conn.info.host) and not args.i_know:
+            sys.exit(f"{conn.info.host} no es un servidor local; use --i-know si realmente quiere "
+                     f"modificar la base {conn.info.dbname} de ese servidor.")
+        with conn.cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM compromiso")
+            existentes = cur.fetchone()[0]
+            if existentes and not args.truncate:
+                sys.exit(f"La base ya tiene {existentes} compromisos; use --truncate para reemplazarlos.")
+            if args.truncate:
+                cur.execute("TRUNCATE " + ', '.join(TABLAS) + " RESTART IDENTITY CASCADE")
+        try:
+            conteos = generar(conn, args)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        # Sobre esta misma conexión, no la de DB_CONFIG; cada método confirma lo suyo
+        with database.connection(conn):
+            ReporteDiarioRepository().backfill()
+            ReporteSnapshotRepository().rebuild()
+    finally:
+        conn.close()
+    for tabla, n in conteos.items():
+        print(f"{tabla:<28} {n:>8}")
+    print(f"Datos generados en {time.perf_counter() - inicio:.1f} s")
+
+
+if __name__ == '__main__':
+    main()
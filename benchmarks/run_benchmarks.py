@@ -0,0 +1,465 @@
+# /benchmarks/run_benchmarks.py
+"""
+Suite de benchmarks de repositorios y rutas.
+
+Mide cada método público de lectura de los cinco repositorios y las rutas
+principales (con el cliente de pruebas de Flask y una sesión de director)
+contra la base configurada en DB_HOST, DB_NAME, DB_USER y DB_PASSWORD, que
+normalmente se llena antes con `benchmarks.generate_data`. Los métodos de
+escritura se listan como omitidos para que la cobertura quede a la vista.
+
+El resultado se guarda en JSON (por defecto benchmarks/results/<fecha>.json).
+Con --compare se imprime la variación contra una corrida anterior, para ver
+regresiones entre versiones.
+
+    python -m benchmarks.run_benchmarks --iterations 20
+    python -m benchmarks.run_benchmarks --compare benchmarks/results/anterior.json
+"""
+import argparse
+import contextlib
+import inspect
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+from sqlalchemy.engine import URL  # noqa: E402
+
+import database  # noqa: E402
+from config import Config  # noqa: E402
+from repositories.compromiso_repository import CompromisoRepository  # noqa: E402
+from repositories.datos_version import TABLAS_REPORTE, DatosVersionRepository  # noqa: E402
+from repositories.departamento_tree import DepartamentoTreeRepository  # noqa: E402
+from repositories.gestion_repository import GestionRepository  # noqa: E402
+from repositories.paginacion import CONTEO_MAXIMO  # noqa: E402
+from repositories.persona_comp_repository import PersonaCompRepository  # noqa: E402
+from repositories.report_analytics import CompromisoFactsRepository  # noqa: E402
+from repositories.reporte_diario_repository import ReporteDiarioRepository  # noqa: E402
+from repositories.reporte_snapshot_repository import ReporteSnapshotRepository  # noqa: E402
+from repositories.reportes_repository import ReportesRepository  # noqa: E402
+from repositories.reunion_repository import ReunionRepository  # noqa: E402
+
+REPOSITORIOS = [CompromisoRepository, ReportesRepository, ReporteSnapshotRepository, ReporteDiarioRepository,
+                CompromisoFactsRepository, DepartamentoTreeRepository, DatosVersionRepository, GestionRepository,
+                ReunionRepository, PersonaCompRepository]
+
+# Métodos que escriben (o sólo delegan): no se miden
+ESCRITURAS = {
+    'CompromisoRepository': {'update_compromiso', 'update_referentes', 'log_modificacion', 'create_compromiso',
+                             'insert_compromiso', 'add_verificador', 'delete_verificador', 'convert_month_to_number'},
+    'GestionRepository': {'update_funcionario', 'update_departamento', 'crear_area', 'crear_origen',
+                          'actualizar_area', 'actualizar_origen', 'eliminar_area', 'eliminar_origen'},
+    'ReunionRepository': {'insert_origen', 'insert_area', 'insert_reunion', 'insert_compromiso', 'insert_invitado',
+                          'associate_reunion_compromiso', 'associate_persona_compromiso'},
+    'PersonaCompRepository': {'eliminar_compromiso', 'archivar_compromiso', 'desarchivar_compromiso',
+                              'eliminar_permanentemente_compromiso', 'forzar_eliminacion_compromisos',
+                              'recuperar_compromiso', 'create_compromiso', 'asociar_referentes', 'update_referentes',
+                              'set_current_user_id', 'add_verificador', 'delete_verificador'},
+    'ReporteSnapshotRepository': {'ensure_fresh', 'refresh', 'rebuild'},
+    'ReporteDiarioRepository': {'backfill'},
+}
+# Métodos heredados de BaseRepository
+BASE = {'commit', 'rollback', 'close', 'conn', 'iterar'}
+
+
+class TestConfig(Config):
+    TESTING = True
+    WTF_CSRF_ENABLED = False
+    SQLALCHEMY_DATABASE_URI = URL.create(
+        'postgresql+psycopg2',
+        username=database.DB_CONFIG['user'],
+        password=database.DB_CONFIG['password'] or None,
+        host=database.DB_CONFIG['host'],
+        database=database.DB_CONFIG['database'],
+    )
+    # Se mide el cálculo del reporte, no la caché
+    REPORT_CACHE = os.getenv('REPORT_CACHE', '0') == '1'
+    # Cantidad de sentencias por ruta (cabecera X-SQL-Queries)
+    SQL_INSTRUMENTATION = True
+
+
+def _muestra(conn):
+    """Ids representativos del dataset para parametrizar los casos."""
+    with conn.cursor() as cur:
+        # Director del departamento con más compromisos
+        cur.execute("""
+            SELECT pd.id_persona, pd.id_departamento
+            FROM persona_departamento pd
+            JOIN compromiso c ON c.id_departamento = pd.id_departamento
+            WHERE pd.es_director
+            GROUP BY pd.id_persona, pd.id_departamento
+            ORDER BY COUNT(*) DESC LIMIT 1
+        """)
+        director, departamento = cur.fetchone()
+        # Funcionario con más compromisos como referente
+        cur.execute("""
+            SELECT pc.id_persona FROM persona_compromiso pc
+            GROUP BY pc.id_persona ORDER BY COUNT(*) DESC LIMIT 1
+        """)
+        referente = cur.fetchone()[0]
+        cur.execute("SELECT id_compromiso FROM compromiso_verificador ORDER BY id_compromiso LIMIT 1")
+        compromiso = cur.fetchone()[0]
+        cur.execute("SELECT id_reunion FROM reunion_compromiso GROUP BY id_reunion ORDER BY COUNT(*) DESC LIMIT 1")
+        reunion = cur.fetchone()[0]
+        cur.execute("SELECT id FROM area WHERE id_departamento = %s LIMIT 1", (departamento,))
+        area = cur.fetchone()[0]
+        cur.execute("SELECT id FROM origen WHERE id_departamento = %s LIMIT 1", (departamento,))
+        origen = cur.fetchone()[0]
+        cur.execute("SELECT name FROM departamento WHERE id = %s", (departamento,))
+        nombre_departamento = cur.fetchone()[0]
+        cur.execute("""
+            SELECT EXTRACT(MONTH FROM fecha_creacion)::int, EXTRACT(YEAR FROM fecha_creacion)::int
+            FROM compromiso ORDER BY fecha_creacion DESC LIMIT 1
+        """)
+        mes, anio = cur.fetchone()
+    conn.rollback()
+    return {
+        'director': director, 'departamento': departamento, 'referente': referente, 'compromiso': compromiso,
+        'reunion': reunion, 'area': area, 'origen': origen, 'nombre_departamento': nombre_departamento,
+        'mes': mes, 'anio': anio,
+    }
+
+
+def _casos_repositorios(m, dept_ids):
+    """(repositorio, método) -> lambda que recibe la instancia."""
+    meses = ['Enero', 'Febrero', 'Marzo', 'Abril', 'Mayo', 'Junio', 'Julio', 'Agosto', 'Septiembre', 'Octubre',
+             'Noviembre', 'Diciembre']
+    return {
+        'CompromisoRepository': {
+            'fetch_user_info': lambda r: r.fetch_user_info(m['director']),
+            'fetch_director_info': lambda r: r.fetch_director_info(m['director']),
+            'fetch_referentes': lambda r: r.fetch_referentes(),
+            'buscar_referentes': lambda r: r.buscar_referentes('perez'),
+            'fetch_compromisos_by_departamento': lambda r: r.fetch_compromisos_by_departamento(m['departamento']),
+            'fetch_compromisos_by_referente': lambda r: r.fetch_compromisos_by_referente(m['referente']),
+            'count_compromisos_by_departamento':
+                lambda r: r.count_compromisos_by_departamento(m['departamento'], hasta=CONTEO_MAXIMO + 1),
+            'count_compromisos_by_referente':
+                lambda r: r.count_compromisos_by_referente(m['referente'], hasta=CONTEO_MAXIMO + 1),
+            'fetch_departamentos': lambda r: r.fetch_departamentos(),
+            'fetch_compromisos_by_month': lambda r: r.fetch_compromisos_by_month(m['mes'], m['anio']),
+            'obtener_compromisos_por_mes_y_anio': lambda r: r.obtener_compromisos_por_mes_y_anio(m['mes'], m['anio']),
+            'get_resumen_compromisos': lambda r: r.get_resumen_compromisos(meses[m['mes'] - 1]),
+            'count_total_compromisos': lambda r: r.count_total_compromisos(m['mes']),
+            'count_compromisos_completados': lambda r: r.count_compromisos_completados(m['mes']),
+            'count_compromisos_pendientes': lambda r: r.count_compromisos_pendientes(m['mes']),
+            'fetch_departamentos_resumen': lambda r: r.fetch_departamentos_resumen(m['mes'], None, m['anio']),
+            'get_months': lambda r: r.get_months(),
+            'fetch_compromisos_by_mes_departamento': lambda r: r.fetch_compromisos_by_mes_departamento(m['mes'], m['departamento'], m['anio']),
+            'fetch_compromisos_by_filtro': lambda r: r.fetch_compromisos_by_filtro(m['mes'], m['area']),
+            'fetch_areas': lambda r: r.fetch_areas(),
+            'get_meses': lambda r: r.get_meses(),
+            'fetch_all_compromisos': lambda r: r.fetch_all_compromisos(),
+            'fetch_compromisos_compartidos': lambda r: r.fetch_compromisos_compartidos(m['director'], True),
+            'count_compromisos_compartidos':
+                lambda r: r.count_compromisos_compartidos(m['director'], hasta=CONTEO_MAXIMO + 1),
+            'es_jefe_de_departamento': lambda r: r.es_jefe_de_departamento(m['director'], m['departamento']),
+            'fetch_compromiso_by_id': lambda r: r.fetch_compromiso_by_id(m['compromiso']),
+            'get_verificadores': lambda r: r.get_verificadores(m['compromiso']),
+            'is_principal_responsible': lambda r: r.is_principal_responsible(m['referente'], m['compromiso']),
+            'fetch_areas_by_departamento': lambda r: r.fetch_areas_by_departamento(m['departamento']),
+            'fetch_origenes_by_departamento': lambda r: r.fetch_origenes_by_departamento(m['departamento']),
+            'iter_compromisos_by_mes_departamento':
+                lambda r: list(r.iter_compromisos_by_mes_departamento('Todos', m['departamento'], 'Todos')),
+        },
+        'ReportesRepository': {
+            'get_total_compromisos': lambda r: r.get_total_compromisos(),
+            'get_pendientes': lambda r: r.get_pendientes(),
+            'get_completados': lambda r: r.get_completados(),
+            'get_funcionarios': lambda r: r.get_funcionarios(),
+            'get_departamentos': lambda r: r.get_departamentos(),
+            'get_compromisos_por_departamento': lambda r: r.get_compromisos_por_departamento(),
+            'get_personas_mas': lambda r: r.get_personas_mas(),
+            'get_compromisos_por_dia': lambda r: r.get_compromisos_por_dia(),
+            'get_compromisos_por_dia_por_departamento': lambda r: r.get_compromisos_por_dia_por_departamento(),
+            'get_compromisos_por_jerarquia_departamento': lambda r: r.get_compromisos_por_jerarquia_departamento(),
+            'get_total_reuniones': lambda r: r.get_total_reuniones(),
+            'get_archived_compromisos': lambda r: r.get_archived_compromisos(),
+            'get_deleted_compromisos': lambda r: r.get_deleted_compromisos(),
+            'get_avg_compromisos_por_reunion': lambda r: r.get_avg_compromisos_por_reunion(),
+            'get_percentage_completados': lambda r: r.get_percentage_completados(),
+            'get_percentage_pendientes': lambda r: r.get_percentage_pendientes(),
+            'get_percentage_completados_por_persona': lambda r: r.get_percentage_completados_por_persona(),
+            'get_percentage_completados_por_departamento': lambda r: r.get_percentage_completados_por_departamento(),
+            'get_reuniones_por_dia': lambda r: r.get_reuniones_por_dia(),
+            'get_user_department_hierarchy': lambda r: r.get_user_department_hierarchy(m['director']),
+            'get_user_department_ids': lambda r: r.get_user_department_ids(m['director']),
+            'get_total_compromisos_by_dept_hierarchy': lambda r: r.get_total_compromisos_by_dept_hierarchy(dept_ids),
+            'get_pendientes_by_dept_hierarchy': lambda r: r.get_pendientes_by_dept_hierarchy(dept_ids),
+            'get_completados_by_dept_hierarchy': lambda r: r.get_completados_by_dept_hierarchy(dept_ids),
+            'get_compromisos_por_departamento_filtered': lambda r: r.get_compromisos_por_departamento_filtered(dept_ids),
+            'get_personas_mas_by_dept_hierarchy': lambda r: r.get_personas_mas_by_dept_hierarchy(dept_ids),
+            'get_compromisos_por_dia_by_dept_hierarchy': lambda r: r.get_compromisos_por_dia_by_dept_hierarchy(dept_ids),
+            'get_compromisos_por_dia_por_departamento_filtered': lambda r: r.get_compromisos_por_dia_por_departamento_filtered(dept_ids),
+            'get_compromisos_por_jerarquia_departamento_filtered': lambda r: r.get_compromisos_por_jerarquia_departamento_filtered(dept_ids),
+            'get_reuniones_por_dia_filtered_by_dept': lambda r: r.get_reuniones_por_dia_filtered_by_dept(dept_ids),
+            'get_funcionarios_by_dept_hierarchy': lambda r: r.get_funcionarios_by_dept_hierarchy(dept_ids),
+            'get_compromiso_aggregates': lambda r: r.get_compromiso_aggregates(),
+            'get_persona_aggregates': lambda r: r.get_persona_aggregates(),
+            'get_report_counters': lambda r: r.get_report_counters(),
+            'get_daily_series': lambda r: r.get_daily_series(),
+            'get_workload': lambda r: r.get_workload(dept_ids),
+        },
+        'CompromisoFactsRepository': {
+            'fetch_extract': lambda r: r.fetch_extract(),
+            'load': lambda r: r.load(),
+        },
+        'DatosVersionRepository': {
+            'fetch_version': lambda r: r.fetch_version(TABLAS_REPORTE),
+        },
+        'DepartamentoTreeRepository': {
+            'fetch_version': lambda r: r.fetch_version(),
+            'load': lambda r: r.load(),
+        },
+        'ReporteSnapshotRepository': {
+            'get_compromiso_aggregates': lambda r: r.get_compromiso_aggregates(),
+            'get_persona_aggregates': lambda r: r.get_persona_aggregates(),
+        },
+        'GestionRepository': {
+            'fetch_funcionarios': lambda r: r.fetch_funcionarios(),
+            'fetch_funcionario_by_id': lambda r: r.fetch_funcionario_by_id(m['director']),
+            'fetch_departamentos': lambda r: r.fetch_departamentos(),
+            'fetch_departamento_by_id': lambda r: r.fetch_departamento_by_id(m['departamento']),
+            'fetch_niveles_jerarquicos': lambda r: r.fetch_niveles_jerarquicos(),
+            'fetch_departamento_chain_by_name': lambda r: r.fetch_departamento_chain_by_name(m['nombre_departamento']),
+            'fetch_areas_by_departamento': lambda r: r.fetch_areas_by_departamento(m['departamento']),
+            'fetch_origenes_by_departamento': lambda r: r.fetch_origenes_by_departamento(m['departamento']),
+        },
+        'ReunionRepository': {
+            'fetch_user_info': lambda r: r.fetch_user_info(m['director']),
+            'fetch_origenes': lambda r: r.fetch_origenes(),
+            'fetch_areas': lambda r: r.fetch_areas(),
+            'fetch_departamentos': lambda r: r.fetch_departamentos(),
+            'fetch_personas': lambda r: r.fetch_personas(),
+            'fetch_reunion_asistentes': lambda r: r.fetch_reunion_asistentes(m['reunion']),
+            'fetch_mis_reuniones': lambda r: r.fetch_mis_reuniones(m['referente']),
+            'fetch_compromisos_by_reunion': lambda r: r.fetch_compromisos_by_reunion(m['reunion']),
+            'fetch_invitados': lambda r: r.fetch_invitados(),
+            'fetch_reunion_by_compromiso_id': lambda r: r.fetch_reunion_by_compromiso_id(m['compromiso']),
+            'fetch_compromisos_con_reunion': lambda r: r.fetch_compromisos_con_reunion(list(range(1, 501))),
+            'fetch_origen_name': lambda r: r.fetch_origen_name(m['origen']),
+            'fetch_area_name': lambda r: r.fetch_area_name(m['area']),
+            'fetch_reunion_by_id': lambda r: r.fetch_reunion_by_id(m['reunion']),
+            'filtrar_reuniones': lambda r: r.filtrar_reuniones(m['referente'], '', '', '', '', '', ''),
+            'fetch_areas_by_departamento': lambda r: r.fetch_areas_by_departamento(m['departamento']),
+            'fetch_origenes_by_departamento': lambda r: r.fetch_origenes_by_departamento(m['departamento']),
+        },
+        'PersonaCompRepository': {
+            'get_compromisos_eliminados': lambda r: r.get_compromisos_eliminados(),
+            'get_compromisos_archivados': lambda r: r.get_compromisos_archivados(),
+            'fetch_compromisos_archivados': lambda r: r.fetch_compromisos_archivados(),
+            'fetch_compromisos_eliminados': lambda r: r.fetch_compromisos_eliminados(),
+            'fetch_departamentos': lambda r: r.fetch_departamentos(),
+            'fetch_referentes': lambda r: r.fetch_referentes(),
+            'get_user_info': lambda r: r.get_user_info(m['director']),
+            'get_verificadores': lambda r: r.get_verificadores(m['compromiso']),
+        },
+    }
+
+
+def _rutas(m):
+    return [
+        '/home',
+        '/ver_compromisos',
+        '/ver_compromisos_compartidos',
+        '/api/report_data',
+        '/api/report_data?unfiltered=true',
+        '/director/reportes',
+        '/director/resumen_compromisos',
+        f"/director/ver_compromisos?month=Todos&departamento_id={m['departamento']}&year=Todos",
+        '/funcionarios',
+        '/departamentos',
+        f"/get_areas_by_departamento?departamento_id={m['departamento']}",
+        '/mis_reuniones',
+        '/ver_compromisos_archivados',
+        '/ver_compromisos_eliminados',
+    ]
+
+
+def _medir(funcion, iteraciones, warmup, entre_iteraciones=None):
+    resultado = None
+    for _ in range(warmup):
+        resultado = funcion()
+        if entre_iteraciones:
+            entre_iteraciones()
+    tiempos = []
+    for _ in range(iteraciones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        if entre_iteraciones:
+            entre_iteraciones()
+    tiempos.sort()
+    return {
+        'n': len(tiempos),
+        'mean_ms': round(statistics.mean(tiempos), 3),
+        'p50_ms': round(tiempos[len(tiempos) // 2], 3),
+        'p95_ms': round(tiempos[max(0, int(len(tiempos) * 0.95) - 1)], 3),
+        'min_ms': round(tiempos[0], 3),
+        'max_ms': round(tiempos[-1], 3),
+    }, resultado
+
+
+def _filas(resultado):
+    if isinstance(resultado, (list, tuple, set, dict)):
+        return len(resultado)
+    return None
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _dataset(conn):
+    tablas = ['departamento', 'persona', 'compromiso', 'persona_compromiso', 'reunion', 'compromiso_verificador',
+              'compromisos_archivados', 'compromiso_eliminado']
+    with conn.cursor() as cur:
+        conteos = {}
+        for tabla in tablas:
+            cur.execute(f"SELECT COUNT(*) FROM {tabla}")
+            conteos[tabla] = cur.fetchone()[0]
+        cur.execute("SHOW server_version")
+        version = cur.fetchone()[0]
+    conn.rollback()
+    return conteos, version
+
+
+def benchmark_repositorios(app, m, args, omitidos):
+    resultados = {}
+    with app.app_context():
+        dept_ids = [d['id'] for d in ReportesRepository().get_user_department_hierarchy(m['director'])]
+        casos = _casos_repositorios(m, dept_ids)
+        for cls in REPOSITORIOS:
+            nombre_cls = cls.__name__
+            repo = cls()
+            publicos = [n for n, _ in inspect.getmembers(cls, predicate=inspect.isfunction)
+                        if not n.startswith('_') and n not in BASE]
+            for metodo in publicos:
+                clave = f'{nombre_cls}.{metodo}'
+                if args.filter and args.filter not in clave:
+                    continue
+                caso = casos.get(nombre_cls, {}).get(metodo)
+                if caso is None:
+                    motivo = 'escritura' if metodo in ESCRITURAS.get(nombre_cls, ()) else 'sin caso'
+                    omitidos.append({'name': clave, 'reason': motivo})
+                    continue
+                try:
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        stats, resultado = _medir(lambda: caso(repo), args.iterations, args.warmup,
+                                                  lambda: database.get_db_connection().rollback())
+                    stats['rows'] = _filas(resultado)
+                    resultados[clave] = stats
+                    print(f"{clave:<70} {stats['mean_ms']:>9.3f} ms  p95 {stats['p95_ms']:>9.3f} ms")
+                except Exception as e:
+                    database.get_db_connection().rollback()
+                    resultados[clave] = {'error': f'{type(e).__name__}: {e}'}
+                    print(f"{clave:<70} ERROR {type(e).__name__}: {e}")
+    return resultados
+
+
+def benchmark_rutas(app, m, args):
+    resultados = {}
+    cliente = app.test_client()
+    with cliente.session_transaction() as sesion:
+        sesion['user_id'] = m['director']
+        sesion['es_director'] = True
+        sesion['nivel_jerarquico'] = 'DIRECTOR DE SERVICIO'
+        sesion['user'] = {'id': m['director'], 'nivel_jerarquico': 'DIRECTOR DE SERVICIO'}
+    for ruta in _rutas(m):
+        if args.filter and args.filter not in ruta:
+            continue
+        estados = set()
+
+        def pedir():
+            respuesta = cliente.get(ruta)
+            respuesta.get_data()
+            estados.add(respuesta.status_code)
+            return respuesta
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            stats, respuesta = _medir(pedir, args.iterations, args.warmup)
+        stats['status'] = sorted(estados)
+        stats['bytes'] = len(respuesta.get_data())
+        stats['sql_queries'] = int(respuesta.headers.get('X-SQL-Queries', 0)) or None
+        resultados[ruta] = stats
+        print(f"GET {ruta:<66} {stats['mean_ms']:>9.3f} ms  p95 {stats['p95_ms']:>9.3f} ms  {stats['status']}")
+    return resultados
+
+
+def comparar(actual, anterior_path, umbral):
+    with open(anterior_path, encoding='utf-8') as f:
+        anterior = json.load(f)
+    print(f"\nComparación con {anterior_path} (commit {anterior['meta'].get('git_commit')}):")
+    for seccion in ('repositories', 'routes'):
+        for nombre, stats in actual[seccion].items():
+            previo = anterior.get(seccion, {}).get(nombre)
+            if not previo or 'mean_ms' not in previo or 'mean_ms' not in stats or not previo['mean_ms']:
+                continue
+            cambio = stats['mean_ms'] / previo['mean_ms'] - 1
+            marca = 'REGRESIÓN' if cambio > umbral else ('mejora' if cambio < -umbral else '')
+            if marca:
+                print(f"  {marca:<10} {nombre:<70} {previo['mean_ms']:>9.3f} -> {stats['mean_ms']:>9.3f} ms ({cambio:+.0%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--filter', help='sólo casos cuyo nombre contenga este texto')
+    parser.add_argument('--skip-routes', action='store_true')
+    parser.add_argument('--output', help='archivo JSON de salida')
+    parser.add_argument('--compare', help='JSON de una corrida anterior para comparar')
+    parser.add_argument('--threshold', type=float, default=0.15, help='variación que se reporta (0.15 = 15%%)')
+    args = parser.parse_args()
+
+    from app import create_app
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = create_app(TestConfig)
+
+    with app.app_context():
+        conn = database.get_db_connection()
+        m = _muestra(conn)
+        dataset, version = _dataset(conn)
+
+    omitidos = []
+    resultado = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': _git_commit(),
+            'python': platform.python_version(),
+            'postgres': version,
+            'pool_backend': app.config.get('DB_POOL_BACKEND'),
+            'iterations': args.iterations,
+            'warmup': args.warmup,
+            'dataset': dataset,
+            'sample': m,
+        },
+        'repositories': benchmark_repositorios(app, m, args, omitidos),
+        'routes': {} if args.skip_routes else benchmark_rutas(app, m, args),
+        'skipped': omitidos,
+    }
+
+    salida = args.output or os.path.join(RAIZ, 'benchmarks', 'results',
+                                         datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+    with open(salida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False, default=str)
+    print(f"\nResultados guardados en {salida} ({len(omitidos)} métodos omitidos)")
+
+    if args.compare:
+        comparar(resultado, args.compare, args.threshold)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,22 +1,545 @@
 import psycopg2
+import sqlalchemy.exc
 from psycopg2.extras import RealDictCursor
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
 from dotenv import load_dotenv
+from flask import g, has_app_context, has_request_context, request, session
+from exceptions.database_exceptions import PoolError, PoolTimeoutError
+from utils.sql_instrumentation import InstrumentedConnection
+import logging
 import os
+import threading
+import time
+import weakref
+from contextlib import contextmanager
 
 load_dotenv()
+
+DB_CONFIG = {
+    'host': os.getenv('DB_HOST', '10.7.196.122'),
+    'database': os.getenv('DB_NAME', 'gestion'),
+    'user': os.getenv('DB_USER', 'usuariopbi'),
+    'password': os.getenv('DB_PASSWORD', '@@usuariopbi@@'),
+}
+
+
+class ConnectionPool:
+    """
+    Pool de conexiones psycopg2 seguro para hilos.
+
+    Waitress atiende cada request en un hilo distinto, por lo que cada request
+    toma prestada su propia conexión y la devuelve al terminar. Si todas las
+    conexiones están en uso, el hilo espera hasta `timeout` segundos antes de
+    lanzar PoolTimeoutError.
+    """
+
+    def __init__(self, minconn=1, maxconn=10, timeout=30, **connect_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Tamaño de pool inválido: se requiere 0 <= minconn <= maxconn y maxconn >= 1")
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._connect_kwargs = connect_kwargs
+        self._cond = threading.Condition()
+        self._idle = []
+        self._size = 0
+        self._in_use = 0
+        self._waiting = 0
+        self._closed = False
+        self._stats = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'created': 0,
+            'discarded': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+        for _ in range(minconn):
+            self._idle.append(self._connect())
+            self._size += 1
+
+    def _connect(self):
+        conn = psycopg2.connect(**self._connect_kwargs)
+        with self._cond:
+            self._stats['created'] += 1
+        return conn
+
+    def getconn(self, timeout=None):
+        """Toma una conexión del pool, esperando como máximo `timeout` segundos."""
+        timeout = self.timeout if timeout is None else timeout
+        inicio = time.monotonic()
+        deadline = inicio + timeout
+        conn = None
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise PoolError("El pool de conexiones está cerrado")
+                if self._idle:
+                    conn = self._idle.pop()
+                    if conn.closed:
+                        # La conexión se cayó mientras estaba libre: se descarta
+                        self._size -= 1
+                        self._stats['discarded'] += 1
+                        conn = None
+                        continue
+                    break
+                if self._size < self.maxconn:
+                    # Reservar el cupo; la conexión se abre fuera del lock
+                    self._size += 1
+                    break
+                restante = deadline - time.monotonic()
+                if restante <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f"No hay conexiones disponibles después de {timeout} segundos "
+                        f"({self._in_use}/{self.maxconn} en uso)"
+                    )
+                self._waiting += 1
+                try:
+                    self._cond.wait(restante)
+                finally:
+                    self._waiting -= 1
+
+        if conn is None:
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._cond:
+                    self._size -= 1
+                    self._cond.notify()
+                raise
+
+        espera = time.monotonic() - inicio
+        with self._cond:
+            self._in_use += 1
+            self._stats['checkouts'] += 1
+            self._stats['wait_time_total'] += espera
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], espera)
+        return conn
+
+    def putconn(self, conn, close=False):
+        """Devuelve una conexión al pool. Las transacciones abiertas se deshacen."""
+        if not close and not conn.closed:
+            try:
+                if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                close = True
+        descartar = close or conn.closed or self._closed
+        if descartar and not conn.closed:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+        with self._cond:
+            self._in_use -= 1
+            if descartar:
+                self._size -= 1
+                self._stats['discarded'] += 1
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def stats(self):
+        """Estado actual del pool y contadores acumulados."""
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'minconn': self.minconn,
+                'maxconn': self.maxconn,
+                'timeout': self.timeout,
+                'size': self._size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'waiting': self._waiting,
+            })
+        stats['wait_time_avg'] = stats['wait_time_total'] / stats['checkouts'] if stats['checkouts'] else 0.0
+        return stats
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for conn in idle:
+            try:
+                conn.close()
+            except psycopg2.Error:
+                pass
+
+
+class EnginePool:
+    """
+    Adaptador con la misma interfaz que ConnectionPool que presta conexiones
+    DBAPI crudas del pool del engine de SQLAlchemy (`db.engine`).
+
+    Así Flask-SQLAlchemy (Flask-Admin, load_user) y los repositorios psycopg2
+    comparten un único pool por proceso. El tamaño y el timeout se configuran
+    con SQLALCHEMY_ENGINE_OPTIONS; el `timeout` por llamada de getconn se ignora.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        # id(conexión psycopg2) -> proxy del pool de SQLAlchemy que la envuelve
+        self._fairies = {}
+        self._stats = {
+            'checkouts': 0,
+            'timeouts': 0,
+            'discarded': 0,
+            'wait_time_total': 0.0,
+            'wait_time_max': 0.0,
+        }
+
+    def getconn(self, timeout=None):
+        inicio = time.monotonic()
+        try:
+            fairy = self.engine.raw_connection()
+        except sqlalchemy.exc.TimeoutError as e:
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise PoolTimeoutError(f"No hay conexiones disponibles en el pool de SQLAlchemy: {e}") from e
+        conn = fairy.driver_connection
+        espera = time.monotonic() - inicio
+        with self._lock:
+            self._fairies[id(conn)] = fairy
+            self._stats['checkouts'] += 1
+            self._stats['wait_time_total'] += espera
+            self._stats['wait_time_max'] = max(self._stats['wait_time_max'], espera)
+        return conn
+
+    def putconn(self, conn, close=False):
+        with self._lock:
+            fairy = self._fairies.pop(id(conn), None)
+        if fairy is None:
+            raise PoolError("La conexión no pertenece a este pool")
+        if close or conn.closed:
+            # Se descarta la conexión; SQLAlchemy abre otra cuando haga falta
+            with self._lock:
+                self._stats['discarded'] += 1
+            fairy.invalidate()
+        else:
+            # El pool de SQLAlchemy hace ROLLBACK al recibirla (reset on return)
+            fairy.close()
+
+    def stats(self):
+        pool = self.engine.pool
+        with self._lock:
+            stats = dict(self._stats)
+        idle = pool.checkedin() if hasattr(pool, 'checkedin') else None
+        in_use = pool.checkedout() if hasattr(pool, 'checkedout') else None
+        stats.update({
+            'backend': 'sqlalchemy',
+            'minconn': None,
+            'maxconn': pool.size() + max(pool._max_overflow, 0) if hasattr(pool, '_max_overflow') else None,
+            'timeout': getattr(pool, '_timeout', None),
+            'size': (idle or 0) + (in_use or 0),
+            'idle': idle,
+            'in_use': in_use,
+            'waiting': None,
+            'status': pool.status(),
+        })
+        stats['wait_time_avg'] = stats['wait_time_total'] / stats['checkouts'] if stats['checkouts'] else 0.0
+        return stats
+
+    def closeall(self):
+        self.engine.dispose()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_settings = {
+    'minconn': int(os.getenv('DB_POOL_MIN', 1)),
+    'maxconn': int(os.getenv('DB_POOL_MAX', 10)),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', 30)),
+}
+# Clase de las conexiones psycopg2: InstrumentedConnection con SQL_INSTRUMENTATION
+_connection_factory = None
+
+
+def configure_pool(minconn=None, maxconn=None, timeout=None, instrumented=None):
+    """
+    Ajusta el tamaño del pool y si sus conexiones se instrumentan
+    (InstrumentedConnection). Si el pool ya estaba creado se cierra y se vuelve
+    a crear con la nueva configuración en el siguiente uso.
+    """
+    global _pool, _connection_factory
+    with _pool_lock:
+        if minconn is not None:
+            _pool_settings['minconn'] = int(minconn)
+        if maxconn is not None:
+            _pool_settings['maxconn'] = int(maxconn)
+        if timeout is not None:
+            _pool_settings['timeout'] = float(timeout)
+        if instrumented is not None:
+            _connection_factory = InstrumentedConnection if instrumented else None
+        anterior, _pool = _pool, None
+    if anterior is not None:
+        anterior.closeall()
+
+
+# Engine de SQLAlchemy cuyo pool se comparte (DB_POOL_BACKEND = 'sqlalchemy')
+_engine = None
+
+
+def use_engine(engine):
+    """
+    Hace que get_pool() preste las conexiones del pool de `engine` (EnginePool).
+    Con None se vuelve al ConnectionPool propio de psycopg2.
+    """
+    global _pool, _engine
+    with _pool_lock:
+        _engine = engine
+        anterior, _pool = _pool, None
+    if isinstance(anterior, ConnectionPool):
+        anterior.closeall()
+
+
+def get_pool():
+    """Devuelve el pool del proceso, creándolo en el primer uso."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                if _engine is not None:
+                    _pool = EnginePool(_engine)
+                else:
+                    _pool = ConnectionPool(**_pool_settings, connection_factory=_connection_factory, **DB_CONFIG)
+    return _pool
+
+
+# Réplica de lectura opcional (DB_REPLICA_DSN). Sin DSN todas las lecturas van a la primaria.
+_replica_pool = None
+_replica_settings = {
+    'dsn': os.getenv('DB_REPLICA_DSN') or None,
+    'pin_seconds': float(os.getenv('DB_REPLICA_PIN_SECONDS', 5)),
+    'retry': float(os.getenv('DB_REPLICA_RETRY', 30)),
+}
+# Momento (monotonic) hasta el cual la réplica se considera caída tras un fallo
+_replica_down_until = 0.0
+_METODOS_SEGUROS = ('GET', 'HEAD', 'OPTIONS')
+_PIN_SESSION_KEY = '_db_primary_until'
+
+logger = logging.getLogger(__name__)
+
+
+def configure_replica(dsn=None, pin_seconds=None, retry=None):
+    """
+    Configura la réplica de lectura. `pin_seconds` es cuánto tiempo, tras una
+    escritura, las lecturas de esa sesión siguen yendo a la primaria (0 lo
+    desactiva). `retry` es cuántos segundos se evita la réplica tras un fallo.
+    """
+    global _replica_pool, _replica_down_until
+    with _pool_lock:
+        if dsn is not None:
+            _replica_settings['dsn'] = dsn or None
+        if pin_seconds is not None:
+            _replica_settings['pin_seconds'] = float(pin_seconds)
+        if retry is not None:
+            _replica_settings['retry'] = float(retry)
+        anterior, _replica_pool = _replica_pool, None
+        _replica_down_until = 0.0
+    if anterior is not None:
+        anterior.closeall()
+
+
+def get_replica_pool():
+    """Devuelve el pool de la réplica, o None si no hay réplica configurada."""
+    global _replica_pool
+    if _replica_settings['dsn'] is None:
+        return None
+    if _replica_pool is None:
+        with _pool_lock:
+            if _replica_pool is None:
+                _replica_pool = ConnectionPool(
+                    0, _pool_settings['maxconn'], _pool_settings['timeout'],
+                    dsn=_replica_settings['dsn'], connection_factory=_connection_factory,
+                )
+    return _replica_pool
+
+
+def _lecturas_en_primaria():
+    """
+    Las lecturas van a la primaria durante requests de escritura (POST, etc.)
+    y en las sesiones que escribieron hace menos de `pin_seconds`, para que el
+    usuario vea siempre sus propios cambios aunque la réplica tenga retraso.
+    """
+    if not has_request_context():
+        return False
+    if request.method not in _METODOS_SEGUROS:
+        return True
+    return session.get(_PIN_SESSION_KEY, 0) > time.time()
+
+
+def get_read_connection():
+    """
+    Conexión para consultas de sólo lectura: la réplica si está configurada y
+    disponible, o la conexión primaria del request en caso contrario.
+    """
+    global _replica_down_until
+    if not has_app_context() or _lecturas_en_primaria():
+        return get_db_connection()
+    if 'db_read_conn' in g:
+        return g.db_read_conn
+    replica = get_replica_pool()
+    if replica is None or time.monotonic() < _replica_down_until:
+        return get_db_connection()
+    try:
+        g.db_read_conn = replica.getconn()
+    except (psycopg2.OperationalError, PoolError) as e:
+        _replica_down_until = time.monotonic() + _replica_settings['retry']
+        logger.warning("Réplica de lectura no disponible, se usa la primaria: %s", e)
+        return get_db_connection()
+    return g.db_read_conn
+
+
+def pin_primary_after_write(response):
+    """after_request: fija las lecturas de la sesión a la primaria tras una escritura."""
+    if (request.method not in _METODOS_SEGUROS and 'db_conn' in g
+            and _replica_settings['dsn'] and _replica_settings['pin_seconds'] > 0):
+        session[_PIN_SESSION_KEY] = time.time() + _replica_settings['pin_seconds']
+    return response
+
+
 """ 
-    Función para obtener una conexión a la base de datos
-    Retorna una conexión a la base de datos
+    Función para obtener una conexión a la base de datos.
+    Dentro de un request (o app context) devuelve siempre la misma conexión,
+    prestada por el pool la primera vez y devuelta en el teardown del request.
+    Fuera de un app context entrega una conexión del pool que se debe devolver
+    con release_db_connection(conn).
 """
 
+# Conexión ligada al hilo actual fuera de un contexto de Flask (ver `connection`).
+_local = threading.local()
+
+
 def get_db_connection():
-    conn = psycopg2.connect(
-        host= '10.7.196.122',
-        database= 'gestion',
-        user= 'usuariopbi',
-        password= '@@usuariopbi@@'
+    if has_app_context():
+        if 'db_conn' not in g:
+            g.db_conn = get_pool().getconn()
+        return g.db_conn
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        return conn
+    return get_pool().getconn()
+
+
+@contextmanager
+def connection(conn=None):
+    """
+    Garantiza una única conexión del pool durante el bloque y su devolución al
+    salir, también fuera de un request (scripts, tareas, consola). Dentro del
+    bloque, los repositorios reutilizan esa misma conexión.
+
+    Con `conn`, los repositorios usan esa conexión del llamador (p. ej. un script
+    conectado a otra base que DB_CONFIG), que no se devuelve al pool. Sólo fuera
+    de un contexto de aplicación: en un request se usa la conexión del request.
+    """
+    if conn is not None:
+        if has_app_context():
+            raise RuntimeError("connection(conn) no se puede usar dentro de un contexto de aplicación")
+        anterior = getattr(_local, 'conn', None)
+        _local.conn = conn
+        try:
+            yield conn
+        finally:
+            _local.conn = anterior
+        return
+    if has_app_context():
+        yield get_db_connection()
+        return
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        # Bloque anidado: la conexión la devuelve el bloque exterior
+        yield conn
+        return
+    conn = get_pool().getconn()
+    _local.conn = conn
+    try:
+        yield conn
+    finally:
+        _local.conn = None
+        get_pool().putconn(conn)
+
+
+def release_db_connection(conn=None):
+    """
+    Devuelve una conexión al pool. Sin argumentos libera la conexión del
+    request actual (si la hay).
+    """
+    if conn is None:
+        if not has_app_context():
+            return
+        conn = g.pop('db_conn', None)
+        if conn is None:
+            return
+    elif has_app_context() and g.get('db_conn') is conn:
+        g.pop('db_conn')
+    get_pool().putconn(conn)
+
+
+def close_db_connection(exc=None):
+    """Teardown de Flask: devuelve a sus pools las conexiones usadas por el request."""
+    release_db_connection()
+    conn = g.pop('db_read_conn', None)
+    if conn is not None:
+        get_replica_pool().putconn(conn)
+
+
+# Pools heredados del proceso padre tras un fork. Se mantienen referenciados y
+# sin cerrar: cerrarlos (o dejar que el GC lo haga) enviaría el fin de sesión
+# por sockets que el padre sigue usando.
+_inherited_pools = []
+# Engines de Flask-SQLAlchemy de las apps creadas en el proceso (ver init_app)
+_engines = weakref.WeakSet()
+
+
+def _reset_after_fork():
+    """
+    En el proceso hijo: olvida los pools del padre para abrir conexiones propias.
+    Los engines de SQLAlchemy se vacían con close=False por la misma razón.
+    """
+    global _pool, _replica_pool, _pool_lock, _local, _replica_down_until
+    _inherited_pools.extend(p for p in (_pool, _replica_pool) if p is not None)
+    for engine in list(_engines):
+        engine.dispose(close=False)
+    _pool = None
+    _replica_pool = None
+    _pool_lock = threading.Lock()
+    _local = threading.local()
+    _replica_down_until = 0.0
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def init_app(app):
+    configure_pool(
+        app.config.get('DB_POOL_MIN'),
+        app.config.get('DB_POOL_MAX'),
+        app.config.get('DB_POOL_TIMEOUT'),
+        app.config.get('SQL_INSTRUMENTATION', False),
     )
-    return conn
+    # Llamar después de db.init_app
+    from extensions import db
+    with app.app_context():
+        engine = db.engine
+    _engines.add(engine)
+    if app.config.get('DB_POOL_BACKEND', 'psycopg2') == 'sqlalchemy':
+        # Un solo pool por proceso: el del engine de Flask-SQLAlchemy
+        use_engine(engine)
+    else:
+        use_engine(None)
+    configure_replica(
+        app.config.get('DB_REPLICA_DSN'),
+        app.config.get('DB_REPLICA_PIN_SECONDS'),
+        app.config.get('DB_REPLICA_RETRY'),
+    )
+    app.after_request(pin_primary_after_write)
+    app.teardown_appcontext(close_db_connection)
+
 """
 def get_db_connection():
     conn = psycopg2.connect(
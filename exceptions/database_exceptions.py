@@ -0,0 +1,13 @@
+class PoolError(Exception):
+    """Clase base para errores del pool de conexiones"""
+    pass
+
+class PoolTimeoutError(PoolError):
+    """Se lanza cuando no se obtiene una conexión del pool dentro del tiempo de espera"""
+    def __init__(self, message="No hay conexiones disponibles en el pool"):
+        self.message = message
+        super().__init__(self.message)
+
+class MigracionError(Exception):
+    """Se lanza cuando una migración del esquema no se puede aplicar"""
+    pass
@@ -0,0 +1,9 @@
+class DepartamentoError(Exception):
+    """Clase base para excepciones de departamentos"""
+    pass
+
+class JerarquiaCiclicaError(DepartamentoError):
+    """Se lanza cuando el nuevo padre de un departamento es el propio departamento o uno de sus subordinados"""
+    def __init__(self, message="Un departamento no puede depender de sí mismo ni de uno de sus subordinados"):
+        self.message = message
+        super().__init__(self.message)
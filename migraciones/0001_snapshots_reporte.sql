@@ -0,0 +1,143 @@
+-- Snapshots de reportes (ver repositories/reporte_snapshot_repository.py)
+-- Agregados por departamento y por persona que lee /api/report_data (los totales
+-- por día están en compromiso_diario, migración 0003).
+-- Los triggers sólo marcan el departamento afectado como pendiente; la aplicación
+-- recalcula esos departamentos antes de leer si el cambio pendiente más antiguo
+-- supera REPORT_SNAPSHOT_MAX_STALENESS. Compromisos sin departamento se guardan con id 0.
+-- TRUNCATE no tiene filas que marcar: vacía directamente los snapshots que dependen
+-- de la tabla vaciada (sin compromisos o sin referentes no queda nada que agregar).
+CREATE TABLE IF NOT EXISTS reporte_snapshot_departamento (
+    id_departamento INT PRIMARY KEY,
+    total INT NOT NULL,
+    pendientes INT NOT NULL,
+    completados INT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS reporte_snapshot_persona (
+    id_persona INT NOT NULL,
+    id_departamento INT NOT NULL,
+    total INT NOT NULL,
+    pendientes INT NOT NULL,
+    completados INT NOT NULL,
+    PRIMARY KEY (id_persona, id_departamento)
+);
+CREATE INDEX IF NOT EXISTS idx_reporte_snapshot_persona_departamento ON reporte_snapshot_persona(id_departamento);
+
+-- Departamentos con cambios sin recalcular; desde = primer cambio pendiente
+CREATE TABLE IF NOT EXISTS reporte_snapshot_pendiente (
+    id_departamento INT PRIMARY KEY,
+    desde TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    cambios INT NOT NULL DEFAULT 1
+);
+
+-- ON CONFLICT DO UPDATE (y no DO NOTHING) bloquea la fila hasta que la transacción que
+-- escribe termine, así el recálculo que la reclama ve siempre el cambio ya confirmado.
+CREATE OR REPLACE FUNCTION marcar_reporte_pendiente_compromiso()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM reporte_snapshot_departamento;
+        DELETE FROM reporte_snapshot_persona;
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO reporte_snapshot_pendiente (id_departamento)
+        SELECT DISTINCT COALESCE(id_departamento, 0) FROM nuevas
+        ON CONFLICT (id_departamento) DO UPDATE SET cambios = reporte_snapshot_pendiente.cambios + 1;
+    ELSIF TG_OP = 'DELETE' THEN
+        INSERT INTO reporte_snapshot_pendiente (id_departamento)
+        SELECT DISTINCT COALESCE(id_departamento, 0) FROM viejas
+        ON CONFLICT (id_departamento) DO UPDATE SET cambios = reporte_snapshot_pendiente.cambios + 1;
+    ELSE
+        -- Sólo importan los cambios de estado o departamento (los totales por día
+        -- están en compromiso_diario)
+        INSERT INTO reporte_snapshot_pendiente (id_departamento)
+        SELECT DISTINCT v.dep FROM (
+            SELECT COALESCE(n.id_departamento, 0) AS dep_nuevo, COALESCE(o.id_departamento, 0) AS dep_anterior
+            FROM nuevas n
+            JOIN viejas o ON o.id = n.id
+            WHERE (n.estado, n.id_departamento)
+                  IS DISTINCT FROM (o.estado, o.id_departamento)
+        ) cambios, LATERAL (VALUES (cambios.dep_nuevo), (cambios.dep_anterior)) AS v(dep)
+        ON CONFLICT (id_departamento) DO UPDATE SET cambios = reporte_snapshot_pendiente.cambios + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION marcar_reporte_pendiente_persona_compromiso()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM reporte_snapshot_persona;
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO reporte_snapshot_pendiente (id_departamento)
+        SELECT DISTINCT COALESCE(c.id_departamento, 0)
+        FROM nuevas n JOIN compromiso c ON c.id = n.id_compromiso
+        ON CONFLICT (id_departamento) DO UPDATE SET cambios = reporte_snapshot_pendiente.cambios + 1;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        INSERT INTO reporte_snapshot_pendiente (id_departamento)
+        SELECT DISTINCT COALESCE(c.id_departamento, 0)
+        FROM viejas o JOIN compromiso c ON c.id = o.id_compromiso
+        ON CONFLICT (id_departamento) DO UPDATE SET cambios = reporte_snapshot_pendiente.cambios + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Triggers por sentencia con tablas de transición: una carga masiva marca cada
+-- departamento una sola vez
+DROP TRIGGER IF EXISTS trg_reporte_compromiso_insert ON compromiso;
+CREATE TRIGGER trg_reporte_compromiso_insert
+AFTER INSERT ON compromiso
+REFERENCING NEW TABLE AS nuevas
+FOR EACH STATEMENT EXECUTE FUNCTION marcar_reporte_pendiente_compromiso();
+
+DROP TRIGGER IF EXISTS trg_reporte_compromiso_update ON compromiso;
+CREATE TRIGGER trg_reporte_compromiso_update
+AFTER UPDATE ON compromiso
+REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+FOR EACH STATEMENT EXECUTE FUNCTION marcar_reporte_pendiente_compromiso();
+
+DROP TRIGGER IF EXISTS trg_reporte_compromiso_delete ON compromiso;
+CREATE TRIGGER trg_reporte_compromiso_delete
+AFTER DELETE ON compromiso
+REFERENCING OLD TABLE AS viejas
+FOR EACH STATEMENT EXECUTE FUNCTION marcar_reporte_pendiente_compromiso();
+
+DROP TRIGGER IF EXISTS trg_reporte_compromiso_truncate ON compromiso;
+CREATE TRIGGER trg_reporte_compromiso_truncate
+AFTER TRUNCATE ON compromiso
+FOR EACH STATEMENT EXECUTE FUNCTION marcar_reporte_pendiente_compromiso();
+
+DROP TRIGGER IF EXISTS trg_reporte_persona_compromiso_insert ON persona_compromiso;
+CREATE TRIGGER trg_reporte_persona_compromiso_insert
+AFTER INSERT ON persona_compromiso
+REFERENCING NEW TABLE AS nuevas
+FOR EACH STATEMENT EXECUTE FUNCTION marcar_reporte_pendiente_persona_compromiso();
+
+DROP TRIGGER IF EXISTS trg_reporte_persona_compromiso_update ON persona_compromiso;
+CREATE TRIGGER trg_reporte_persona_compromiso_update
+AFTER UPDATE ON persona_compromiso
+REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+FOR EACH STATEMENT EXECUTE FUNCTION marcar_reporte_pendiente_persona_compromiso();
+
+DROP TRIGGER IF EXISTS trg_reporte_persona_compromiso_delete ON persona_compromiso;
+CREATE TRIGGER trg_reporte_persona_compromiso_delete
+AFTER DELETE ON persona_compromiso
+REFERENCING OLD TABLE AS viejas
+FOR EACH STATEMENT EXECUTE FUNCTION marcar_reporte_pendiente_persona_compromiso();
+
+DROP TRIGGER IF EXISTS trg_reporte_persona_compromiso_truncate ON persona_compromiso;
+CREATE TRIGGER trg_reporte_persona_compromiso_truncate
+AFTER TRUNCATE ON persona_compromiso
+FOR EACH STATEMENT EXECUTE FUNCTION marcar_reporte_pendiente_persona_compromiso();
+
+-- Carga inicial: todos los departamentos pendientes con fecha -infinity, de modo que
+-- la primera lectura del reporte construye los snapshots sin esperar la cota
+INSERT INTO reporte_snapshot_pendiente (id_departamento, desde)
+SELECT DISTINCT COALESCE(id_departamento, 0), '-infinity'::timestamp FROM compromiso
+ON CONFLICT (id_departamento) DO UPDATE SET desde = '-infinity';
@@ -0,0 +1,105 @@
+-- Jerarquía de departamentos precalculada (tabla de clausura)
+-- Una fila por cada par ancestro/descendiente, incluido el propio departamento con
+-- profundidad 0. ruta son los nombres desde el ancestro hasta el descendiente separados
+-- por ' > '. Los triggers sobre departamento la reconstruyen al cambiar un padre o un nombre.
+CREATE TABLE IF NOT EXISTS departamento_jerarquia (
+    id_ancestro INT NOT NULL,
+    id_descendiente INT NOT NULL,
+    profundidad INT NOT NULL,
+    ruta TEXT NOT NULL,
+    PRIMARY KEY (id_ancestro, id_descendiente)
+);
+CREATE INDEX IF NOT EXISTS idx_departamento_jerarquia_descendiente
+    ON departamento_jerarquia(id_descendiente, profundidad);
+
+-- Versión de la jerarquía: los procesos recargan su árbol de departamentos en memoria
+-- (repositories/departamento_tree.py) cuando cambia
+CREATE TABLE IF NOT EXISTS departamento_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO departamento_version (id, version) VALUES (TRUE, 0) ON CONFLICT (id) DO NOTHING;
+
+-- La tabla es pequeña (departamentos x niveles): se reconstruye completa
+CREATE OR REPLACE FUNCTION reconstruir_departamento_jerarquia()
+RETURNS VOID AS $$
+BEGIN
+    -- Serializa reconstrucciones concurrentes
+    PERFORM pg_advisory_xact_lock(hashtext('departamento_jerarquia'));
+    IF EXISTS (
+        WITH RECURSIVE arbol AS (
+            SELECT id AS id_ancestro, id AS id_descendiente, ARRAY[id] AS ids, FALSE AS ciclo
+            FROM departamento
+            UNION ALL
+            SELECT a.id_ancestro, d.id, a.ids || d.id, d.id = ANY(a.ids)
+            FROM departamento d
+            JOIN arbol a ON d.id_departamento_padre = a.id_descendiente
+            WHERE NOT a.ciclo
+        )
+        SELECT 1 FROM arbol WHERE ciclo
+    ) THEN
+        RAISE EXCEPTION 'La jerarquía de departamentos contiene un ciclo' USING ERRCODE = 'check_violation';
+    END IF;
+
+    DELETE FROM departamento_jerarquia;
+    INSERT INTO departamento_jerarquia (id_ancestro, id_descendiente, profundidad, ruta)
+    WITH RECURSIVE arbol AS (
+        SELECT id AS id_ancestro, id AS id_descendiente, 0 AS profundidad, CAST(name AS TEXT) AS ruta
+        FROM departamento
+        UNION ALL
+        SELECT a.id_ancestro, d.id, a.profundidad + 1, a.ruta || ' > ' || d.name
+        FROM departamento d
+        JOIN arbol a ON d.id_departamento_padre = a.id_descendiente
+    )
+    SELECT id_ancestro, id_descendiente, profundidad, ruta FROM arbol;
+
+    UPDATE departamento_version SET version = version + 1;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION actualizar_departamento_jerarquia()
+RETURNS TRIGGER AS $$
+BEGIN
+    -- En UPDATE sólo importan los cambios de padre o de nombre. La consulta va en
+    -- su propio IF: en INSERT no existe viejas y en DELETE no existe nuevas, y
+    -- PL/pgSQL prepara la expresión completa de una condición
+    IF TG_OP = 'UPDATE' THEN
+        IF NOT EXISTS (
+            SELECT 1 FROM nuevas n LEFT JOIN viejas o ON o.id = n.id
+            WHERE o.id IS NULL
+               OR (n.id_departamento_padre, n.name) IS DISTINCT FROM (o.id_departamento_padre, o.name)
+        ) THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+    PERFORM reconstruir_departamento_jerarquia();
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_departamento_jerarquia_insert ON departamento;
+CREATE TRIGGER trg_departamento_jerarquia_insert
+AFTER INSERT ON departamento
+REFERENCING NEW TABLE AS nuevas
+FOR EACH STATEMENT EXECUTE FUNCTION actualizar_departamento_jerarquia();
+
+DROP TRIGGER IF EXISTS trg_departamento_jerarquia_update ON departamento;
+CREATE TRIGGER trg_departamento_jerarquia_update
+AFTER UPDATE ON departamento
+REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+FOR EACH STATEMENT EXECUTE FUNCTION actualizar_departamento_jerarquia();
+
+DROP TRIGGER IF EXISTS trg_departamento_jerarquia_delete ON departamento;
+CREATE TRIGGER trg_departamento_jerarquia_delete
+AFTER DELETE ON departamento
+REFERENCING OLD TABLE AS viejas
+FOR EACH STATEMENT EXECUTE FUNCTION actualizar_departamento_jerarquia();
+
+-- TRUNCATE no admite tablas de transición: reconstruye (y deja vacía) la jerarquía
+DROP TRIGGER IF EXISTS trg_departamento_jerarquia_truncate ON departamento;
+CREATE TRIGGER trg_departamento_jerarquia_truncate
+AFTER TRUNCATE ON departamento
+FOR EACH STATEMENT EXECUTE FUNCTION actualizar_departamento_jerarquia();
+
+-- Carga inicial
+SELECT reconstruir_departamento_jerarquia();
@@ -0,0 +1,184 @@
+-- Totales diarios para los gráficos por día (ver repositories/reporte_diario_repository.py)
+-- Se mantienen en cada escritura: los triggers suman y restan las filas insertadas,
+-- borradas o modificadas, y TRUNCATE las vacía. Compromisos sin departamento se guardan con id 0 y las filas
+-- sin fecha de creación con dia = '-infinity'. Para reconstruirlos:
+--     flask --app app reporte-diario-backfill [--desde AAAA-MM-DD]
+-- Reemplazan a reporte_snapshot_dia.
+DROP TABLE IF EXISTS reporte_snapshot_dia;
+
+CREATE TABLE IF NOT EXISTS compromiso_diario (
+    dia DATE NOT NULL,
+    id_departamento INT NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    pendientes INT NOT NULL DEFAULT 0,
+    completados INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dia, id_departamento)
+);
+CREATE INDEX IF NOT EXISTS idx_compromiso_diario_departamento ON compromiso_diario(id_departamento, dia);
+
+CREATE TABLE IF NOT EXISTS reunion_diaria (
+    dia DATE PRIMARY KEY,
+    total INT NOT NULL DEFAULT 0
+);
+
+-- Suma (signo 1) o resta (signo -1) filas de compromiso en los totales diarios.
+-- ORDER BY fija el orden de bloqueo entre sesiones concurrentes.
+CREATE OR REPLACE FUNCTION sumar_compromiso_diario(dias DATE[], departamentos INT[], estados TEXT[], signos INT[])
+RETURNS VOID AS $$
+    INSERT INTO compromiso_diario AS t (dia, id_departamento, total, pendientes, completados)
+    SELECT dia, id_departamento, SUM(signo),
+           COALESCE(SUM(signo) FILTER (WHERE estado = 'Pendiente'), 0),
+           COALESCE(SUM(signo) FILTER (WHERE estado = 'Completado'), 0)
+    FROM unnest(dias, departamentos, estados, signos) AS cambios(dia, id_departamento, estado, signo)
+    GROUP BY dia, id_departamento
+    ORDER BY dia, id_departamento
+    ON CONFLICT (dia, id_departamento) DO UPDATE
+    SET total = t.total + EXCLUDED.total,
+        pendientes = t.pendientes + EXCLUDED.pendientes,
+        completados = t.completados + EXCLUDED.completados;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION acumular_compromiso_diario()
+RETURNS TRIGGER AS $$
+DECLARE
+    c RECORD;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM compromiso_diario;
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(COALESCE(fecha_creacion::date, '-infinity')) AS dias,
+               array_agg(COALESCE(id_departamento, 0)) AS departamentos,
+               array_agg(estado::text) AS estados, array_agg(1) AS signos
+        INTO c FROM nuevas;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(COALESCE(fecha_creacion::date, '-infinity')) AS dias,
+               array_agg(COALESCE(id_departamento, 0)) AS departamentos,
+               array_agg(estado::text) AS estados, array_agg(-1) AS signos
+        INTO c FROM viejas;
+    ELSE
+        -- Sólo las filas que cambian de estado, departamento o día: resta la versión
+        -- anterior y suma la nueva
+        SELECT array_agg(v.dia) AS dias, array_agg(v.id_departamento) AS departamentos,
+               array_agg(v.estado) AS estados, array_agg(v.signo) AS signos
+        INTO c
+        FROM nuevas n
+        JOIN viejas o ON o.id = n.id
+        CROSS JOIN LATERAL (VALUES
+            (COALESCE(n.fecha_creacion::date, '-infinity'), COALESCE(n.id_departamento, 0), n.estado::text, 1),
+            (COALESCE(o.fecha_creacion::date, '-infinity'), COALESCE(o.id_departamento, 0), o.estado::text, -1)
+        ) AS v(dia, id_departamento, estado, signo)
+        WHERE (n.estado, n.id_departamento, n.fecha_creacion::date)
+              IS DISTINCT FROM (o.estado, o.id_departamento, o.fecha_creacion::date);
+    END IF;
+    IF c.dias IS NOT NULL THEN
+        PERFORM sumar_compromiso_diario(c.dias, c.departamentos, c.estados, c.signos);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION sumar_reunion_diaria(dias DATE[], signos INT[])
+RETURNS VOID AS $$
+    INSERT INTO reunion_diaria AS t (dia, total)
+    SELECT dia, SUM(signo)
+    FROM unnest(dias, signos) AS cambios(dia, signo)
+    GROUP BY dia
+    ORDER BY dia
+    ON CONFLICT (dia) DO UPDATE SET total = t.total + EXCLUDED.total;
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION acumular_reunion_diaria()
+RETURNS TRIGGER AS $$
+DECLARE
+    c RECORD;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM reunion_diaria;
+        RETURN NULL;
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(COALESCE(fecha_creacion::date, '-infinity')) AS dias, array_agg(1) AS signos
+        INTO c FROM nuevas;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(COALESCE(fecha_creacion::date, '-infinity')) AS dias, array_agg(-1) AS signos
+        INTO c FROM viejas;
+    ELSE
+        SELECT array_agg(v.dia) AS dias, array_agg(v.signo) AS signos
+        INTO c
+        FROM nuevas n
+        JOIN viejas o ON o.id = n.id
+        CROSS JOIN LATERAL (VALUES
+            (COALESCE(n.fecha_creacion::date, '-infinity'), 1),
+            (COALESCE(o.fecha_creacion::date, '-infinity'), -1)
+        ) AS v(dia, signo)
+        WHERE n.fecha_creacion::date IS DISTINCT FROM o.fecha_creacion::date;
+    END IF;
+    IF c.dias IS NOT NULL THEN
+        PERFORM sumar_reunion_diaria(c.dias, c.signos);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_compromiso_diario_insert ON compromiso;
+CREATE TRIGGER trg_compromiso_diario_insert
+AFTER INSERT ON compromiso
+REFERENCING NEW TABLE AS nuevas
+FOR EACH STATEMENT EXECUTE FUNCTION acumular_compromiso_diario();
+
+DROP TRIGGER IF EXISTS trg_compromiso_diario_update ON compromiso;
+CREATE TRIGGER trg_compromiso_diario_update
+AFTER UPDATE ON compromiso
+REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+FOR EACH STATEMENT EXECUTE FUNCTION acumular_compromiso_diario();
+
+DROP TRIGGER IF EXISTS trg_compromiso_diario_delete ON compromiso;
+CREATE TRIGGER trg_compromiso_diario_delete
+AFTER DELETE ON compromiso
+REFERENCING OLD TABLE AS viejas
+FOR EACH STATEMENT EXECUTE FUNCTION acumular_compromiso_diario();
+
+-- TRUNCATE no admite tablas de transición ni dispara los triggers de DELETE
+DROP TRIGGER IF EXISTS trg_compromiso_diario_truncate ON compromiso;
+CREATE TRIGGER trg_compromiso_diario_truncate
+AFTER TRUNCATE ON compromiso
+FOR EACH STATEMENT EXECUTE FUNCTION acumular_compromiso_diario();
+
+DROP TRIGGER IF EXISTS trg_reunion_diaria_insert ON reunion;
+CREATE TRIGGER trg_reunion_diaria_insert
+AFTER INSERT ON reunion
+REFERENCING NEW TABLE AS nuevas
+FOR EACH STATEMENT EXECUTE FUNCTION acumular_reunion_diaria();
+
+DROP TRIGGER IF EXISTS trg_reunion_diaria_update ON reunion;
+CREATE TRIGGER trg_reunion_diaria_update
+AFTER UPDATE ON reunion
+REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+FOR EACH STATEMENT EXECUTE FUNCTION acumular_reunion_diaria();
+
+DROP TRIGGER IF EXISTS trg_reunion_diaria_delete ON reunion;
+CREATE TRIGGER trg_reunion_diaria_delete
+AFTER DELETE ON reunion
+REFERENCING OLD TABLE AS viejas
+FOR EACH STATEMENT EXECUTE FUNCTION acumular_reunion_diaria();
+
+DROP TRIGGER IF EXISTS trg_reunion_diaria_truncate ON reunion;
+CREATE TRIGGER trg_reunion_diaria_truncate
+AFTER TRUNCATE ON reunion
+FOR EACH STATEMENT EXECUTE FUNCTION acumular_reunion_diaria();
+
+-- Carga inicial (equivale al backfill completo)
+DELETE FROM compromiso_diario;
+INSERT INTO compromiso_diario (dia, id_departamento, total, pendientes, completados)
+SELECT COALESCE(fecha_creacion::date, '-infinity'), COALESCE(id_departamento, 0), COUNT(*),
+       COUNT(*) FILTER (WHERE estado = 'Pendiente'), COUNT(*) FILTER (WHERE estado = 'Completado')
+FROM compromiso
+GROUP BY 1, 2;
+
+DELETE FROM reunion_diaria;
+INSERT INTO reunion_diaria (dia, total)
+SELECT COALESCE(fecha_creacion::date, '-infinity'), COUNT(*)
+FROM reunion
+GROUP BY 1;
@@ -0,0 +1,109 @@
+-- Versión de datos por tabla para los GET condicionales (ETag / Last-Modified) de
+-- /api/report_data y de las listas de áreas y orígenes (ver repositories/datos_version.py).
+-- Cada sentencia que escribe en una tabla vigilada inserta una fila en datos_cambio, en
+-- la misma transacción, así que una versión leída nunca es más nueva que los datos
+-- confirmados. Sólo se inserta: las escrituras concurrentes no se esperan entre sí.
+-- La versión de una tabla es datos_version.version más sus filas en datos_cambio.
+CREATE TABLE IF NOT EXISTS datos_version (
+    tabla TEXT PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0,
+    modificado TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS datos_cambio (
+    id BIGSERIAL PRIMARY KEY,
+    tabla TEXT NOT NULL,
+    modificado TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp()
+);
+
+CREATE INDEX IF NOT EXISTS idx_datos_cambio_tabla ON datos_cambio (tabla, modificado);
+
+-- Pasa a datos_version los cambios confirmados (o propios) de datos_cambio y los borra,
+-- en una sola sentencia: la suma de ambas tablas no cambia para ningún lector
+CREATE OR REPLACE FUNCTION acumular_cambios_datos()
+RETURNS VOID AS $$
+    WITH borrados AS (
+        DELETE FROM datos_cambio RETURNING tabla, modificado
+    )
+    INSERT INTO datos_version (tabla, version, modificado)
+    SELECT tabla, COUNT(*), MAX(modificado)
+    FROM borrados
+    GROUP BY tabla
+    ON CONFLICT (tabla) DO UPDATE
+    SET version = datos_version.version + EXCLUDED.version,
+        modificado = GREATEST(datos_version.modificado, EXCLUDED.modificado);
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION registrar_cambio_datos()
+RETURNS TRIGGER AS $$
+DECLARE
+    nuevo BIGINT;
+BEGIN
+    INSERT INTO datos_cambio (tabla) VALUES (TG_TABLE_NAME) RETURNING id INTO nuevo;
+    -- Cada 256 cambios se acumulan; si otra transacción lo está haciendo no se la espera
+    IF nuevo % 256 = 0 AND pg_try_advisory_xact_lock(hashtext('datos_cambio')) THEN
+        PERFORM acumular_cambios_datos();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_datos_version ON compromiso;
+CREATE TRIGGER trg_datos_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON compromiso
+FOR EACH STATEMENT EXECUTE FUNCTION registrar_cambio_datos();
+
+DROP TRIGGER IF EXISTS trg_datos_version ON persona_compromiso;
+CREATE TRIGGER trg_datos_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON persona_compromiso
+FOR EACH STATEMENT EXECUTE FUNCTION registrar_cambio_datos();
+
+DROP TRIGGER IF EXISTS trg_datos_version ON persona;
+CREATE TRIGGER trg_datos_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON persona
+FOR EACH STATEMENT EXECUTE FUNCTION registrar_cambio_datos();
+
+DROP TRIGGER IF EXISTS trg_datos_version ON persona_departamento;
+CREATE TRIGGER trg_datos_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON persona_departamento
+FOR EACH STATEMENT EXECUTE FUNCTION registrar_cambio_datos();
+
+DROP TRIGGER IF EXISTS trg_datos_version ON departamento;
+CREATE TRIGGER trg_datos_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON departamento
+FOR EACH STATEMENT EXECUTE FUNCTION registrar_cambio_datos();
+
+DROP TRIGGER IF EXISTS trg_datos_version ON reunion;
+CREATE TRIGGER trg_datos_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON reunion
+FOR EACH STATEMENT EXECUTE FUNCTION registrar_cambio_datos();
+
+DROP TRIGGER IF EXISTS trg_datos_version ON reunion_compromiso;
+CREATE TRIGGER trg_datos_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON reunion_compromiso
+FOR EACH STATEMENT EXECUTE FUNCTION registrar_cambio_datos();
+
+DROP TRIGGER IF EXISTS trg_datos_version ON compromisos_archivados;
+CREATE TRIGGER trg_datos_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON compromisos_archivados
+FOR EACH STATEMENT EXECUTE FUNCTION registrar_cambio_datos();
+
+DROP TRIGGER IF EXISTS trg_datos_version ON compromiso_eliminado;
+CREATE TRIGGER trg_datos_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON compromiso_eliminado
+FOR EACH STATEMENT EXECUTE FUNCTION registrar_cambio_datos();
+
+DROP TRIGGER IF EXISTS trg_datos_version ON area;
+CREATE TRIGGER trg_datos_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON area
+FOR EACH STATEMENT EXECUTE FUNCTION registrar_cambio_datos();
+
+DROP TRIGGER IF EXISTS trg_datos_version ON origen;
+CREATE TRIGGER trg_datos_version
+AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON origen
+FOR EACH STATEMENT EXECUTE FUNCTION registrar_cambio_datos();
+
+-- Carga inicial
+INSERT INTO datos_version (tabla)
+VALUES ('compromiso'), ('persona_compromiso'), ('persona'), ('persona_departamento'), ('departamento'), ('reunion'), ('reunion_compromiso'), ('compromisos_archivados'), ('compromiso_eliminado'), ('area'), ('origen')
+ON CONFLICT (tabla) DO NOTHING;
@@ -0,0 +1,6 @@
+-- sin transaccion
+-- Reporte de carga de trabajo por persona (ReportesRepository.get_workload): las
+-- personas de un conjunto de departamentos salen de este índice y sus asignaciones
+-- de la clave primaria (id_persona, id_compromiso) de persona_compromiso
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_persona_departamento_departamento
+ON persona_departamento (id_departamento, id_persona);
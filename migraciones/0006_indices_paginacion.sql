@@ -0,0 +1,21 @@
+-- sin transaccion
+-- Listados paginados de compromisos (repositories/paginacion.py): cada página se lee
+-- en orden de (fecha_limite, id) desde el cursor, por departamento (ver_compromisos
+-- del director) o sobre todos los departamentos visibles (compromisos compartidos).
+-- El índice por departamento sirve también para los filtros por fecha límite y evita
+-- uno sólo por id_departamento
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_compromiso_departamento_fecha_limite
+ON compromiso (id_departamento, fecha_limite, id);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_compromiso_fecha_limite
+ON compromiso (fecha_limite, id);
+
+-- fecha_creacion no cambia después del INSERT: el índice no impide las
+-- actualizaciones HOT. Avance no se indexa porque cambia en cada actualización
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_compromiso_fecha_creacion
+ON compromiso (fecha_creacion, id);
+
+-- Los referentes de las filas de una página se buscan por compromiso (también los
+-- usan la edición y el borrado en cascada)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_persona_compromiso_compromiso
+ON persona_compromiso (id_compromiso);
@@ -0,0 +1,139 @@
+-- Búsqueda de texto completo en compromisos (filtro `search` de CompromisoRepository).
+-- compromiso.busqueda reúne, con configuración spanish y sin tildes:
+--   A: descripción   B: referentes y nombre del departamento   C: comentarios
+-- y se mantiene con triggers en compromiso, persona_compromiso, persona y departamento.
+-- El índice GIN se construye aparte, sin bloquear escrituras (0008_indice_busqueda_compromisos).
+
+-- translate() en vez de la extensión unaccent: es IMMUTABLE (sirve en índices y en
+-- la columna mantenida) y no depende de que la extensión esté instalada
+CREATE OR REPLACE FUNCTION sin_acentos(texto TEXT)
+RETURNS TEXT AS $$
+    SELECT translate(texto, 'áéíóúüñàèìòùÁÉÍÓÚÜÑÀÈÌÒÙ', 'aeiouunaeiouAEIOUUNAEIOU')
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE OR REPLACE FUNCTION documento_compromiso(p_id INT, p_descripcion TEXT, p_comentario TEXT,
+                                                p_comentario_direccion TEXT, p_id_departamento INT)
+RETURNS tsvector AS $$
+    SELECT setweight(to_tsvector('spanish', sin_acentos(COALESCE(p_descripcion, ''))), 'A')
+        || setweight(to_tsvector('spanish', sin_acentos(COALESCE((
+               SELECT string_agg(p.name || ' ' || p.lastname, ' ')
+               FROM persona_compromiso pc
+               JOIN persona p ON p.id = pc.id_persona
+               WHERE pc.id_compromiso = p_id
+           ), ''))), 'B')
+        || setweight(to_tsvector('spanish', sin_acentos(COALESCE((
+               SELECT name FROM departamento WHERE id = p_id_departamento
+           ), ''))), 'B')
+        || setweight(to_tsvector('spanish', sin_acentos(
+               COALESCE(p_comentario, '') || ' ' || COALESCE(p_comentario_direccion, '')
+           )), 'C')
+$$ LANGUAGE sql STABLE;
+
+ALTER TABLE compromiso ADD COLUMN IF NOT EXISTS busqueda tsvector;
+
+CREATE OR REPLACE FUNCTION recalcular_busqueda_compromisos(ids INT[])
+RETURNS VOID AS $$
+    UPDATE compromiso c
+    SET busqueda = documento_compromiso(c.id, c.descripcion, c.comentario, c.comentario_direccion, c.id_departamento)
+    WHERE c.id = ANY(ids);
+$$ LANGUAGE sql;
+
+CREATE OR REPLACE FUNCTION asignar_busqueda_compromiso()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.busqueda := documento_compromiso(NEW.id, NEW.descripcion, NEW.comentario,
+                                         NEW.comentario_direccion, NEW.id_departamento);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- En UPDATE sólo si cambia algo del documento: las actualizaciones de avance o
+-- estado no recalculan nada (y siguen siendo HOT)
+DROP TRIGGER IF EXISTS trg_busqueda_compromiso_insert ON compromiso;
+CREATE TRIGGER trg_busqueda_compromiso_insert
+BEFORE INSERT ON compromiso
+FOR EACH ROW EXECUTE FUNCTION asignar_busqueda_compromiso();
+
+DROP TRIGGER IF EXISTS trg_busqueda_compromiso_update ON compromiso;
+CREATE TRIGGER trg_busqueda_compromiso_update
+BEFORE UPDATE OF descripcion, comentario, comentario_direccion, id_departamento ON compromiso
+FOR EACH ROW
+WHEN ((OLD.descripcion, OLD.comentario, OLD.comentario_direccion, OLD.id_departamento)
+      IS DISTINCT FROM (NEW.descripcion, NEW.comentario, NEW.comentario_direccion, NEW.id_departamento))
+EXECUTE FUNCTION asignar_busqueda_compromiso();
+
+CREATE OR REPLACE FUNCTION actualizar_busqueda_persona_compromiso()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM recalcular_busqueda_compromisos(ARRAY(SELECT DISTINCT id_compromiso FROM nuevas));
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        PERFORM recalcular_busqueda_compromisos(ARRAY(SELECT DISTINCT id_compromiso FROM viejas));
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION actualizar_busqueda_persona()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM recalcular_busqueda_compromisos(ARRAY(
+        SELECT DISTINCT pc.id_compromiso
+        FROM nuevas n
+        JOIN viejas o ON o.id = n.id
+        JOIN persona_compromiso pc ON pc.id_persona = n.id
+        WHERE (n.name, n.lastname) IS DISTINCT FROM (o.name, o.lastname)
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION actualizar_busqueda_departamento()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM recalcular_busqueda_compromisos(ARRAY(
+        SELECT c.id
+        FROM nuevas n
+        JOIN viejas o ON o.id = n.id
+        JOIN compromiso c ON c.id_departamento = n.id
+        WHERE n.name IS DISTINCT FROM o.name
+    ));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_busqueda_persona_compromiso_insert ON persona_compromiso;
+CREATE TRIGGER trg_busqueda_persona_compromiso_insert
+AFTER INSERT ON persona_compromiso
+REFERENCING NEW TABLE AS nuevas
+FOR EACH STATEMENT EXECUTE FUNCTION actualizar_busqueda_persona_compromiso();
+
+DROP TRIGGER IF EXISTS trg_busqueda_persona_compromiso_update ON persona_compromiso;
+CREATE TRIGGER trg_busqueda_persona_compromiso_update
+AFTER UPDATE ON persona_compromiso
+REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+FOR EACH STATEMENT EXECUTE FUNCTION actualizar_busqueda_persona_compromiso();
+
+DROP TRIGGER IF EXISTS trg_busqueda_persona_compromiso_delete ON persona_compromiso;
+CREATE TRIGGER trg_busqueda_persona_compromiso_delete
+AFTER DELETE ON persona_compromiso
+REFERENCING OLD TABLE AS viejas
+FOR EACH STATEMENT EXECUTE FUNCTION actualizar_busqueda_persona_compromiso();
+
+DROP TRIGGER IF EXISTS trg_busqueda_persona_update ON persona;
+CREATE TRIGGER trg_busqueda_persona_update
+AFTER UPDATE ON persona
+REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+FOR EACH STATEMENT EXECUTE FUNCTION actualizar_busqueda_persona();
+
+DROP TRIGGER IF EXISTS trg_busqueda_departamento_update ON departamento;
+CREATE TRIGGER trg_busqueda_departamento_update
+AFTER UPDATE ON departamento
+REFERENCING OLD TABLE AS viejas NEW TABLE AS nuevas
+FOR EACH STATEMENT EXECUTE FUNCTION actualizar_busqueda_departamento();
+
+-- Carga inicial
+UPDATE compromiso c
+SET busqueda = documento_compromiso(c.id, c.descripcion, c.comentario, c.comentario_direccion, c.id_departamento)
+WHERE c.busqueda IS NULL;
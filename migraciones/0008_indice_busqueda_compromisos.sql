@@ -0,0 +1,4 @@
+-- sin transaccion
+-- Índice de la búsqueda de texto completo en compromisos (columna busqueda, 0007)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_compromiso_busqueda
+ON compromiso USING GIN (busqueda);
@@ -0,0 +1,21 @@
+-- Búsqueda aproximada de personas (repositories/busqueda.py: condicion_persona).
+-- full_name es nombre y apellido en minúsculas y sin tildes (sin_acentos es de la
+-- migración 0007). Sus índices trigram están en 0010_indices_busqueda_personas.
+--
+-- Requisito: la extensión pg_trgm debe estar instalada en el servidor (viene en el
+-- paquete contrib de PostgreSQL, p. ej. postgresql-contrib en Debian/Ubuntu). Es una
+-- extensión confiable: la puede crear el dueño de la base, sin ser superusuario.
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm') THEN
+        RAISE EXCEPTION 'La extensión pg_trgm no está instalada en el servidor de PostgreSQL'
+            USING HINT = 'Instale el paquete contrib de PostgreSQL (p. ej. postgresql-contrib) '
+                         'y vuelva a ejecutar: flask --app app migrar';
+    END IF;
+END
+$$;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+ALTER TABLE persona ADD COLUMN IF NOT EXISTS full_name TEXT
+    GENERATED ALWAYS AS (lower(sin_acentos(COALESCE(name, '') || ' ' || COALESCE(lastname, '')))) STORED;
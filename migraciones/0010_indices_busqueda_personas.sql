@@ -0,0 +1,10 @@
+-- sin transaccion
+-- Búsqueda aproximada de personas (repositories/busqueda.py: condicion_persona).
+-- El índice trigram sirve tanto para LIKE '%texto%' como para la similitud por
+-- palabras (<%), que tolera errores de tipeo
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_persona_full_name_trgm
+ON persona USING GIN (full_name gin_trgm_ops);
+
+-- El buscador de funcionarios también busca por RUT
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_persona_rut_trgm
+ON persona USING GIN (rut gin_trgm_ops);
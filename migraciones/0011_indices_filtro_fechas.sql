@@ -0,0 +1,11 @@
+-- sin transaccion
+-- Filtros por mes y año (repositories/filtro_fechas.py): rangos sobre fecha_limite.
+-- Por departamento se usa idx_compromiso_departamento_fecha_limite; los conteos por
+-- estado recorren este índice. Cambiar el estado impide una actualización HOT, pero
+-- ocurre una o pocas veces por compromiso (a diferencia del avance, que no se indexa)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_compromiso_estado_fecha_limite
+ON compromiso (estado, fecha_limite);
+
+-- Reuniones por día filtradas por departamento, y años entre la primera y la última
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reunion_fecha_creacion
+ON reunion (fecha_creacion);
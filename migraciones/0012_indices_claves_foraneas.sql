@@ -0,0 +1,17 @@
+-- sin transaccion
+-- Índices de las claves foráneas por las que se hacen los joins y que ninguna
+-- migración anterior cubre. CONCURRENTLY no bloquea las escrituras mientras se
+-- construyen; IF NOT EXISTS permite repetir la migración si se interrumpe.
+-- persona_compromiso (id_compromiso) y compromiso (id_departamento) ya tienen
+-- índice en 0006_indices_paginacion.
+
+-- Reuniones de un compromiso (resumen por departamento, reuniones por día)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reunion_compromiso_compromiso
+ON reunion_compromiso (id_compromiso);
+
+-- Historial de modificaciones de un compromiso y ON DELETE CASCADE al borrarlo
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_compromiso_modificaciones_compromiso
+ON compromiso_modificaciones (id_compromiso);
+
+-- persona_departamento (id_persona) no necesita índice propio: es el prefijo de
+-- su clave primaria (id_persona, id_departamento)
@@ -0,0 +1,228 @@
+"""
+Migraciones versionadas del esquema.
+
+Cada archivo NNNN_descripcion.sql de este directorio es una migración. Se aplican
+en orden de versión y cada una queda registrada en schema_migraciones (versión,
+nombre, checksum y fecha), de modo que todos los ambientes terminan con el mismo
+diseño físico y ninguna migración se aplica dos veces. Los scripts completos
+(TABLES GENERATOR.sql, TABLAS NEW SQL.sql) crean sólo el esquema base; todo lo
+que se agregó después (snapshots, totales diarios, versiones de datos, búsqueda,
+índices) está aquí, así que una base nueva o existente queda al día con migrar.
+Las migraciones se escriben para poder aplicarse sobre una base que ya tenga
+esos objetos (IF NOT EXISTS, CREATE OR REPLACE, DROP TRIGGER IF EXISTS).
+
+Una migración corre en una sola transacción junto con su registro. Si su primera
+línea es "-- sin transaccion", sus sentencias se ejecutan de a una en autocommit,
+como exige CREATE INDEX CONCURRENTLY (que no bloquea las escrituras de la tabla).
+Esas sentencias deben poder repetirse (IF NOT EXISTS): si una falla, la migración
+no queda registrada y la próxima vez se ejecuta completa. Un CREATE INDEX
+CONCURRENTLY interrumpido deja un índice inválido que hay que borrar antes de
+reintentar; el error lo nombra.
+
+Un candado consultivo evita que dos procesos migren a la vez. Si cambió el
+archivo de una migración ya aplicada, se informa y no se vuelve a aplicar.
+
+    flask --app app migrar            # aplica las pendientes
+    flask --app app migrar --estado   # lista aplicadas, modificadas y pendientes
+"""
+import hashlib
+import os
+import re
+
+import click
+import psycopg2
+
+from database import DB_CONFIG
+from exceptions.database_exceptions import MigracionError
+
+DIRECTORIO = os.path.dirname(os.path.abspath(__file__))
+_ARCHIVO = re.compile(r'^(\d{4})_(\w+)\.sql$')
+_SIN_TRANSACCION = '-- sin transaccion'
+# $$ o $etiqueta$ (una etiqueta no empieza con dígito: $1 es un parámetro)
+_DOLAR = re.compile(r'\$(?:[A-Za-z_]\w*)?\$')
+_COMENTARIO = re.compile(r'--[^\n]*|/\*.*?\*/', re.DOTALL)
+# Clave del candado consultivo (pg_advisory_lock) de las migraciones
+_CANDADO = 7_310_425
+
+_TABLA = """
+    CREATE TABLE IF NOT EXISTS schema_migraciones (
+        version VARCHAR(4) PRIMARY KEY,
+        nombre TEXT NOT NULL,
+        checksum CHAR(64) NOT NULL,
+        aplicada TIMESTAMP NOT NULL DEFAULT now()
+    )
+"""
+
+
+class Migracion:
+    def __init__(self, version, nombre, ruta):
+        self.version = version
+        self.nombre = nombre
+        self.ruta = ruta
+        with open(ruta, encoding='utf-8') as archivo:
+            self.sql = archivo.read()
+        self.checksum = hashlib.sha256(self.sql.encode('utf-8')).hexdigest()
+        self.en_transaccion = not self.sql.lstrip().lower().startswith(_SIN_TRANSACCION)
+
+    def __repr__(self):
+        return f"{self.version}_{self.nombre}"
+
+
+def cargar_migraciones(directorio=DIRECTORIO):
+    """Migraciones del directorio en orden de versión. Lanza MigracionError si una versión se repite."""
+    migraciones = {}
+    for archivo in sorted(os.listdir(directorio)):
+        coincidencia = _ARCHIVO.match(archivo)
+        if not coincidencia:
+            continue
+        version, nombre = coincidencia.groups()
+        if version in migraciones:
+            raise MigracionError(f"Versión de migración repetida: {version}")
+        migraciones[version] = Migracion(version, nombre, os.path.join(directorio, archivo))
+    return list(migraciones.values())
+
+
+def sentencias(sql):
+    """
+    Divide un script en sentencias por los ';' que no están dentro de comillas,
+    comentarios o cuerpos $$...$$. Descarta las sentencias vacías.
+    """
+    resultado = []
+    inicio = 0
+    i = 0
+    while i < len(sql):
+        if sql.startswith('--', i):
+            fin = sql.find('\n', i)
+            i = len(sql) if fin == -1 else fin + 1
+        elif sql.startswith('/*', i):
+            fin = sql.find('*/', i + 2)
+            i = len(sql) if fin == -1 else fin + 2
+        elif sql[i] in "'\"":
+            # '' dentro de un texto es una comilla escapada: se sale y se vuelve a entrar
+            fin = sql.find(sql[i], i + 1)
+            i = len(sql) if fin == -1 else fin + 1
+        elif sql[i] == '$' and (etiqueta := _DOLAR.match(sql, i)):
+            fin = sql.find(etiqueta.group(), i + len(etiqueta.group()))
+            i = len(sql) if fin == -1 else fin + len(etiqueta.group())
+        elif sql[i] == ';':
+            resultado.append(sql[inicio:i])
+            inicio = i = i + 1
+        else:
+            i += 1
+    resultado.append(sql[inicio:])
+    return [s.strip() for s in resultado if _sin_comentarios(s).strip()]
+
+
+def _sin_comentarios(sentencia):
+    return _COMENTARIO.sub('', sentencia)
+
+
+def _aplicadas(cursor):
+    cursor.execute("SELECT version, checksum FROM schema_migraciones")
+    return dict(cursor.fetchall())
+
+
+def _indices_invalidos(cursor):
+    cursor.execute("""
+        SELECT c.relname
+        FROM pg_index i
+        JOIN pg_class c ON c.oid = i.indexrelid
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE NOT i.indisvalid AND n.nspname = current_schema()
+    """)
+    return [fila[0] for fila in cursor.fetchall()]
+
+
+def _registrar(cursor, migracion):
+    cursor.execute(
+        "INSERT INTO schema_migraciones (version, nombre, checksum) VALUES (%s, %s, %s)",
+        (migracion.version, migracion.nombre, migracion.checksum),
+    )
+
+
+def _aplicar(conn, migracion):
+    if migracion.en_transaccion:
+        conn.autocommit = False
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(migracion.sql)
+                _registrar(cursor, migracion)
+            conn.commit()
+        except psycopg2.Error as e:
+            conn.rollback()
+            raise MigracionError(f"{migracion}: {e}") from e
+        finally:
+            conn.autocommit = True
+        return
+    with conn.cursor() as cursor:
+        for sentencia in sentencias(migracion.sql):
+            try:
+                cursor.execute(sentencia)
+            except psycopg2.Error as e:
+                invalidos = _indices_invalidos(cursor)
+                detalle = f" Índices inválidos a borrar antes de reintentar: {', '.join(invalidos)}." if invalidos else ""
+                raise MigracionError(f"{migracion}: {e}{detalle}") from e
+        _registrar(cursor, migracion)
+
+
+def estado(conn, migraciones=None):
+    """Lista de (migración, 'aplicada' | 'modificada' | 'pendiente')."""
+    migraciones = cargar_migraciones() if migraciones is None else migraciones
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(_TABLA)
+        aplicadas = _aplicadas(cursor)
+    resultado = []
+    for migracion in migraciones:
+        if migracion.version not in aplicadas:
+            resultado.append((migracion, 'pendiente'))
+        elif aplicadas[migracion.version].strip() != migracion.checksum:
+            resultado.append((migracion, 'modificada'))
+        else:
+            resultado.append((migracion, 'aplicada'))
+    return resultado
+
+
+def migrar(conn, migraciones=None, informar=None):
+    """
+    Aplica en orden las migraciones pendientes con la conexión `conn` (que queda
+    en autocommit) y devuelve las aplicadas. `informar(migracion)` se llama antes
+    de aplicar cada una. Lanza MigracionError si una falla; las anteriores quedan
+    aplicadas.
+    """
+    migraciones = cargar_migraciones() if migraciones is None else migraciones
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_lock(%s)", (_CANDADO,))
+    try:
+        pendientes = [m for m, situacion in estado(conn, migraciones) if situacion == 'pendiente']
+        for migracion in pendientes:
+            if informar:
+                informar(migracion)
+            _aplicar(conn, migracion)
+        return pendientes
+    finally:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", (_CANDADO,))
+
+
+def init_app(app):
+    @app.cli.command('migrar')
+    @click.option('--estado', 'solo_estado', is_flag=True, help='Sólo lista las migraciones aplicadas, modificadas y pendientes.')
+    def migrar_comando(solo_estado):
+        """Aplica las migraciones pendientes del esquema."""
+        # Conexión propia y en autocommit: CREATE INDEX CONCURRENTLY no puede ir en una transacción
+        conn = psycopg2.connect(**DB_CONFIG)
+        try:
+            situaciones = estado(conn)
+            for migracion, situacion in situaciones:
+                if solo_estado or situacion == 'modificada':
+                    click.echo(f"{migracion}: {situacion}")
+            if solo_estado:
+                return
+            aplicadas = migrar(conn, informar=lambda m: click.echo(f"Aplicando {m}..."))
+            click.echo(f"{len(aplicadas)} migraciones aplicadas." if aplicadas else "El esquema está al día.")
+        except MigracionError as e:
+            raise click.ClickException(str(e))
+        finally:
+            conn.close()
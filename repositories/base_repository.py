@@ -0,0 +1,92 @@
+# /repositories/base_repository.py
+import itertools
+from functools import wraps
+
+from flask import g, has_app_context
+
+from database import get_db_connection, get_read_connection, release_db_connection
+from repositories.unit_of_work import current_unit_of_work
+
+
+def read_only(method):
+    """
+    Marca un método de repositorio como de sólo lectura: mientras se ejecuta,
+    `self.conn` apunta a la réplica de lectura (si está configurada).
+    """
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not has_app_context():
+            return method(self, *args, **kwargs)
+        anterior = g.get('db_read_only', False)
+        g.db_read_only = True
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            g.db_read_only = anterior
+    return wrapper
+
+
+class BaseRepository:
+    """
+    Base común de los repositorios.
+
+    La conexión no se guarda en la instancia: cada acceso a `self.conn` devuelve
+    la conexión que el request actual tomó prestada del pool, que se devuelve
+    automáticamente en el teardown del request.
+
+    Los métodos decorados con `@read_only` leen de la réplica, salvo dentro de
+    una unidad de trabajo, donde todo va a la primaria.
+
+    Dentro de una unidad de trabajo (`repositories.unit_of_work`), `commit()`
+    se difiere hasta el cierre de la unidad y `rollback()` la invalida.
+
+    `iterar()` recorre resultados grandes con un cursor del lado del servidor,
+    de a `itersize` filas, sin cargarlos completos en memoria.
+    """
+
+    _cursores = itertools.count(1)
+
+    @property
+    def conn(self):
+        if has_app_context() and g.get('db_read_only') and current_unit_of_work() is None:
+            return get_read_connection()
+        return get_db_connection()
+
+    def iterar(self, query, params=None, cursor_factory=None, itersize=2000):
+        """
+        Ejecuta `query` con un cursor con nombre (DECLARE ... CURSOR) y devuelve
+        un generador de filas. La conexión se toma al llamar, de modo que un
+        método `@read_only` que devuelve este generador sigue leyendo de la
+        réplica aunque las filas se consuman después. El cursor se cierra al
+        agotar o descartar el generador.
+        """
+        cursor = self.conn.cursor(f"iterar_{next(self._cursores)}", cursor_factory=cursor_factory)
+        cursor.itersize = itersize
+        try:
+            cursor.execute(query, params)
+        except Exception:
+            cursor.close()
+            raise
+        return self._filas(cursor)
+
+    @staticmethod
+    def _filas(cursor):
+        try:
+            yield from cursor
+        finally:
+            cursor.close()
+
+    def commit(self):
+        if current_unit_of_work() is not None:
+            return
+        self.conn.commit()
+
+    def rollback(self):
+        uow = current_unit_of_work()
+        if uow is not None:
+            uow.rollback()
+            return
+        self.conn.rollback()
+
+    def close(self):
+        release_db_connection()
@@ -0,0 +1,68 @@
+"""
+Búsqueda de texto completo en compromisos y búsqueda aproximada de personas.
+
+compromiso.busqueda es un tsvector (configuración spanish, sin tildes) con la
+descripción, los comentarios, los referentes y el nombre del departamento,
+mantenido por triggers y con índice GIN (migraciones 0007 y 0008). Lo que escribe
+el usuario se convierte en una tsquery en que cada palabra es un prefijo y todas
+son requeridas, de modo que "gestion reun" encuentra "Gestión de reuniones".
+
+persona.full_name es nombre y apellido en minúsculas y sin tildes (columna
+generada) con índice trigram (pg_trgm). Una persona coincide si su nombre
+contiene el texto o se le parece por palabras (word_similarity sobre
+UMBRAL_PERSONA), de modo que "peres" o "munoz" encuentran a "Pérez" y "Muñoz".
+"""
+import re
+
+_PALABRA = re.compile(r'[^\W_]+')
+
+# Condición y relevancia sobre compromiso.busqueda; el parámetro es consulta_texto()
+CONDICION = "c.busqueda @@ to_tsquery('spanish', sin_acentos(%s))"
+RELEVANCIA = "ts_rank_cd(c.busqueda, to_tsquery('spanish', sin_acentos(%s)))::float8"
+
+
+def consulta_texto(texto):
+    """
+    tsquery (como texto) para lo escrito en un buscador, p. ej. 'plan salud' ->
+    'plan:* & salud:*'. None si no queda ninguna palabra.
+    """
+    palabras = _PALABRA.findall(texto or '')
+    if not palabras:
+        return None
+    return ' & '.join(f"{palabra}:*" for palabra in palabras)
+
+
+# Similitud mínima de condicion_persona (pg_trgm.word_similarity_threshold; por omisión 0.6)
+UMBRAL_PERSONA = 0.4
+
+
+def condicion_persona(alias='p', patron='%s', texto='%s'):
+    """
+    Condición sobre `alias`.full_name; `patron` y `texto` son los marcadores de
+    los parámetros patron_persona() y texto_persona(). Ambas ramas usan el
+    índice trigram. El umbral de similitud se fija con fijar_umbral_persona().
+    """
+    return (f"({alias}.full_name LIKE lower(sin_acentos({patron}))"
+            f" OR lower(sin_acentos({texto})) <%% {alias}.full_name)")
+
+
+def similitud_persona(alias='p', texto='%s'):
+    """Relevancia (0 a 1) de la persona para texto_persona(); mayor es mejor."""
+    return f"word_similarity(lower(sin_acentos({texto})), {alias}.full_name)"
+
+
+def texto_persona(texto):
+    """Texto de búsqueda de personas sin espacios sobrantes; None si queda vacío."""
+    texto = ' '.join((texto or '').split())
+    return texto or None
+
+
+def patron_persona(texto):
+    """Patrón LIKE '%texto%' con los comodines del texto escapados."""
+    escapado = texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escapado}%"
+
+
+def fijar_umbral_persona(cursor):
+    """Fija UMBRAL_PERSONA para el resto de la transacción del cursor."""
+    cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)", (str(UMBRAL_PERSONA),))
@@ -1,18 +1,25 @@
 # /repositories/compromiso_repository.py
-from database import get_db_connection
 from psycopg2.extras import RealDictCursor
 from exceptions.compromiso_exceptions import ResponsablePrincipalError
-
-class CompromisoRepository:
-    def __init__(self):
-        self.conn = get_db_connection()
+from repositories.base_repository import BaseRepository, read_only
+from repositories.busqueda import (
+    CONDICION as CONDICION_BUSQUEDA, RELEVANCIA, condicion_persona, consulta_texto, fijar_umbral_persona,
+    patron_persona, similitud_persona, texto_persona,
+)
+from repositories.departamento_tree import get_arbol
+from repositories.filtro_fechas import anios_de, condicion_fechas
+from repositories.report_cache import invalidate_departments
+from repositories.unit_of_work import current_unit_of_work
+from utils.prepared_statements import execute_prepared
+
+class CompromisoRepository(BaseRepository):
 
     def fetch_user_info(self, user_id):
         if not user_id:
             raise ValueError("Invalid user_id")
         try:
             with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute("""
+                execute_prepared(cursor, """
                     SELECT p.id, p.name, p.lastname, p.profesion, p.cargo, pd.id_departamento, d.name AS departamento_name , p.nivel_jerarquico
                     FROM persona p
                     JOIN persona_departamento pd ON p.id = pd.id_persona
@@ -52,186 +59,259 @@ class CompromisoRepository:
             self.conn.rollback()
             raise e
 
-    def fetch_compromisos_by_departamento(self, departamento_id, search='', prioridad='', estado='', fecha_limite=''):
-        try:
-            query = """
-                SELECT 
-                    c.id AS compromiso_id,
-                    c.prioridad,
-                    c.descripcion,
-                    c.estado,
-                    c.avance,
-                    c.fecha_limite,
-                    c.comentario,
-                    c.comentario_direccion,
-                    d.name AS departamento_name,
-                    o.name AS origen_name,
-                    a.name AS area_name,
-                    ARRAY_AGG(p.id) AS referentes_ids,
-                    STRING_AGG(
-                        p.name || ' ' || p.lastname || 
-                        CASE WHEN pc.es_responsable_principal THEN ' (*)' ELSE '' END,
-                        ', '
-                        ORDER BY pc.es_responsable_principal DESC, p.name, p.lastname
-                    ) AS referentes
-                FROM compromiso c
-                LEFT JOIN persona_compromiso pc ON c.id = pc.id_compromiso
-                LEFT JOIN persona p ON pc.id_persona = p.id
-                LEFT JOIN departamento d ON c.id_departamento = d.id
-                LEFT JOIN origen o ON c.id_origen = o.id
-                LEFT JOIN area a ON c.id_area = a.id
-                WHERE c.id_departamento = %s
-            """
-            params = [departamento_id]
-
-            if search:
-                query += """
-                    AND c.id IN (
-                        SELECT c2.id
-                        FROM compromiso c2
-                        LEFT JOIN persona_compromiso pc2 ON c2.id = pc2.id_compromiso
-                        LEFT JOIN persona p2 ON pc2.id_persona = p2.id
-                        WHERE c2.descripcion ILIKE %s OR d.name ILIKE %s OR CONCAT(p2.name, ' ', p2.lastname) ILIKE %s
-                    )
-                """
-                params.extend([f"%{search}%", f"%{search}%", f"%{search}%"])
+    @read_only
+    def buscar_referentes(self, texto, limite=20):
+        """
+        Personas cuyo nombre se parece a `texto` (tolera errores de tipeo y
+        tildes), de la más parecida a la menos, con las columnas de
+        fetch_referentes y su similitud.
+        """
+        texto = texto_persona(texto)
+        if not texto:
+            return []
+        with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
+            fijar_umbral_persona(cursor)
+            cursor.execute(f"""
+                SELECT p.id, p.name, p.lastname, d.name AS departamento, p.profesion, p.cargo,
+                       {similitud_persona()} AS similitud
+                FROM persona p
+                JOIN persona_departamento pd ON p.id = pd.id_persona
+                JOIN departamento d ON pd.id_departamento = d.id
+                WHERE {condicion_persona()}
+                ORDER BY similitud DESC, p.lastname, p.name
+                LIMIT %s
+            """, (texto, patron_persona(texto), texto, limite))
+            return cursor.fetchall()
 
-            if prioridad:
-                query += " AND c.prioridad = %s"
-                params.append(prioridad)
+    # Columnas de los listados de compromisos por departamento y por referente
+    _SELECT_LISTADO = """
+        SELECT 
+            c.id AS compromiso_id,
+            c.prioridad,
+            c.descripcion,
+            c.estado,
+            c.avance,
+            c.fecha_creacion,
+            c.fecha_limite,
+            c.comentario,
+            c.comentario_direccion,
+            d.name AS departamento_name,
+            o.name AS origen_name,
+            a.name AS area_name,
+            ARRAY_AGG(p.id) AS referentes_ids,
+            STRING_AGG(
+                p.name || ' ' || p.lastname || 
+                CASE WHEN pc.es_responsable_principal THEN ' (*)' ELSE '' END,
+                ', '
+                ORDER BY pc.es_responsable_principal DESC, p.name, p.lastname
+            ) AS referentes
+        FROM compromiso c
+        LEFT JOIN persona_compromiso pc ON c.id = pc.id_compromiso
+        LEFT JOIN persona p ON pc.id_persona = p.id
+        LEFT JOIN departamento d ON c.id_departamento = d.id
+        LEFT JOIN origen o ON c.id_origen = o.id
+        LEFT JOIN area a ON c.id_area = a.id
+    """
+    _GROUP_BY_LISTADO = """
+        GROUP BY 
+            c.id,
+            c.prioridad,
+            c.descripcion,
+            c.estado,
+            c.avance,
+            c.fecha_creacion,
+            c.fecha_limite,
+            c.comentario,
+            c.comentario_direccion,
+            d.name,
+            o.name,
+            a.name
+    """
+
+    @staticmethod
+    def _filtros_listado(search='', prioridad='', estado='', fecha_limite=''):
+        """(sql, params) de los filtros comunes de los listados; el sql empieza con AND."""
+        filtros = ""
+        params = []
+        consulta = consulta_texto(search)
+        if consulta:
+            # Texto completo sobre descripción, comentarios, referentes y departamento
+            filtros += " AND " + CONDICION_BUSQUEDA
+            params.append(consulta)
+
+        if prioridad:
+            filtros += " AND c.prioridad = %s"
+            params.append(prioridad)
 
-            if estado:
-                query += " AND c.estado = %s"
-                params.append(estado)
+        if estado:
+            filtros += " AND c.estado = %s"
+            params.append(estado)
 
-            if fecha_limite:
-                query += " AND c.fecha_limite = %s"
-                params.append(fecha_limite)
+        if fecha_limite:
+            filtros += " AND c.fecha_limite = %s"
+            params.append(fecha_limite)
 
-            query += """
-                GROUP BY 
-                    c.id,
-                    c.prioridad,
-                    c.descripcion,
-                    c.estado,
-                    c.avance,
-                    c.fecha_limite,
-                    c.comentario,
-                    c.comentario_direccion,
-                    d.name,
-                    o.name,
-                    a.name
-            """
+        return filtros, params
+
+    @staticmethod
+    def _consulta_listado(select, group_by, filtros, params, pagina=None, select_params=(), orden='', consulta=None):
+        """
+        (query, params) de un listado: `select` (SELECT ... FROM con sus joins)
+        agregado por `group_by` sobre los compromisos que cumplen `filtros`
+        (condición sobre c, y d si hay búsqueda).
+
+        Con `pagina` (PaginaCompromisos) una CTE elige primero los ids de la
+        página leyendo sólo compromiso, con LIMIT pagina.limite + 1 (la fila extra
+        indica si hay más); los joins y la agregación se hacen sobre esas filas.
+        `consulta` es la de la búsqueda, para ordenar por relevancia.
+        """
+        if pagina is None:
+            return f"{select} WHERE {filtros} {group_by} {orden}", [*select_params, *params]
+        # Cada tramo lee a lo más limite + 1 filas por el índice; luego se juntan y se corta
+        tramos = []
+        params_tramos = []
+        for condicion, params_cursor in pagina.tramos():
+            tramos.append(f"""
+                (SELECT id, valor
+                FROM (
+                    SELECT c.id, {pagina.columna} AS valor
+                    FROM compromiso c
+                    LEFT JOIN departamento d ON c.id_departamento = d.id
+                    WHERE {filtros}
+                ) f
+                WHERE TRUE{condicion}
+                ORDER BY {pagina.orden_sql()}
+                LIMIT %s)
+            """)
+            params_tramos += [*pagina.params_columna(consulta), *params, *params_cursor, pagina.limite + 1]
+        query = f"""
+            WITH pagina AS (
+                SELECT id, valor
+                FROM ({' UNION ALL '.join(tramos)}) t
+                ORDER BY {pagina.orden_sql()}
+                LIMIT %s
+            )
+            SELECT l.*, pagina.valor AS valor_orden
+            FROM ({select} WHERE c.id IN (SELECT id FROM pagina) {group_by}) l
+            JOIN pagina ON pagina.id = l.compromiso_id
+            ORDER BY {pagina.orden_sql('pagina')}
+        """
+        return query, [*params_tramos, pagina.limite + 1, *select_params]
+
+    def _contar(self, filtros, params, hasta):
+        """Cuenta los compromisos que cumplen `filtros`, hasta `hasta` como máximo."""
+        with self.conn.cursor() as cursor:
+            execute_prepared(cursor, f"""
+                SELECT COUNT(*)
+                FROM (
+                    SELECT 1
+                    FROM compromiso c
+                    LEFT JOIN departamento d ON c.id_departamento = d.id
+                    WHERE {filtros}
+                    LIMIT %s
+                ) t
+            """, [*params, hasta])
+            return cursor.fetchone()[0]
+
+    @staticmethod
+    def _filtros_departamento(departamento_id, search='', prioridad='', estado='', fecha_limite=''):
+        filtros, params = CompromisoRepository._filtros_listado(search, prioridad, estado, fecha_limite)
+        return "c.id_departamento = %s" + filtros, [departamento_id, *params]
+
+    @read_only
+    def fetch_compromisos_by_departamento(self, departamento_id, search='', prioridad='', estado='', fecha_limite='', pagina=None):
+        """
+        Compromisos del departamento con sus referentes. Con `pagina`
+        (PaginaCompromisos) sólo los de esa página, ordenados, más una fila extra
+        si hay más.
+        """
+        try:
+            filtros, params = self._filtros_departamento(departamento_id, search, prioridad, estado, fecha_limite)
+            query, params = self._consulta_listado(self._SELECT_LISTADO, self._GROUP_BY_LISTADO, filtros, params, pagina,
+                                                   consulta=consulta_texto(search))
 
             with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute(query, params)
+                execute_prepared(cursor, query, params)
                 return cursor.fetchall()
         except Exception as e:
             self.conn.rollback()
             raise e
 
-    def fetch_compromisos_by_referente(self, user_id, search='', prioridad='', estado='', fecha_limite=''):
-        try:
-            query = """
-                SELECT 
-                    c.id AS compromiso_id,
-                    c.prioridad,
-                    c.descripcion,
-                    c.estado,
-                    c.avance,
-                    c.fecha_limite,
-                    c.comentario,
-                    c.comentario_direccion,
-                    d.name AS departamento_name,
-                    o.name AS origen_name,
-                    a.name AS area_name,
-                    ARRAY_AGG(p.id) AS referentes_ids,
-                    STRING_AGG(
-                        CASE 
-                            WHEN pc.es_responsable_principal THEN p.name || ' ' || p.lastname || ' (*)'
-                            ELSE p.name || ' ' || p.lastname
-                        END,
-                        ', '
-                    ) AS referentes
-                FROM compromiso c
-                LEFT JOIN persona_compromiso pc ON c.id = pc.id_compromiso
-                LEFT JOIN persona p ON pc.id_persona = p.id
-                LEFT JOIN departamento d ON c.id_departamento = d.id
-                LEFT JOIN origen o ON c.id_origen = o.id
-                LEFT JOIN area a ON c.id_area = a.id
-                WHERE c.id IN (
-                    SELECT c2.id
-                    FROM compromiso c2
-                    LEFT JOIN persona_compromiso pc2 ON c2.id = pc2.id_compromiso
-                    LEFT JOIN persona p2 ON pc2.id_persona = p2.id
-                    WHERE pc2.id_persona = %s
-                )
-            """
-            params = [user_id]
-
-            if search:
-                query += """
-                    AND c.id IN (
-                        SELECT c3.id
-                        FROM compromiso c3
-                        LEFT JOIN persona_compromiso pc3 ON c3.id = pc3.id_compromiso
-                        LEFT JOIN persona p3 ON pc3.id_persona = p3.id
-                        WHERE c3.descripcion ILIKE %s OR d.name ILIKE %s OR CONCAT(p3.name, ' ', p3.lastname) ILIKE %s
-                    )
-                """
-                params.extend([f"%{search}%", f"%{search}%", f"%{search}%"])
-
-            if prioridad:
-                query += " AND c.prioridad = %s"
-                params.append(prioridad)
-
-            if estado:
-                query += " AND c.estado = %s"
-                params.append(estado)
-
-            if fecha_limite:
-                query += " AND c.fecha_limite = %s"
-                params.append(fecha_limite)
+    @read_only
+    def count_compromisos_by_departamento(self, departamento_id, search='', prioridad='', estado='', fecha_limite='', hasta=None):
+        """Número de compromisos de fetch_compromisos_by_departamento, contando como máximo `hasta`."""
+        filtros, params = self._filtros_departamento(departamento_id, search, prioridad, estado, fecha_limite)
+        return self._contar(filtros, params, hasta)
+
+    @staticmethod
+    def _filtros_referente(user_id, search='', prioridad='', estado='', fecha_limite=''):
+        filtros, params = CompromisoRepository._filtros_listado(search, prioridad, estado, fecha_limite)
+        referente = """
+            c.id IN (
+                SELECT pc2.id_compromiso
+                FROM persona_compromiso pc2
+                WHERE pc2.id_persona = %s
+            )
+        """
+        return referente + filtros, [user_id, *params]
 
-            query += """
-                GROUP BY 
-                    c.id,
-                    c.prioridad,
-                    c.descripcion,
-                    c.estado,
-                    c.avance,
-                    c.fecha_limite,
-                    c.comentario,
-                    c.comentario_direccion,
-                    d.name,
-                    o.name,
-                    a.name
-                ORDER BY c.fecha_limite
-            """
+    @read_only
+    def fetch_compromisos_by_referente(self, user_id, search='', prioridad='', estado='', fecha_limite='', pagina=None):
+        """
+        Compromisos en que la persona es referente, por fecha límite. Con
+        `pagina` (PaginaCompromisos) sólo los de esa página, en su orden, más una
+        fila extra si hay más.
+        """
+        try:
+            filtros, params = self._filtros_referente(user_id, search, prioridad, estado, fecha_limite)
+            query, params = self._consulta_listado(self._SELECT_LISTADO, self._GROUP_BY_LISTADO, filtros, params,
+                                                   pagina, orden="ORDER BY c.fecha_limite", consulta=consulta_texto(search))
 
             with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute(query, params)
+                execute_prepared(cursor, query, params)
                 return cursor.fetchall()
         except Exception as e:
             self.conn.rollback()
             raise e
 
+    @read_only
+    def count_compromisos_by_referente(self, user_id, search='', prioridad='', estado='', fecha_limite='', hasta=None):
+        """Número de compromisos de fetch_compromisos_by_referente, contando como máximo `hasta`."""
+        filtros, params = self._filtros_referente(user_id, search, prioridad, estado, fecha_limite)
+        return self._contar(filtros, params, hasta)
+
     def update_compromiso(self, compromiso_id, descripcion, estado, prioridad, avance, comentario, comentario_direccion, user_id, referentes):
+        """
+        Actualiza el compromiso y sus referentes. Sólo se registra la
+        modificación si algo cambió realmente. Devuelve True en ese caso.
+        """
         try:
             with self.conn.cursor() as cursor:
+                # El filtro IS DISTINCT FROM evita reescribir filas idénticas
                 cursor.execute("""
                     UPDATE compromiso
                     SET descripcion = %s, estado = %s, prioridad = %s, avance = %s, comentario = %s, comentario_direccion = %s
                     WHERE id = %s
-                """, (descripcion, estado, prioridad, avance, comentario, comentario_direccion, compromiso_id))
-            self.update_referentes(compromiso_id, referentes)
-            self.log_modificacion(compromiso_id, user_id)  # Añadir user_id
-            self.conn.commit()
+                      AND (descripcion, estado, prioridad, avance, comentario, comentario_direccion)
+                          IS DISTINCT FROM (%s, %s, %s, %s, %s, %s)
+                    RETURNING id_departamento
+                """, (descripcion, estado, prioridad, avance, comentario, comentario_direccion, compromiso_id,
+                      descripcion, estado, prioridad, avance, comentario, comentario_direccion))
+                fila = cursor.fetchone()
+                cambio = fila is not None
+            cambio = self.update_referentes(compromiso_id, referentes) or cambio
+            if cambio:
+                self.log_modificacion(compromiso_id, user_id)  # Añadir user_id
+            self.commit()
+            if fila is not None:
+                invalidate_departments([fila[0]])
+            return cambio
         except Exception as e:
-            self.conn.rollback()
+            self.rollback()
             raise e
 
     def update_referentes(self, compromiso_id, nuevos_referentes):
+        """Sincroniza los referentes del compromiso. Devuelve True si hubo cambios."""
         try:
             with self.conn.cursor() as cursor:
                 cursor.execute("""
@@ -255,6 +335,7 @@ class CompromisoRepository:
                     AND es_responsable_principal = FALSE 
                     AND id_persona != ALL(%s)
                 """, (compromiso_id, nuevos_referentes_int))
+                cambios = cursor.rowcount
 
                 # Agregar nuevos referentes que no existan
                 for nuevo_ref in nuevos_referentes_int:
@@ -266,16 +347,27 @@ class CompromisoRepository:
                             WHERE id_persona = %s AND id_compromiso = %s
                         )
                     """, (nuevo_ref, compromiso_id, nuevo_ref, compromiso_id))
-
-                self.conn.commit()
+                    cambios += cursor.rowcount
+
+                if cambios:
+                    cursor.execute("SELECT id_departamento FROM compromiso WHERE id = %s", (compromiso_id,))
+                    departamento = cursor.fetchone()
+                self.commit()
+                if cambios and departamento:
+                    invalidate_departments([departamento[0]])
+                return cambios > 0
         except ResponsablePrincipalError:
-            self.conn.rollback()
+            self.rollback()
             raise
         except Exception as e:
-            self.conn.rollback()
+            self.rollback()
             raise e
 
     def log_modificacion(self, compromiso_id, user_id):
+        # Dentro de una unidad de trabajo se audita una sola vez por compromiso
+        uow = current_unit_of_work()
+        if uow is not None and not uow.marcar_auditado(compromiso_id, user_id):
+            return
         try:
             with self.conn.cursor() as cursor:
                 cursor.execute("""
@@ -283,7 +375,7 @@ class CompromisoRepository:
                     VALUES (%s, %s)
                 """, (compromiso_id, user_id))
         except Exception as e:
-            self.conn.rollback()
+            self.rollback()
             raise e
 
     def fetch_departamentos(self):
@@ -295,10 +387,19 @@ class CompromisoRepository:
             self.conn.rollback()
             raise e
 
+    def _filtro_fecha_limite(self, day=None, month=None, year=None, columna='c.fecha_limite'):
+        """
+        (sql, params) de la selección de día, mes y año sobre fecha_limite como
+        rangos que usan sus índices (ver filtro_fechas); sql es None si no filtra.
+        """
+        return condicion_fechas(columna, day, month, year, lambda: anios_de(self.conn, 'compromiso', 'fecha_limite'))
+
+    @read_only
     def fetch_compromisos_by_month(self, month, year):
         try:
+            fechas, params = self._filtro_fecha_limite(month=month, year=year)
             with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute("""
+                cursor.execute(f"""
                     SELECT c.id AS compromiso_id, c.prioridad, c.descripcion, c.estado, c.avance, c.fecha_limite, 
                            c.comentario_director, d.name AS departamento,
                            STRING_AGG(
@@ -311,10 +412,9 @@ class CompromisoRepository:
                     JOIN departamento d ON c.id_departamento = d.id
                     LEFT JOIN persona_compromiso pc ON c.id = pc.id_compromiso
                     LEFT JOIN persona p ON pc.id_persona = p.id
-                    WHERE EXTRACT(MONTH FROM c.fecha_limite) = %s
-                    AND EXTRACT(YEAR FROM c.fecha_limite) = %s
+                    WHERE {fechas or 'TRUE'}
                     GROUP BY c.id, d.name
-                """, (month, year))
+                """, params)
                 return cursor.fetchall()
         except Exception as e:
             self.conn.rollback()
@@ -348,11 +448,12 @@ class CompromisoRepository:
 
     def count_total_compromisos(self, month):
         try:
+            fechas, params = self._filtro_fecha_limite(month=month, columna='fecha_limite')
             with self.conn.cursor() as cursor:
-                cursor.execute("""
+                cursor.execute(f"""
                     SELECT COUNT(*) FROM compromiso
-                    WHERE EXTRACT(MONTH FROM fecha_limite) = %s
-                """, (month,))
+                    WHERE {fechas or 'TRUE'}
+                """, params)
                 result = cursor.fetchone()
                 print(result)
                 return result
@@ -362,12 +463,14 @@ class CompromisoRepository:
 
     def count_compromisos_completados(self, month):
         try:
+            fechas, params = self._filtro_fecha_limite(month=month, columna='fecha_limite')
             with self.conn.cursor() as cursor:
-                cursor.execute("""
+                # Rango de (estado, fecha_limite) en idx_compromiso_estado_fecha_limite
+                cursor.execute(f"""
                     SELECT COUNT(*) FROM compromiso
-                    WHERE EXTRACT(MONTH FROM fecha_limite) = %s
-                    AND estado = 'Completado'
-                """, (month,))
+                    WHERE estado = 'Completado'
+                    AND {fechas or 'TRUE'}
+                """, params)
                 return cursor.fetchone()[0]
         except Exception as e:
             self.conn.rollback()
@@ -375,17 +478,20 @@ class CompromisoRepository:
 
     def count_compromisos_pendientes(self, month):
         try:
+            fechas, params = self._filtro_fecha_limite(month=month, columna='fecha_limite')
             with self.conn.cursor() as cursor:
-                cursor.execute("""
+                # Rango de (estado, fecha_limite) en idx_compromiso_estado_fecha_limite
+                cursor.execute(f"""
                     SELECT COUNT(*) FROM compromiso
-                    WHERE EXTRACT(MONTH FROM fecha_limite) = %s
-                    AND estado = 'Pendiente'
-                """, (month,))
+                    WHERE estado = 'Pendiente'
+                    AND {fechas or 'TRUE'}
+                """, params)
                 return cursor.fetchone()[0]
         except Exception as e:
             self.conn.rollback()
             raise e
 
+    @read_only
     def fetch_departamentos_resumen(self, mes=None, area_id=None, year=None, departamento_id=None):
         try:
             """
@@ -405,20 +511,16 @@ class CompromisoRepository:
             """
             params = []
 
-            # Filtro por mes
-            if mes and mes != "Todos":
-                query += " AND EXTRACT(MONTH FROM c.fecha_limite) = %s"
-                params.append(mes)
+            # Filtro por mes y año como rango de fecha_limite
+            fechas, params_fechas = self._filtro_fecha_limite(month=mes, year=year)
+            if fechas:
+                query += " AND " + fechas
+                params.extend(params_fechas)
 
             # Filtro por área
             if area_id:
                 query += " AND a.id = %s"
                 params.append(area_id)
-            
-            # Filtro por año
-            if year and year != "Todos":
-                query += " AND EXTRACT(YEAR FROM c.fecha_limite) = %s"
-                params.append(int(year))
 
             # Filtro por departamento
             if departamento_id:
@@ -446,53 +548,68 @@ class CompromisoRepository:
             self.conn.rollback()
             raise e
 
+    @read_only
     def fetch_compromisos_by_mes_departamento(self, mes, departamento_id, year=None):
         try:
             """
             Obtiene compromisos filtrados por mes, año y departamento.
             """
-            query = """
-                SELECT 
-                    c.id AS compromiso_id,
-                    c.descripcion,
-                    c.estado,
-                    c.prioridad,
-                    c.avance,
-                    c.fecha_limite,
-                    c.comentario,
-                    c.comentario_direccion,
-                    ARRAY_AGG(DISTINCT p.id) AS referentes_ids,
-                    STRING_AGG(
-                        p.name || ' ' || p.lastname || 
-                        CASE WHEN pc.es_responsable_principal THEN ' (*)' ELSE '' END,
-                        ', '
-                        ORDER BY pc.es_responsable_principal DESC, p.name, p.lastname
-                    ) AS referentes
-                FROM compromiso c
-                LEFT JOIN persona_compromiso pc ON c.id = pc.id_compromiso
-                LEFT JOIN persona p ON pc.id_persona = p.id
-                WHERE c.id_departamento = %s
-            """
-            params = [departamento_id]
-
-            # Aplicar filtros solo si no son 'Todos'
-            if mes and mes != "Todos":
-                query += " AND EXTRACT(MONTH FROM c.fecha_limite) = %s"
-                params.append(int(mes))
-            
-            if year and year != "Todos":
-                query += " AND EXTRACT(YEAR FROM c.fecha_limite) = %s"
-                params.append(int(year))
-
-            query += " GROUP BY c.id ORDER BY c.fecha_limite"
-
+            query, params = self._query_compromisos_mes_departamento(mes, departamento_id, year)
             with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 cursor.execute(query, params)
                 return cursor.fetchall()
         except Exception as e:
             self.conn.rollback()
             raise e
+
+    @read_only
+    def iter_compromisos_by_mes_departamento(self, mes, departamento_id, year=None):
+        """
+        Igual que fetch_compromisos_by_mes_departamento, pero entrega las filas de a
+        poco desde un cursor del servidor (para exportaciones).
+        """
+        query, params = self._query_compromisos_mes_departamento(mes, departamento_id, year)
+        try:
+            return self.iterar(query + ", c.id", params, cursor_factory=RealDictCursor)
+        except Exception as e:
+            self.conn.rollback()
+            raise e
+
+    def _query_compromisos_mes_departamento(self, mes, departamento_id, year):
+        query = """
+            SELECT 
+                c.id AS compromiso_id,
+                c.descripcion,
+                c.estado,
+                c.prioridad,
+                c.avance,
+                c.fecha_limite,
+                c.comentario,
+                c.comentario_direccion,
+                ARRAY_AGG(DISTINCT p.id) AS referentes_ids,
+                STRING_AGG(
+                    p.name || ' ' || p.lastname || 
+                    CASE WHEN pc.es_responsable_principal THEN ' (*)' ELSE '' END,
+                    ', '
+                    ORDER BY pc.es_responsable_principal DESC, p.name, p.lastname
+                ) AS referentes
+            FROM compromiso c
+            LEFT JOIN persona_compromiso pc ON c.id = pc.id_compromiso
+            LEFT JOIN persona p ON pc.id_persona = p.id
+            WHERE c.id_departamento = %s
+        """
+        params = [departamento_id]
+
+        # Aplicar filtros solo si no son 'Todos'; el rango recorre idx_compromiso_departamento_fecha_limite
+        fechas, params_fechas = self._filtro_fecha_limite(month=mes, year=year)
+        if fechas:
+            query += " AND " + fechas
+            params.extend(params_fechas)
+
+        query += " GROUP BY c.id ORDER BY c.fecha_limite"
+        return query, params
         
+    @read_only
     def fetch_compromisos_by_filtro(self, mes=None, area_id=None):
         try:
             # Debug: Mostrar los parámetros que se están pasando
@@ -515,8 +632,10 @@ class CompromisoRepository:
 
             # Filtro por mes
             if mes and mes != "Todos":
-                query += " AND EXTRACT(MONTH FROM c.fecha_limite) = %s"
-                params.append(self.convert_month_to_number(mes))
+                fechas, params_fechas = self._filtro_fecha_limite(month=self.convert_month_to_number(mes))
+                if fechas:
+                    query += " AND " + fechas
+                    params.extend(params_fechas)
                 print(f"Aplicando filtro por mes: {mes}")
 
             # Filtro por área
@@ -555,23 +674,18 @@ class CompromisoRepository:
             self.conn.rollback()
             raise e
 
-    def obtener_compromisos_por_mes_y_anio(mes, year=None):
+    @read_only
+    def obtener_compromisos_por_mes_y_anio(self, mes, year=None):
         try:
-            conn = get_db_connection()
-            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                if year:
-                    cursor.execute("""
-                        SELECT * FROM compromiso
-                        WHERE EXTRACT(MONTH FROM fecha_limite) = %s AND EXTRACT(YEAR FROM fecha_limite) = %s
-                    """, (mes, year))
-                else:
-                    cursor.execute("""
-                        SELECT * FROM compromiso
-                        WHERE EXTRACT(MONTH FROM fecha_limite) = %s
-                    """, (mes,))
+            fechas, params = self._filtro_fecha_limite(month=mes, year=year)
+            with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                cursor.execute(f"""
+                    SELECT c.* FROM compromiso c
+                    WHERE {fechas or 'TRUE'}
+                """, params)
                 return cursor.fetchall()
         except Exception as e:
-            self.conn.rollback() # type: ignore
+            self.conn.rollback()
             raise e
 
     def get_meses(self):
@@ -582,12 +696,7 @@ class CompromisoRepository:
             self.conn.rollback()
             raise e
 
-    def commit(self):
-        self.conn.commit()
-
-    def close(self):
-        self.conn.close()
-
+    @read_only
     def fetch_all_compromisos(self, search='', prioridad='', estado='', fecha_limite=''):
         try:
             query = """
@@ -616,9 +725,10 @@ class CompromisoRepository:
             """
             params = []
 
-            if search:
-                query += " AND (c.descripcion ILIKE %s OR d.name ILIKE %s OR p.name ILIKE %s OR p.lastname ILIKE %s)"
-                params.extend([f"%{search}%", f"%{search}%", f"%{search}%", f"%{search}%"])
+            consulta = consulta_texto(search)
+            if consulta:
+                query += " AND " + CONDICION_BUSQUEDA
+                params.append(consulta)
 
             if prioridad:
                 query += " AND c.prioridad = %s"
@@ -644,6 +754,10 @@ class CompromisoRepository:
                     c.comentario_direccion,
                     d.name
             """
+            if consulta:
+                # Los más relevantes primero
+                query += " ORDER BY " + RELEVANCIA + " DESC, c.id"
+                params.append(consulta)
 
             with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
                 cursor.execute(query, params)
@@ -652,38 +766,62 @@ class CompromisoRepository:
             self.conn.rollback()
             raise e
 
-    def fetch_compromisos_compartidos(self, user_id, is_director, search='', estado='', avance='', fecha_limite=''):
-        user_info = self.fetch_user_info(user_id)
-        query = """
-            WITH RECURSIVE jerarquia_departamentos AS (
-                -- Punto de partida: departamento asociado al usuario actual
-                SELECT
-                    d.id AS id_departamento,
-                    d.id_departamento_padre,
-                    d.name AS nombre_departamento,
-                    1 as nivel  -- Agregamos un nivel para controlar la profundidad
-                FROM
-                    departamento d
-                JOIN persona_departamento pd ON d.id = pd.id_departamento
-                JOIN persona p ON pd.id_persona = p.id
-                WHERE
-                    pd.id_persona = %s
-
-                UNION ALL
-
-                -- Recorre jerárquicamente hacia abajo solo si no es FUNCIONARIO
-                SELECT
-                    d.id AS id_departamento,
-                    d.id_departamento_padre,
-                    d.name AS nombre_departamento,
-                    jd.nivel + 1  -- Incrementamos el nivel
-                FROM
-                    departamento d
-                JOIN jerarquia_departamentos jd ON d.id_departamento_padre = jd.id_departamento
-                JOIN persona p ON p.id = %s  -- Joins para verificar el nivel jerárquico
-                WHERE
-                    p.nivel_jerarquico != 'FUNCIONARIO/A'  -- Solo continúa la recursión si no es FUNCIONARIO
+    @staticmethod
+    def _filtros_compartidos(user_info, user_id, search='', estado='', avance=''):
+        # El filtro por nivel jerárquico se elige aquí y no con un CASE en SQL, para que
+        # el planificador pueda filtrar compromiso por departamento
+        if user_info['nivel_jerarquico'] == 'FUNCIONARIO/A':
+            # Para FUNCIONARIO: solo ver compromisos de su departamento directo
+            filtros = """
+            c.id_departamento = (
+                SELECT pd2.id_departamento
+                FROM persona_departamento pd2
+                WHERE pd2.id_persona = %s
+                LIMIT 1
+            )
+            """
+        else:
+            # Para otros niveles: ver compromisos de sus departamentos y los subordinados
+            # (tabla de clausura departamento_jerarquia)
+            filtros = """
+            c.id_departamento IN (
+                SELECT j.id_descendiente
+                FROM persona_departamento pdj
+                JOIN departamento_jerarquia j ON j.id_ancestro = pdj.id_departamento
+                WHERE pdj.id_persona = %s
             )
+            """
+        params = [user_id]
+
+        # Add search filter (texto completo sobre compromiso.busqueda)
+        consulta = consulta_texto(search)
+        if consulta:
+            filtros += " AND " + CONDICION_BUSQUEDA
+            params.append(consulta)
+
+        # Add estado filter
+        if estado:
+            filtros += " AND c.estado = %s"
+            params.append(estado)
+
+        # Add avance filter
+        if avance:
+            min_avance, max_avance = map(int, avance.split('-'))
+            filtros += " AND c.avance BETWEEN %s AND %s"
+            params.extend([min_avance, max_avance])
+
+        return filtros, params
+
+    @read_only
+    def fetch_compromisos_compartidos(self, user_id, is_director, search='', estado='', avance='', fecha_limite='', pagina=None):
+        """
+        Compromisos visibles para la persona según su nivel jerárquico. Sin
+        `pagina` se ordenan por fecha límite si `fecha_limite` es 'asc' o 'desc';
+        con `pagina` (PaginaCompromisos) sólo los de esa página, en su orden, más
+        una fila extra si hay más.
+        """
+        user_info = self.fetch_user_info(user_id)
+        select = """
             SELECT DISTINCT  -- Agregamos DISTINCT para evitar duplicados
                 c.id AS compromiso_id,
                 c.descripcion,
@@ -724,58 +862,30 @@ class CompromisoRepository:
             LEFT JOIN persona p ON pc.id_persona = p.id
             LEFT JOIN origen o ON c.id_origen = o.id
             LEFT JOIN area a ON c.id_area = a.id
-            JOIN persona usuario_actual ON usuario_actual.id = %s  -- Join para acceder al nivel jerárquico del usuario actual
-            WHERE
-                CASE
-                    WHEN usuario_actual.nivel_jerarquico = 'FUNCIONARIO/A' THEN
-                        -- Para FUNCIONARIO: solo ver compromisos de su departamento directo
-                        c.id_departamento = (
-                            SELECT pd2.id_departamento
-                            FROM persona_departamento pd2
-                            WHERE pd2.id_persona = %s
-                            LIMIT 1
-                        )
-                    ELSE
-                        -- Para otros niveles: ver compromisos según la jerarquía
-                        d.id IN (SELECT id_departamento FROM jerarquia_departamentos)
-                END
         """
-        params = [user_id, user_id, user_info['id_departamento'], user_info['nivel_jerarquico'], user_info['id_departamento'], user_info['nivel_jerarquico'], user_id, user_id]
-
-        # Add search filter
-        if search:
-            query += """
-                AND c.id IN (
-                    SELECT c2.id
-                    FROM compromiso c2
-                    LEFT JOIN persona_compromiso pc2 ON c2.id = pc2.id_compromiso
-                    LEFT JOIN persona p2 ON pc2.id_persona = p2.id
-                    WHERE p2.name ILIKE %s OR p2.lastname ILIKE %s OR d.name ILIKE %s OR c2.descripcion ILIKE %s
-                )
-            """
-            params.extend([f"%{search}%", f"%{search}%", f"%{search}%", f"%{search}%"])
-
-        # Add estado filter
-        if estado:
-            query += " AND c.estado = %s"
-            params.append(estado)
-
-        # Add avance filter
-        if avance:
-            min_avance, max_avance = map(int, avance.split('-'))
-            query += " AND c.avance BETWEEN %s AND %s"
-            params.extend([min_avance, max_avance])
-
-        query += " GROUP BY c.id, d.id, d.name, o.name, a.name, c.descripcion, c.estado, c.prioridad, c.fecha_creacion, c.fecha_limite, c.avance, c.comentario, c.comentario_direccion"
+        select_params = [user_info['id_departamento'], user_info['nivel_jerarquico'], user_info['id_departamento'], user_info['nivel_jerarquico']]
+        group_by = " GROUP BY c.id, d.id, d.name, o.name, a.name, c.descripcion, c.estado, c.prioridad, c.fecha_creacion, c.fecha_limite, c.avance, c.comentario, c.comentario_direccion"
 
         # Add fecha_limite sorting
+        orden = ''
         if fecha_limite:
-            query += " ORDER BY c.fecha_limite " + ("ASC" if fecha_limite == 'asc' else "DESC")
+            orden = " ORDER BY c.fecha_limite " + ("ASC" if fecha_limite == 'asc' else "DESC")
+
+        filtros, params = self._filtros_compartidos(user_info, user_id, search, estado, avance)
+        query, params = self._consulta_listado(select, group_by, filtros, params, pagina, select_params, orden,
+                                               consulta_texto(search))
 
         with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
             cursor.execute(query, params)
             return cursor.fetchall()
 
+    @read_only
+    def count_compromisos_compartidos(self, user_id, search='', estado='', avance='', hasta=None):
+        """Número de compromisos de fetch_compromisos_compartidos, contando como máximo `hasta`."""
+        user_info = self.fetch_user_info(user_id)
+        filtros, params = self._filtros_compartidos(user_info, user_id, search, estado, avance)
+        return self._contar(filtros, params, hasta)
+
     def es_jefe_de_departamento(self, user_id, departamento_id):
         try:
             with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
@@ -794,7 +904,7 @@ class CompromisoRepository:
 
     def fetch_compromiso_by_id(self, compromiso_id):
         with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
-            cursor.execute("""
+            execute_prepared(cursor, """
                 SELECT c.id AS compromiso_id, c.descripcion, c.estado, c.prioridad, 
                        c.fecha_creacion, c.fecha_limite, c.avance, c.comentario, 
                        c.comentario_direccion, c.id_departamento,
@@ -834,6 +944,7 @@ class CompromisoRepository:
                         VALUES (%s, %s)
                     """, (referente_id, compromiso_id))
                 self.conn.commit()
+                invalidate_departments([id_departamento])
                 print("Compromiso creado exitosamente")
         except Exception as e:
             self.conn.rollback()
@@ -848,18 +959,15 @@ class CompromisoRepository:
                     INSERT INTO compromiso (descripcion, prioridad, fecha_limite, id_departamento, avance, estado, fecha_creacion, id_origen, id_area)
                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id
                 """, (descripcion, prioridad, fecha_limite, id_departamento, avance, estado, fecha_creacion, id_origen, id_area))
-                return cursor.fetchone()[0]
+                compromiso_id = cursor.fetchone()[0]
+            # Quien llama confirma la transacción; dentro de una unidad de trabajo se espera al COMMIT
+            invalidate_departments([id_departamento])
+            return compromiso_id
         except Exception as e:
             self.conn.rollback()
             print(f"Error en insert_compromiso: {e}")
             raise e
 
-    def rollback(self):
-        self.conn.rollback()
-
-    def close(self):
-        self.conn.close()
-
     def add_verificador(self, id_compromiso, nombre_archivo, ruta_archivo, descripcion, user_id):
         """
         Añade un verificador de compromiso a la base de datos
@@ -947,9 +1055,8 @@ class CompromisoRepository:
                 # Convertir departamento_id a entero antes de realizar operaciones matemáticas
                 departamento_id = int(departamento_id)
                 
-                # Obtener el departamento padre (primer dígito seguido de dos ceros)
-                # Ejemplo: si departamento_id es 320, el padre sería 300
-                parent_dept_id = (departamento_id // 100) * 100
+                # Departamento padre según la jerarquía (árbol en memoria, sin consulta)
+                parent_dept_id = get_arbol().padre(departamento_id)
                 
                 # Incluir áreas del departamento actual, del departamento padre y globales
                 cursor.execute("""
@@ -973,9 +1080,8 @@ class CompromisoRepository:
                 # Convertir departamento_id a entero antes de realizar operaciones matemáticas
                 departamento_id = int(departamento_id)
                 
-                # Obtener el departamento padre (primer dígito seguido de dos ceros)
-                # Ejemplo: si departamento_id es 320, el padre sería 300
-                parent_dept_id = (departamento_id // 100) * 100
+                # Departamento padre según la jerarquía (árbol en memoria, sin consulta)
+                parent_dept_id = get_arbol().padre(departamento_id)
                 
                 # Incluir orígenes del departamento actual, del departamento padre y globales
                 cursor.execute("""
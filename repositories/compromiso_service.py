@@ -1,5 +1,9 @@
 # /services/compromiso_service.py
 from repositories.compromiso_repository import CompromisoRepository
+from repositories.departamento_tree import get_arbol
+from repositories.paginacion import CONTEO_MAXIMO
+from repositories.report_analytics import analytics_enabled, get_facts
+from repositories.unit_of_work import unit_of_work
 
 class CompromisoService:
     def __init__(self):
@@ -44,24 +48,28 @@ class CompromisoService:
         return compromisos, referentes, es_director
 
     def actualizar_compromisos(self, request, compromisos, user_id, es_director):
-        for compromiso in compromisos:
-            compromiso_id = compromiso['compromiso_id']
-
-            # Obtener los valores enviados por el formulario
-            nuevo_estado = request.form.get(f'estado-{compromiso_id}')
-            nuevo_avance = request.form.get(f'nivel_avance-{compromiso_id}')
-            nuevo_comentario = request.form.get(f'comentario-{compromiso_id}')
-            nuevo_comentario_direccion = request.form.get(f'comentario_direccion-{compromiso_id}')
-
-            # Si es director, obtener nuevos referentes
-            if es_director:
-                nuevos_referentes = request.form.getlist(f'referentes-{compromiso_id}')
-            else:
-                nuevos_referentes = compromiso['referentes_ids'].split(',')
-
-            # Verificar los valores y actualizar el compromiso
-            if nuevo_estado and nuevo_avance and nuevo_comentario:
-                try:
+        """
+        Aplica la edición masiva en una sola transacción: un único COMMIT para
+        todas las filas y un registro de auditoría por compromiso modificado.
+        """
+        with unit_of_work():
+            for compromiso in compromisos:
+                compromiso_id = compromiso['compromiso_id']
+
+                # Obtener los valores enviados por el formulario
+                nuevo_estado = request.form.get(f'estado-{compromiso_id}')
+                nuevo_avance = request.form.get(f'nivel_avance-{compromiso_id}')
+                nuevo_comentario = request.form.get(f'comentario-{compromiso_id}')
+                nuevo_comentario_direccion = request.form.get(f'comentario_direccion-{compromiso_id}')
+
+                # Si es director, obtener nuevos referentes
+                if es_director:
+                    nuevos_referentes = request.form.getlist(f'referentes-{compromiso_id}')
+                else:
+                    nuevos_referentes = compromiso['referentes_ids'].split(',')
+
+                # Verificar los valores y actualizar el compromiso (incluye referentes y auditoría)
+                if nuevo_estado and nuevo_avance and nuevo_comentario:
                     self.update_compromiso(
                         compromiso_id,
                         compromiso['descripcion'],
@@ -73,18 +81,6 @@ class CompromisoService:
                         user_id,  # Asegurar que user_id se pasa correctamente
                         nuevos_referentes  # Asegurar que referentes se pasa correctamente
                     )
-                    self.repo.log_modificacion(compromiso_id, user_id)
-
-                    # Si es director, actualizar referentes
-                    if es_director and nuevos_referentes:
-                        print("en espanol")
-                        self.repo.update_referentes(compromiso_id, nuevos_referentes)
-                    self.repo.commit()
-                except Exception as e:
-                    self.repo.rollback()
-                    raise e
-
-
 
     def get_resumen_compromisos(self, mes=None, area_id=None, year=None, departamento_id=None):
         """
@@ -95,6 +91,10 @@ class CompromisoService:
         if mes and mes != "Todos":
             mes = self.convert_month_to_number(mes)
 
+        # Con el extracto en memoria, cada combinación de filtros se calcula sin consultar la base
+        if analytics_enabled():
+            return get_facts().resumen_compromisos(get_arbol(), mes, area_id, year, departamento_id)
+
         # Llamar al repositorio para obtener el resumen por departamento
         # Agregamos el parámetro year a la llamada
         departamentos_resumen = self.repo.fetch_departamentos_resumen(mes=mes, area_id=area_id, year=year, departamento_id=departamento_id)
@@ -128,7 +128,14 @@ class CompromisoService:
             return self.repo.fetch_compromisos_by_departamento(departamento_id)
         
         return self.repo.fetch_compromisos_by_mes_departamento(mes, departamento_id, year)
-    
+
+    def iter_compromisos_by_mes_departamento(self, mes, departamento_id, year):
+        """
+        Compromisos del departamento con los filtros de mes y año ('Todos' no
+        filtra), leídos de a poco para exportarlos.
+        """
+        return self.repo.iter_compromisos_by_mes_departamento(mes, departamento_id, year)
+
     def get_referentes(self):
         referentes = self.repo.fetch_referentes()
         return [
@@ -136,13 +143,44 @@ class CompromisoService:
             for p in referentes
         ]
 
+    def buscar_referentes(self, texto, limite=20):
+        """Referentes parecidos a `texto`, en el formato de get_referentes, del más parecido al menos."""
+        referentes = self.repo.buscar_referentes(texto, limite)
+        return [
+            (p['id'], f"{p['name']} {p['lastname']} - {p['departamento']} - {p['profesion']}")
+            for p in referentes
+        ]
+
     def get_compromisos_by_user(self, user_id, search='', prioridad='', estado='', fecha_limite=''):
         return self.repo.fetch_compromisos_by_referente(user_id, search, prioridad, estado, fecha_limite)
 
+    def get_pagina_compromisos_by_user(self, user_id, pagina, search='', prioridad='', estado='', fecha_limite='', total=None):
+        """
+        Página `pagina` (PaginaCompromisos) de los compromisos en que la persona
+        es referente. Ver _armar_pagina.
+        """
+        filas = self.repo.fetch_compromisos_by_referente(user_id, search, prioridad, estado, fecha_limite, pagina=pagina)
+        return self._armar_pagina(pagina, filas, total, lambda hasta: self.repo.count_compromisos_by_referente(
+            user_id, search, prioridad, estado, fecha_limite, hasta=hasta))
+
+    @staticmethod
+    def _armar_pagina(pagina, filas, total, contar):
+        """
+        {'compromisos', 'anterior', 'siguiente', 'total', 'total_exacto'}. El
+        total se cuenta con `contar(hasta)` sólo si no viene ya calculado (las
+        páginas siguientes lo reciben en el enlace), y como máximo hasta
+        CONTEO_MAXIMO + 1: por sobre CONTEO_MAXIMO no es exacto.
+        """
+        resultado = pagina.resultado(filas)
+        if total is None:
+            total = contar(CONTEO_MAXIMO + 1)
+        resultado['total'] = total
+        resultado['total_exacto'] = total <= CONTEO_MAXIMO
+        return resultado
+
     def update_compromiso(self, compromiso_id, descripcion, estado, prioridad, avance, comentario, comentario_direccion, user_id, referentes):
-        self.repo.update_compromiso(compromiso_id, descripcion, estado, prioridad, avance, comentario, comentario_direccion, user_id, referentes)
-        self.repo.log_modificacion(compromiso_id, user_id)
-        self.repo.commit()
+        with unit_of_work():
+            return self.repo.update_compromiso(compromiso_id, descripcion, estado, prioridad, avance, comentario, comentario_direccion, user_id, referentes)
 
     def get_compromisos_by_departamento(self, departamento_id, search='', prioridad='', estado='', fecha_limite=''):
         """
@@ -150,6 +188,15 @@ class CompromisoService:
         """
         return self.repo.fetch_compromisos_by_departamento(departamento_id, search, prioridad, estado, fecha_limite)
 
+    def get_pagina_compromisos_by_departamento(self, departamento_id, pagina, search='', prioridad='', estado='', fecha_limite='', total=None):
+        """
+        Página `pagina` (PaginaCompromisos) de los compromisos del departamento.
+        Ver _armar_pagina.
+        """
+        filas = self.repo.fetch_compromisos_by_departamento(departamento_id, search, prioridad, estado, fecha_limite, pagina=pagina)
+        return self._armar_pagina(pagina, filas, total, lambda hasta: self.repo.count_compromisos_by_departamento(
+            departamento_id, search, prioridad, estado, fecha_limite, hasta=hasta))
+
     def get_compromisos_by_filtro(self, departamento_id=None, mes=None, area_id=None):
         # Si el mes es "Todos" o no está presente, no filtramos por mes
         if mes == "Todos":
@@ -179,6 +226,17 @@ class CompromisoService:
         if not user_id:
             raise ValueError("Invalid user_id")
         return self.repo.fetch_compromisos_compartidos(user_id, is_director, search, estado, avance, fecha_limite)
+
+    def get_pagina_compromisos_compartidos(self, user_id, is_director, pagina, search='', estado='', avance='', total=None):
+        """
+        Página `pagina` (PaginaCompromisos) de los compromisos compartidos con la
+        persona. Ver _armar_pagina.
+        """
+        if not user_id:
+            raise ValueError("Invalid user_id")
+        filas = self.repo.fetch_compromisos_compartidos(user_id, is_director, search, estado, avance, pagina=pagina)
+        return self._armar_pagina(pagina, filas, total, lambda hasta: self.repo.count_compromisos_compartidos(
+            user_id, search, estado, avance, hasta=hasta))
     
     def es_jefe_de_departamento(self, user_id, departamento_id):
         return self.repo.es_jefe_de_departamento(user_id, departamento_id)
@@ -0,0 +1,44 @@
+"""
+Versiones de datos para GET condicionales (ETag / Last-Modified).
+
+Triggers por sentencia sobre las tablas vigiladas (migración 0004) insertan
+una fila en `datos_cambio` con la tabla y la hora del cambio, en la misma
+transacción que la escritura. Como sólo insertan, dos escrituras concurrentes no
+se bloquean entre sí. Cada tanto los cambios se acumulan en `datos_version` (una
+fila por tabla) y se borran de datos_cambio en la misma sentencia.
+
+La versión de una tabla es su contador en datos_version más sus filas pendientes
+en datos_cambio; la de un conjunto, la suma de las de sus tablas, que sólo crece
+(cada escritura confirmada suma uno, en el orden en que se confirme). La hora es
+la del último cambio entre ellas. Leerla es una consulta sobre unas pocas filas:
+basta para saber si una respuesta JSON ya entregada sigue vigente sin volver a
+calcularla.
+"""
+from repositories.base_repository import BaseRepository, read_only
+
+# Tablas que alimentan /api/report_data
+TABLAS_REPORTE = (
+    'compromiso', 'persona_compromiso', 'persona', 'persona_departamento', 'departamento',
+    'reunion', 'reunion_compromiso', 'compromisos_archivados', 'compromiso_eliminado',
+)
+# Las listas de áreas y orígenes incluyen las del departamento padre
+TABLAS_AREAS = ('area', 'departamento')
+TABLAS_ORIGENES = ('origen', 'departamento')
+
+
+class DatosVersionRepository(BaseRepository):
+    @read_only
+    def fetch_version(self, tablas):
+        """Devuelve (version, modificado) del conjunto de tablas; (0, None) si no hay filas."""
+        with self.conn.cursor() as cursor:
+            # Una sola sentencia: ve datos_version y datos_cambio en la misma instantánea
+            cursor.execute("""
+                SELECT COALESCE(SUM(version), 0)::bigint, MAX(modificado)
+                FROM (
+                    SELECT version, modificado FROM datos_version WHERE tabla = ANY(%(tablas)s)
+                    UNION ALL
+                    SELECT 1, modificado FROM datos_cambio WHERE tabla = ANY(%(tablas)s)
+                ) v
+            """, {'tablas': list(tablas)})
+            version, modificado = cursor.fetchone()
+        return version, modificado
@@ -0,0 +1,175 @@
+"""
+Árbol de departamentos en memoria.
+
+`departamento` cambia pocas veces al año pero se consulta en casi todos los
+requests. El árbol se carga una vez por proceso desde `departamento` y la tabla
+de clausura `departamento_jerarquia`, con los descendientes, ancestros,
+profundidad y ruta ("A > B > C") de cada departamento ya calculados.
+
+Se recarga cuando `update_departamento` llama a `invalidar()` y cuando cambia
+`departamento_version` (los triggers de departamento la incrementan). Esa versión
+se consulta como mucho cada DEPT_TREE_CHECK_SECONDS segundos, así que los demás
+procesos ven un cambio a lo más ese tiempo después.
+"""
+import os
+import threading
+import time
+
+from repositories.base_repository import BaseRepository, read_only
+
+_settings = {
+    'check_interval': float(os.getenv('DEPT_TREE_CHECK_SECONDS', 30)),
+}
+_estado = {'arbol': None, 'verificado': 0.0}
+_lock = threading.Lock()
+
+
+class Nodo:
+    __slots__ = ('id', 'name', 'padre', 'profundidad', 'ancestros', 'descendientes', 'ruta', 'orden_nombre')
+
+    def __init__(self, id, name, padre, orden_nombre):
+        self.id = id
+        self.name = name
+        self.padre = padre
+        self.orden_nombre = orden_nombre
+        self.profundidad = 0
+        self.ancestros = (id,)
+        self.descendientes = frozenset((id,))
+        self.ruta = name
+
+
+class ArbolDepartamentos:
+    """
+    Vista inmutable de la jerarquía. El orden de nombres y rutas viene de la base
+    de datos (ORDER BY), de modo que respeta su collation.
+    """
+
+    def __init__(self, version, departamentos, jerarquia):
+        self.version = version
+        self.nodos = {}
+        for orden, (id, name, padre) in enumerate(departamentos):
+            self.nodos[id] = Nodo(id, name, padre, orden)
+
+        # (ancestro, descendiente) -> (profundidad, ruta, orden de la ruta)
+        self.pares = {}
+        ancestros = {id: [] for id in self.nodos}
+        descendientes = {id: set() for id in self.nodos}
+        for orden, (ancestro, descendiente, profundidad, ruta) in enumerate(jerarquia):
+            self.pares[(ancestro, descendiente)] = (profundidad, ruta, orden)
+            if descendiente in ancestros:
+                ancestros[descendiente].append((profundidad, ancestro))
+            if ancestro in descendientes:
+                descendientes[ancestro].add(descendiente)
+
+        for id, nodo in self.nodos.items():
+            cadena = sorted(ancestros[id], reverse=True)
+            if cadena:
+                nodo.profundidad = cadena[0][0]
+                nodo.ancestros = tuple(ancestro for _, ancestro in cadena)
+                nodo.ruta = self.pares[(nodo.ancestros[0], id)][1]
+            nodo.descendientes = frozenset(descendientes[id] | {id})
+
+    def __contains__(self, departamento_id):
+        return departamento_id in self.nodos
+
+    def nombre(self, departamento_id):
+        return self.nodos[departamento_id].name
+
+    def padre(self, departamento_id):
+        """Id del departamento padre, o None si es raíz o no existe."""
+        nodo = self.nodos.get(int(departamento_id))
+        return nodo.padre if nodo else None
+
+    def profundidad(self, departamento_id):
+        return self.nodos[departamento_id].profundidad
+
+    def ancestros(self, departamento_id):
+        """Ids desde la raíz hasta el propio departamento."""
+        return self.nodos[departamento_id].ancestros
+
+    def descendientes(self, departamento_id):
+        """Ids del departamento y de todos sus subordinados."""
+        return self.nodos[departamento_id].descendientes
+
+    def ruta(self, departamento_id, desde=None):
+        """Ruta "A > B > C" desde la raíz (o desde el ancestro `desde`)."""
+        if desde is None:
+            return self.nodos[departamento_id].ruta
+        return self.pares[(desde, departamento_id)][1]
+
+    def orden_ruta(self, ancestro, descendiente):
+        return self.pares[(ancestro, descendiente)][2]
+
+    def es_raiz(self, departamento_id):
+        """True si el departamento no tiene padre."""
+        return self.nodos[departamento_id].padre is None
+
+    def subordinados(self, departamento_ids):
+        """Departamentos de departamento_ids y sus subordinados, por distancia y luego id."""
+        distancia = {}
+        for departamento_id in departamento_ids:
+            if departamento_id not in self.nodos:
+                continue
+            base = self.nodos[departamento_id].profundidad
+            for id in self.nodos[departamento_id].descendientes:
+                nivel = self.nodos[id].profundidad - base
+                if nivel < distancia.get(id, nivel + 1):
+                    distancia[id] = nivel
+        return sorted(distancia, key=lambda id: (distancia[id], id))
+
+
+class DepartamentoTreeRepository(BaseRepository):
+    @read_only
+    def fetch_version(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT version FROM departamento_version")
+            row = cursor.fetchone()
+        return row[0] if row else 0
+
+    @read_only
+    def load(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT version FROM departamento_version")
+            row = cursor.fetchone()
+            cursor.execute("SELECT id, name, id_departamento_padre FROM departamento ORDER BY name, id")
+            departamentos = cursor.fetchall()
+            cursor.execute("""
+                SELECT id_ancestro, id_descendiente, profundidad, ruta
+                FROM departamento_jerarquia
+                ORDER BY ruta, profundidad
+            """)
+            jerarquia = cursor.fetchall()
+        return ArbolDepartamentos(row[0] if row else 0, departamentos, jerarquia)
+
+
+def configure(check_interval=None):
+    if check_interval is not None:
+        _settings['check_interval'] = float(check_interval)
+
+
+def init_app(app):
+    configure(app.config.get('DEPT_TREE_CHECK_SECONDS'))
+
+
+def get_arbol():
+    """Devuelve el árbol vigente, recargándolo si no existe o si cambió la versión."""
+    arbol = _estado['arbol']
+    ahora = time.monotonic()
+    if arbol is not None and ahora - _estado['verificado'] < _settings['check_interval']:
+        return arbol
+    repo = DepartamentoTreeRepository()
+    if arbol is not None and repo.fetch_version() == arbol.version:
+        _estado['verificado'] = ahora
+        return arbol
+    with _lock:
+        # Otro hilo pudo recargarlo mientras esperábamos
+        if _estado['arbol'] is not arbol and _estado['arbol'] is not None:
+            return _estado['arbol']
+        _estado['arbol'] = repo.load()
+        _estado['verificado'] = time.monotonic()
+        return _estado['arbol']
+
+
+def invalidar():
+    """Descarta el árbol; el próximo get_arbol() lo recarga."""
+    _estado['arbol'] = None
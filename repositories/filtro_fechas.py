@@ -0,0 +1,98 @@
+"""
+Filtros por día, mes y año como rangos semiabiertos [desde, hasta).
+
+EXTRACT(MONTH FROM col) = %s calcula la expresión en cada fila y no puede usar
+un índice sobre la columna. Aquí la selección se traduce a comparaciones directas
+(col >= desde AND col < hasta), que se resuelven recorriendo un rango del índice,
+también de uno compuesto como (id_departamento, fecha_limite).
+
+Con año la selección es un solo rango (o uno por mes si se eligió día sin mes).
+Sin año se repite en cada año entre el primer y el último valor de la columna,
+que se leen de los extremos de su índice (anios_de); los rangos contiguos se
+juntan. Los valores vacíos o 'Todos' no filtran.
+"""
+from datetime import datetime, timedelta
+
+
+def _numero(valor):
+    if valor in (None, '', 'Todos'):
+        return None
+    return int(valor)
+
+
+def _mes_siguiente(anio, mes):
+    return datetime(anio + 1, 1, 1) if mes == 12 else datetime(anio, mes + 1, 1)
+
+
+def _rango(anio, mes, dia):
+    if mes is None:
+        return datetime(anio, 1, 1), datetime(anio + 1, 1, 1)
+    if dia is None:
+        return datetime(anio, mes, 1), _mes_siguiente(anio, mes)
+    desde = datetime(anio, mes, dia)
+    return desde, desde + timedelta(days=1)
+
+
+def rangos(day=None, month=None, year=None, anios=None):
+    """
+    Lista de rangos (desde, hasta) de la selección, en orden; None si no hay
+    nada que filtrar. `anios` es una función que devuelve los años a recorrer
+    cuando no se eligió año; sólo se llama en ese caso. Las fechas que no
+    existen (31 de febrero, mes 13) no aportan rangos.
+    """
+    day, month, year = _numero(day), _numero(month), _numero(year)
+    if day is None and month is None and year is None:
+        return None
+    if month is not None:
+        meses = [month]
+    elif day is not None:
+        meses = range(1, 13)
+    else:
+        meses = [None]
+    lista = []
+    for anio in ([year] if year is not None else anios()):
+        for mes in meses:
+            try:
+                desde, hasta = _rango(anio, mes, day)
+            except (ValueError, OverflowError):
+                continue
+            if lista and lista[-1][1] == desde:
+                # Contiguo al anterior (p. ej. años seguidos sin mes): un solo rango
+                lista[-1] = (lista[-1][0], hasta)
+            else:
+                lista.append((desde, hasta))
+    return lista
+
+
+def condicion_fechas(columna, day=None, month=None, year=None, anios=None):
+    """
+    (sql, params) con la condición sobre `columna` para la selección, o
+    (None, []) si no filtra. Una selección sin fechas posibles da FALSE.
+    """
+    lista = rangos(day, month, year, anios)
+    if lista is None:
+        return None, []
+    if not lista:
+        return "FALSE", []
+    sql = " OR ".join(f"({columna} >= %s AND {columna} < %s)" for _ in lista)
+    return f"({sql})", [valor for rango in lista for valor in rango]
+
+
+def anios_de(conn, tabla, columna):
+    """
+    Años entre el primer y el último valor de `columna` en `tabla` (sin contar
+    NULL ni ±infinity). Con un índice sobre la columna son dos lecturas de sus
+    extremos.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT EXTRACT(YEAR FROM MIN({columna}))::int AS primero,
+                   EXTRACT(YEAR FROM MAX({columna}))::int AS ultimo
+            FROM {tabla}
+            WHERE {columna} > '-infinity' AND {columna} < 'infinity'
+        """)
+        fila = cursor.fetchone()
+    primero, ultimo = (fila['primero'], fila['ultimo']) if isinstance(fila, dict) else fila
+    if primero is None:
+        return range(0)
+    return range(primero, ultimo + 1)
@@ -1,8 +1,11 @@
-from database import get_db_connection
+from exceptions.departamento_exceptions import JerarquiaCiclicaError
+from repositories.base_repository import BaseRepository
+from repositories.busqueda import condicion_persona, fijar_umbral_persona, patron_persona, similitud_persona, texto_persona
+from repositories import departamento_tree
+from repositories.report_cache import invalidate_departments
 
-class GestionRepository:
+class GestionRepository(BaseRepository):
     def fetch_funcionarios(self, search=None, departamento=None, nivel_jerarquico=None):
-        conn = get_db_connection()
         query = """
             SELECT p.id, p.rut, p.name, p.lastname, p.profesion, d.name AS departamento_name, p.nivel_jerarquico, p.cargo, p.correo, p.anexo_telefonico
             FROM persona p
@@ -12,9 +15,11 @@ class GestionRepository:
         """
         params = []
 
-        if search:
-            query += " AND (p.name ILIKE %s OR p.lastname ILIKE %s OR p.rut ILIKE %s)"
-            params.extend([f"%{search}%", f"%{search}%", f"%{search}%"])
+        # Nombre aproximado (índice trigram sobre persona.full_name) o parte del RUT
+        texto = texto_persona(search)
+        if texto:
+            query += f" AND ({condicion_persona()} OR p.rut ILIKE %s)"
+            params.extend([patron_persona(texto), texto, patron_persona(texto)])
 
         if departamento:
             query += " AND d.id = %s"
@@ -25,15 +30,20 @@ class GestionRepository:
             params.append(nivel_jerarquico)
 
         query += " GROUP BY p.id, p.rut, p.name, p.lastname, p.profesion, d.name, p.nivel_jerarquico, p.cargo, p.correo, p.anexo_telefonico"
+        if texto:
+            # Los más parecidos primero
+            query += f" ORDER BY {similitud_persona()} DESC, p.lastname, p.name"
+            params.append(texto)
 
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
+            if texto:
+                fijar_umbral_persona(cursor)
             cursor.execute(query, params)
             funcionarios = cursor.fetchall()
             print("Funcionarios Query Result:", funcionarios)  # Agrega este mensaje de depuración
             return funcionarios
 
     def fetch_funcionario_by_id(self, funcionario_id):
-        conn = get_db_connection()
         query = """
             SELECT p.id, p.rut, p.name, p.lastname, p.profesion, d.name AS departamento_name, p.nivel_jerarquico, p.cargo, p.correo, p.anexo_telefonico
             FROM persona p
@@ -41,20 +51,19 @@ class GestionRepository:
             JOIN departamento d ON pd.id_departamento = d.id
             WHERE p.id = %s
         """
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query, (funcionario_id,))
             return cursor.fetchone()
 
     def update_funcionario(self, funcionario_id, rut, name, lastname, profesion, departamento_id, nivel_jerarquico, cargo, correo, anexo_telefonico):
-        conn = get_db_connection()
         query = """
             UPDATE persona
             SET rut = %s, name = %s, lastname = %s, profesion = %s, nivel_jerarquico = %s, cargo = %s, correo = %s, anexo_telefonico = %s
             WHERE id = %s
         """
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query, (rut, name, lastname, profesion, nivel_jerarquico, cargo, correo, anexo_telefonico, funcionario_id))
-            conn.commit()
+            self.conn.commit()
 
         # Actualizar la relación entre el funcionario y el departamento
         query = """
@@ -62,57 +71,63 @@ class GestionRepository:
             SET id_departamento = %s
             WHERE id_persona = %s
         """
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query, (departamento_id, funcionario_id))
-            conn.commit()
+            self.conn.commit()
 
     def fetch_departamentos(self):
-        conn = get_db_connection()
-        with conn.cursor() as cur:
+        with self.conn.cursor() as cur:
             cur.execute("SELECT id, name, id_departamento_padre FROM departamento ORDER BY id")
             return cur.fetchall()
 
     def fetch_departamento_by_id(self, departamento_id):
-        conn = get_db_connection()
         query = "SELECT id, name, id_departamento_padre FROM departamento WHERE id = %s"
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query, (departamento_id,))
             return cursor.fetchone()
 
     def update_departamento(self, departamento_id, name, id_departamento_padre):
-        conn = get_db_connection()
+        # Los triggers de departamento reconstruyen departamento_jerarquia en la misma transacción
         query = "UPDATE departamento SET name = %s, id_departamento_padre = %s WHERE id = %s"
-        with conn.cursor() as cursor:
-            cursor.execute(query, (name, id_departamento_padre, departamento_id))
-            conn.commit()
+        try:
+            with self.conn.cursor() as cursor:
+                if id_departamento_padre:
+                    # El nuevo padre no puede estar bajo el propio departamento
+                    cursor.execute("""
+                        SELECT 1 FROM departamento_jerarquia
+                        WHERE id_ancestro = %s AND id_descendiente = %s
+                    """, (departamento_id, id_departamento_padre))
+                    if cursor.fetchone():
+                        raise JerarquiaCiclicaError()
+                cursor.execute(query, (name, id_departamento_padre, departamento_id))
+                self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        # Nombres y rutas cambian en el árbol en memoria y en todos los reportes
+        departamento_tree.invalidar()
+        invalidate_departments()
 
     def fetch_niveles_jerarquicos(self):
-        conn = get_db_connection()
-        with conn.cursor() as cur:
+        with self.conn.cursor() as cur:
             cur.execute("SELECT DISTINCT nivel_jerarquico FROM persona ORDER BY nivel_jerarquico")
             return [row[0] for row in cur.fetchall()]
 
     def fetch_departamento_chain_by_name(self, name):
-        conn = get_db_connection()
+        # Descendientes desde la tabla de clausura departamento_jerarquia
         query = """
-            WITH RECURSIVE child_chain AS (
-                SELECT id, name, id_departamento_padre, 1 AS level
-                FROM departamento
-                WHERE name = %s
-                UNION ALL
-                SELECT d.id, d.name, d.id_departamento_padre, cc.level + 1
-                FROM departamento d
-                JOIN child_chain cc ON d.id_departamento_padre = cc.id
-            )
-            SELECT id, name, id_departamento_padre, level FROM child_chain
-            ORDER BY level, id
+            SELECT d.id, d.name, d.id_departamento_padre, j.profundidad + 1 AS level
+            FROM departamento raiz
+            JOIN departamento_jerarquia j ON j.id_ancestro = raiz.id
+            JOIN departamento d ON d.id = j.id_descendiente
+            WHERE raiz.name = %s
+            ORDER BY level, d.id
         """
-        with conn.cursor() as cur:
+        with self.conn.cursor() as cur:
             cur.execute(query, (name,))
             return cur.fetchall()
 
     def fetch_areas_by_departamento(self, departamento_id=None, search=None):
-        conn = get_db_connection()
         query = """
             SELECT a.id, a.name, a.id_departamento, d.name as departamento_name
             FROM area a
@@ -134,12 +149,11 @@ class GestionRepository:
             
         query += " ORDER BY a.name"
         
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query, params)
             return cursor.fetchall()
     
     def fetch_origenes_by_departamento(self, departamento_id=None, search=None):
-        conn = get_db_connection()
         query = """
             SELECT o.id, o.name, o.id_departamento, d.name as departamento_name
             FROM origen o
@@ -161,16 +175,14 @@ class GestionRepository:
             
         query += " ORDER BY o.name"
         
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query, params)
             return cursor.fetchall()
     
     def crear_area(self, name, id_departamento):
-        conn = get_db_connection()
-        
         try:
             # First reset the sequence to avoid UniqueViolation error
-            with conn.cursor() as cursor:
+            with self.conn.cursor() as cursor:
                 # Get the current max ID
                 cursor.execute("SELECT MAX(id) FROM area")
                 max_id = cursor.fetchone()[0]
@@ -185,23 +197,19 @@ class GestionRepository:
                 VALUES (%s, %s)
                 RETURNING id
             """
-            with conn.cursor() as cursor:
+            with self.conn.cursor() as cursor:
                 cursor.execute(query, (name, id_departamento))
                 area_id = cursor.fetchone()[0]
-                conn.commit()
+                self.conn.commit()
                 return area_id
         except Exception as e:
-            conn.rollback()
+            self.conn.rollback()
             raise e
-        finally:
-            conn.close()
     
     def crear_origen(self, name, id_departamento):
-        conn = get_db_connection()
-        
         try:
             # First reset the sequence to avoid UniqueViolation error
-            with conn.cursor() as cursor:
+            with self.conn.cursor() as cursor:
                 # Get the current max ID
                 cursor.execute("SELECT MAX(id) FROM origen")
                 max_id = cursor.fetchone()[0]
@@ -216,49 +224,43 @@ class GestionRepository:
                 VALUES (%s, %s)
                 RETURNING id
             """
-            with conn.cursor() as cursor:
+            with self.conn.cursor() as cursor:
                 cursor.execute(query, (name, id_departamento))
                 origen_id = cursor.fetchone()[0]
-                conn.commit()
+                self.conn.commit()
                 return origen_id
         except Exception as e:
-            conn.rollback()
+            self.conn.rollback()
             raise e
-        finally:
-            conn.close()
     
     def actualizar_area(self, area_id, name, id_departamento):
-        conn = get_db_connection()
         query = """
             UPDATE area
             SET name = %s, id_departamento = %s
             WHERE id = %s
         """
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query, (name, id_departamento, area_id))
-            conn.commit()
+            self.conn.commit()
     
     def actualizar_origen(self, origen_id, name, id_departamento):
-        conn = get_db_connection()
         query = """
             UPDATE origen
             SET name = %s, id_departamento = %s
             WHERE id = %s
         """
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query, (name, id_departamento, origen_id))
-            conn.commit()
+            self.conn.commit()
     
     def eliminar_area(self, area_id):
-        conn = get_db_connection()
         query = "DELETE FROM area WHERE id = %s"
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query, (area_id,))
-            conn.commit()
+            self.conn.commit()
     
     def eliminar_origen(self, origen_id):
-        conn = get_db_connection()
         query = "DELETE FROM origen WHERE id = %s"
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query, (origen_id,))
-            conn.commit()
+            self.conn.commit()
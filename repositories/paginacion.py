@@ -0,0 +1,120 @@
+"""
+Paginación por clave (keyset) de los listados de compromisos.
+
+En vez de traer todos los compromisos y cortar la página en la plantilla, la
+consulta selecciona sólo los ids de la página: filtra, ordena por (columna, id)
+y se queda con LIMIT filas a partir del cursor, es decir, después (o antes) de
+la última fila mostrada. Los joins con personas, origen y área y la agregación
+de referentes se hacen después, sólo sobre esas filas.
+
+La consulta de cada página expone el valor de orden como `valor` y el id como
+`id`; las filas de la página lo traen como `valor_orden`. El cursor es
+"<valor>_<id>" de la fila frontera; el valor va vacío si es NULL.
+Los NULL quedan al final en orden ascendente y al principio en descendente,
+como los ordena PostgreSQL.
+
+El total no se cuenta completo: se cuentan como máximo CONTEO_MAXIMO filas, lo
+que basta para mostrar "N compromisos" o "más de CONTEO_MAXIMO".
+"""
+from datetime import datetime
+
+from repositories.busqueda import RELEVANCIA
+
+# Columnas por las que se puede ordenar: (expresión SQL, conversión del valor del cursor).
+# La relevancia depende de la búsqueda: su expresión recibe la consulta como parámetro.
+ORDENES = {
+    'fecha_limite': ('c.fecha_limite', datetime.fromisoformat),
+    'fecha_creacion': ('c.fecha_creacion', datetime.fromisoformat),
+    'avance': ('c.avance', int),
+    'relevancia': (RELEVANCIA, float),
+}
+TAMANO_PAGINA = 5
+CONTEO_MAXIMO = 1000
+
+
+def _leer_cursor(cursor, convertir):
+    valor, separador, id_fila = cursor.rpartition('_')
+    if not separador:
+        raise ValueError(f"Cursor de página inválido: {cursor}")
+    return (convertir(valor) if valor else None), int(id_fila)
+
+
+class PaginaCompromisos:
+    """
+    Una página de un listado: columna y sentido del orden, cursor de partida y
+    tamaño. Con `antes` la página es la anterior al cursor (se lee en sentido
+    inverso y se da vuelta al final).
+    """
+
+    def __init__(self, orden='fecha_limite', descendente=False, despues=None, antes=None, limite=TAMANO_PAGINA):
+        if orden not in ORDENES:
+            raise ValueError(f"Orden no soportado: {orden}")
+        self.orden = orden
+        self.descendente = descendente
+        self.limite = limite
+        self.hacia_atras = bool(antes)
+        convertir = ORDENES[orden][1]
+        self.cursor = _leer_cursor(antes or despues, convertir) if (antes or despues) else None
+
+    @property
+    def columna(self):
+        return ORDENES[self.orden][0]
+
+    def params_columna(self, consulta):
+        """Parámetros de la expresión de orden: la relevancia usa la consulta de búsqueda."""
+        return [consulta] if self.orden == 'relevancia' else []
+
+    def _desc(self):
+        # Leer hacia atrás es leer en el sentido contrario
+        return self.descendente != self.hacia_atras
+
+    def tramos(self):
+        """
+        Condiciones (sql, params) sobre `valor` e `id` de las filas que siguen al
+        cursor en el sentido de lectura, en orden. Una comparación de filas
+        (valor, id) > (%s, %s) recorre el índice desde el cursor; las filas NULL
+        que quedan por leer van en un tramo aparte para no convertirla en un
+        filtro con OR.
+        """
+        if self.cursor is None:
+            return [('', [])]
+        valor, id_fila = self.cursor
+        if not self._desc():
+            # Ascendente: los NULL van al final
+            if valor is None:
+                return [(" AND valor IS NULL AND id > %s", [id_fila])]
+            return [(" AND (valor, id) > (%s, %s)", [valor, id_fila]),
+                    (" AND valor IS NULL", [])]
+        # Descendente: los NULL van al principio
+        if valor is None:
+            return [(" AND valor IS NULL AND id < %s", [id_fila]),
+                    (" AND valor IS NOT NULL", [])]
+        return [(" AND (valor, id) < (%s, %s)", [valor, id_fila])]
+
+    def orden_sql(self, tabla=''):
+        sentido = 'DESC' if self._desc() else 'ASC'
+        prefijo = f"{tabla}." if tabla else ''
+        return f"{prefijo}valor {sentido}, {prefijo}id {sentido}"
+
+    def cursor_de(self, fila):
+        valor = fila['valor_orden']
+        texto = '' if valor is None else (valor.isoformat() if isinstance(valor, datetime) else str(valor))
+        return f"{texto}_{fila['compromiso_id']}"
+
+    def resultado(self, filas):
+        """
+        Recibe las filas leídas (hasta limite + 1, en el sentido de lectura) y
+        devuelve {'compromisos', 'anterior', 'siguiente'} con los cursores de
+        las páginas vecinas (None si no hay).
+        """
+        hay_mas = len(filas) > self.limite
+        filas = filas[:self.limite]
+        if self.hacia_atras:
+            filas.reverse()
+            anterior = self.cursor_de(filas[0]) if hay_mas else None
+            # Se llegó desde la página siguiente, que empieza en el cursor
+            siguiente = self.cursor_de(filas[-1]) if filas else None
+        else:
+            anterior = self.cursor_de(filas[0]) if (filas and self.cursor is not None) else None
+            siguiente = self.cursor_de(filas[-1]) if hay_mas else None
+        return {'compromisos': filas, 'anterior': anterior, 'siguiente': siguiente}
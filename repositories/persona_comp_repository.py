@@ -1,11 +1,9 @@
-from database import get_db_connection
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from repositories.base_repository import BaseRepository
+from repositories.report_cache import invalidate_departments
 
-class PersonaCompRepository:
-    def __init__(self):
-        self.conn = get_db_connection()
-    
+class PersonaCompRepository(BaseRepository):
     def get_compromisos_eliminados(self):
         return self.fetch_compromisos_eliminados()
 
@@ -24,7 +22,9 @@ class PersonaCompRepository:
                            fecha_limite, comentario, comentario_direccion, id_departamento, %s, id_origen, id_area
                     FROM compromiso
                     WHERE id = %s
+                    RETURNING id_departamento
                 """, (user_id, compromiso_id))
+                departamentos = [row[0] for row in cursor.fetchall()]
                 
                 # Resto de las consultas para transferir datos a tablas de elementos eliminados
                 cursor.execute("""
@@ -57,6 +57,7 @@ class PersonaCompRepository:
                 cursor.execute("DELETE FROM compromiso WHERE id = %s", (compromiso_id,))
                 
                 self.conn.commit()
+            invalidate_departments(departamentos)
         except Exception as e:
             self.conn.rollback()
             print(f"Error in eliminar_compromiso: {e}")
@@ -77,7 +78,9 @@ class PersonaCompRepository:
                            %s, id_origen, id_area
                     FROM compromiso
                     WHERE id = %s
+                    RETURNING id_departamento
                 """, (user_id, compromiso_id))
+                departamentos = [row[0] for row in cursor.fetchall()]
                 
                 # Insertar en archivados después de insertar en compromisos_archivados
                 cursor.execute("""
@@ -108,6 +111,7 @@ class PersonaCompRepository:
                 cursor.execute("DELETE FROM compromiso_verificador WHERE id_compromiso = %s", (compromiso_id,))
                 cursor.execute("DELETE FROM compromiso WHERE id = %s", (compromiso_id,))
                 self.conn.commit()
+            invalidate_departments(departamentos)
         except Exception as e:
             self.conn.rollback()
             print(f"Error in archivar_compromiso: {e}")
@@ -126,7 +130,9 @@ class PersonaCompRepository:
                            id_origen, id_area
                     FROM compromisos_archivados
                     WHERE id = %s
+                    RETURNING id_departamento
                 """, (compromiso_id,))
+                departamentos = [row[0] for row in cursor.fetchall()]
                 
                 # Restaurar registros relacionados en persona_compromiso desde persona_compromiso_archivado
                 cursor.execute("""
@@ -162,6 +168,7 @@ class PersonaCompRepository:
                 cursor.execute("DELETE FROM compromisos_archivados WHERE id = %s", (compromiso_id,))
                 
                 self.conn.commit()
+            invalidate_departments(departamentos)
         except Exception as e:
             self.conn.rollback()
             print(f"Error in desarchivar_compromiso: {e}")
@@ -177,6 +184,8 @@ class PersonaCompRepository:
                 # Eliminar el compromiso
                 cursor.execute("DELETE FROM compromiso_eliminado WHERE id = %s", (compromiso_id,))
                 self.conn.commit()
+            # Sólo cambia el contador de eliminados: basta con la entrada sin filtrar
+            invalidate_departments([])
         except Exception as e:
             self.conn.rollback()
             print(f"Error in eliminar_permanentemente_compromiso: {e}")
@@ -188,6 +197,7 @@ class PersonaCompRepository:
                 cursor.execute("DELETE FROM compromisos_archivados WHERE id = ANY(%s)", (compromiso_ids,))
                 cursor.execute("DELETE FROM compromiso_eliminado WHERE id = ANY(%s)", (compromiso_ids,))
                 self.conn.commit()
+            invalidate_departments([])
         except Exception as e:
             self.conn.rollback()
             print(f"Error in forzar_eliminacion_compromisos: {e}")
@@ -264,7 +274,9 @@ class PersonaCompRepository:
                            id_origen, id_area
                     FROM compromiso_eliminado
                     WHERE id = %s
+                    RETURNING id_departamento
                 """, (compromiso_id,))
+                departamentos = [row[0] for row in cursor.fetchall()]
                 
                 # Restaurar registros relacionados en persona_compromiso desde persona_compromiso_eliminado
                 cursor.execute("""
@@ -300,6 +312,7 @@ class PersonaCompRepository:
                 cursor.execute("DELETE FROM compromiso_eliminado WHERE id = %s", (compromiso_id,))
                 
                 self.conn.commit()
+            invalidate_departments(departamentos)
         except Exception as e:
             self.conn.rollback()
             print(f"Error in recuperar_compromiso: {e}")
@@ -324,6 +337,7 @@ class PersonaCompRepository:
                 )
                 compromiso_id = cursor.fetchone()['id']
                 self.conn.commit()
+                invalidate_departments([id_departamento])
                 print(f"Compromiso creado exitosamente con ID: {compromiso_id}, id_origen={origen}, id_area={area}, avance=0")
                 return compromiso_id
         except Exception as e:
@@ -340,7 +354,10 @@ class PersonaCompRepository:
                         INSERT INTO persona_compromiso (id_persona, id_compromiso, es_responsable_principal)
                         VALUES (%s, %s, %s)
                     """, (referente_id, compromiso_id, es_responsable))
+                cursor.execute("SELECT id_departamento FROM compromiso WHERE id = %s", (compromiso_id,))
+                departamentos = [row[0] for row in cursor.fetchall()]
                 self.conn.commit()
+                invalidate_departments(departamentos)
                 print("Referentes asociados exitosamente")
         except Exception as e:
             self.conn.rollback()
@@ -383,7 +400,10 @@ class PersonaCompRepository:
                         )
                     """, (nuevo_ref, compromiso_id, nuevo_ref, compromiso_id))
 
+                cursor.execute("SELECT id_departamento FROM compromiso WHERE id = %s", (compromiso_id,))
+                departamentos = [row[0] for row in cursor.fetchall()]
                 self.conn.commit()
+                invalidate_departments(departamentos)
         except ResponsablePrincipalError:
             self.conn.rollback()
             raise
@@ -436,15 +456,6 @@ class PersonaCompRepository:
             print(f"Error in get_user_info: {e}")
             raise e
 
-    def commit(self):
-        self.conn.commit()
-
-    def rollback(self):
-        self.conn.rollback()
-
-    def close(self):
-        self.conn.close()
-
     def add_verificador(self, id_compromiso, nombre_archivo, ruta_archivo, descripcion, user_id):
         """
         Añade un verificador de compromiso a la base de datos
@@ -0,0 +1,363 @@
+"""
+In-memory analytics over a columnar extract of compromiso facts.
+
+One statement pulls compromiso (department, estado, creation day, due month and
+year), its meeting areas and its assigned people as one array per column. The
+dashboard aggregates, per-department and per-person figures, daily series and
+the compromisos summary by month, area, year or department are then computed
+with NumPy group-bys over those arrays, without a query per variant.
+
+The extract is shared by the whole process. It is reloaded when a write
+invalidates the report cache (report_cache.generation changes) and, for writes
+made by other processes, after REPORT_ANALYTICS_TTL seconds. Department names
+and their order come from the in-memory department tree.
+
+Off by default (REPORT_ANALYTICS): when on it takes precedence over the report
+snapshots and the daily rollups in /api/report_data (see config.py).
+"""
+import decimal
+import os
+import threading
+import time
+
+import numpy as np
+
+from repositories.base_repository import BaseRepository, read_only
+from repositories.report_cache import report_cache
+
+_settings = {
+    'enabled': os.getenv('REPORT_ANALYTICS', '0') == '1',
+    'ttl': float(os.getenv('REPORT_ANALYTICS_TTL', 60)),
+}
+_state = {'facts': None}
+_lock = threading.Lock()
+
+# estado codes of the extract
+PENDIENTE, COMPLETADO, OTRO, SIN_ESTADO = 0, 1, 2, 3
+# Missing ids and dates in the integer columns
+NONE = -1
+NO_DAY = np.iinfo(np.int32).min
+
+_EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+def configure(enabled=None, ttl=None):
+    if enabled is not None:
+        _settings['enabled'] = bool(enabled)
+    if ttl is not None:
+        _settings['ttl'] = float(ttl)
+
+
+def init_app(app):
+    configure(app.config.get('REPORT_ANALYTICS'), app.config.get('REPORT_ANALYTICS_TTL'))
+
+
+def analytics_enabled():
+    return _settings['enabled']
+
+
+def numeric_percentage(part, total):
+    """
+    part * 100.0 / NULLIF(total, 0) with the scale PostgreSQL gives that numeric
+    division (select_div_scale), so payloads match the SQL engines exactly.
+    """
+    if not total:
+        return None
+
+    def leading(value):
+        # Weight and first digit of value in NBASE 10000
+        if value == 0:
+            return 0, 0
+        weight = (len(str(value)) - 1) // 4
+        return weight, value // 10000 ** weight
+
+    weight1, first1 = leading(int(part) * 100)
+    weight2, first2 = leading(int(total))
+    qweight = weight1 - weight2 - (1 if first1 <= first2 else 0)
+    scale = max(16 - qweight * 4, 1)
+    with decimal.localcontext() as ctx:
+        ctx.prec = 80
+        quotient = decimal.Decimal(int(part) * 100) / decimal.Decimal(int(total))
+        return quotient.quantize(decimal.Decimal(1).scaleb(-scale), rounding=decimal.ROUND_HALF_UP)
+
+
+class CompromisoFactsRepository(BaseRepository):
+    @read_only
+    def fetch_extract(self):
+        """Every column of the extract as a list, from a single statement (one snapshot)."""
+        # Aggregates at the same level consume the same rows, so their arrays line up
+        query = """
+            SELECT *
+            FROM (
+                SELECT array_agg(id) AS id,
+                       array_agg(COALESCE(id_departamento, %(none)s)) AS departamento,
+                       array_agg(CASE WHEN estado IS NULL THEN %(sin_estado)s
+                                      WHEN estado = 'Pendiente' THEN %(pendiente)s
+                                      WHEN estado = 'Completado' THEN %(completado)s
+                                      ELSE %(otro)s END) AS estado,
+                       array_agg(COALESCE(fecha_creacion::date - DATE '1970-01-01', %(no_day)s)) AS dia_creacion,
+                       array_agg(COALESCE(EXTRACT(MONTH FROM fecha_limite)::int, 0)) AS mes_limite,
+                       array_agg(COALESCE(EXTRACT(YEAR FROM fecha_limite)::int, 0)) AS anio_limite
+                FROM compromiso
+            ) compromisos,
+            (
+                SELECT array_agg(rc.id_compromiso) AS reunion_compromiso,
+                       array_agg(COALESCE(r.id_area, %(none)s)) AS reunion_area
+                FROM reunion_compromiso rc
+                JOIN reunion r ON r.id = rc.id_reunion
+            ) reuniones,
+            (
+                SELECT array_agg(id_compromiso) AS asignacion_compromiso,
+                       array_agg(id_persona) AS asignacion_persona
+                FROM persona_compromiso
+            ) asignaciones,
+            (
+                SELECT array_agg(id) AS persona, array_agg(name) AS persona_name,
+                       array_agg(lastname) AS persona_lastname
+                FROM persona
+            ) personas
+        """
+        params = {'none': NONE, 'pendiente': PENDIENTE, 'completado': COMPLETADO, 'otro': OTRO,
+                  'sin_estado': SIN_ESTADO, 'no_day': int(NO_DAY)}
+        with self.conn.cursor() as cursor:
+            cursor.execute(query, params)
+            row = cursor.fetchone()
+            return {col[0]: value or [] for col, value in zip(cursor.description, row)}
+
+    def load(self, generation=None):
+        return CompromisoFacts(self.fetch_extract(), generation)
+
+
+def _int_column(values):
+    return np.asarray(values, dtype=np.int32)
+
+
+class CompromisoFacts:
+    """Immutable extract; every method is a pure function of it (safe across threads)."""
+
+    def __init__(self, extract, generation=None):
+        self.generation = generation
+        self.loaded_at = time.monotonic()
+        ids = np.asarray(extract['id'], dtype=np.int64)
+        # Sorted by id so the link tables can locate their compromiso by binary search
+        order = np.argsort(ids, kind='stable')
+        ids = ids[order]
+        self.size = len(ids)
+        self.departamento = _int_column(extract['departamento'])[order]
+        self.estado = np.asarray(extract['estado'], dtype=np.int8)[order]
+        self.dia_creacion = _int_column(extract['dia_creacion'])[order]
+        self.mes_limite = np.asarray(extract['mes_limite'], dtype=np.int8)[order]
+        self.anio_limite = _int_column(extract['anio_limite'])[order]
+
+        # Rows of the compromisos summary: one per (compromiso, meeting) link, plus one
+        # with no area for compromisos without meetings (the LEFT JOINs of the SQL version)
+        pos = self._positions(ids, extract['reunion_compromiso'])
+        valid = pos >= 0
+        sin_reunion = np.setdiff1d(np.arange(self.size), pos[valid])
+        self.resumen_pos = np.concatenate([pos[valid], sin_reunion])
+        self.resumen_area = np.concatenate([_int_column(extract['reunion_area'])[valid],
+                                            np.full(len(sin_reunion), NONE, dtype=np.int32)])
+
+        # Assignments grouped by (name, lastname), like GROUP BY p.name, p.lastname
+        personas = np.asarray(extract['persona'], dtype=np.int64)
+        groups = {}
+        group_of = np.fromiter((groups.setdefault(key, len(groups))
+                                for key in zip(extract['persona_name'], extract['persona_lastname'])),
+                               dtype=np.int32, count=len(personas))
+        self.persona_labels = [None if name is None or lastname is None else f'{name} {lastname}'
+                               for name, lastname in groups]
+        order = np.argsort(personas, kind='stable')
+        personas, group_of = personas[order], group_of[order]
+        pos = self._positions(ids, extract['asignacion_compromiso'])
+        persona_pos = self._positions(personas, extract['asignacion_persona'])
+        valid = (pos >= 0) & (persona_pos >= 0)
+        self.asignacion_pos = pos[valid]
+        self.asignacion_persona = group_of[persona_pos[valid]]
+
+    @staticmethod
+    def _positions(ids, wanted):
+        """Position of each wanted id in the sorted ids (-1 if absent)."""
+        wanted = np.asarray(wanted, dtype=np.int64)
+        if not len(ids):
+            return np.full(len(wanted), -1, dtype=np.int64)
+        pos = np.searchsorted(ids, wanted)
+        pos[pos >= len(ids)] = 0
+        return np.where(ids[pos] == wanted, pos, -1)
+
+    def _scope(self, dept_ids=None):
+        if not dept_ids:
+            return np.ones(self.size, dtype=bool)
+        return np.isin(self.departamento, np.asarray(list(dept_ids), dtype=np.int32))
+
+    @staticmethod
+    def _name_order(tree):
+        """Department name -> position, in the database collation order of the tree."""
+        order = {}
+        for node in sorted(tree.nodos.values(), key=lambda node: node.orden_nombre):
+            order.setdefault(node.name, len(order))
+        return order
+
+    def compromiso_aggregates(self, tree, dept_ids=None):
+        """Counterpart of ReportesRepository.get_compromiso_aggregates."""
+        scope = self._scope(dept_ids)
+        pendiente = self.estado == PENDIENTE
+        completado = self.estado == COMPLETADO
+        total = int(scope.sum())
+        completados = int((scope & completado).sum())
+        pendientes = int((scope & pendiente).sum())
+        data = {
+            'total_compromisos': total,
+            'pendientes': pendientes,
+            'completados': completados,
+            'percentage_completados': numeric_percentage(completados, total),
+            'percentage_pendientes': numeric_percentage(pendientes, total),
+            'compromisos_por_departamento': [],
+            'percentage_completados_por_departamento': [],
+            'by_department_id': {},
+        }
+
+        departamentos, inverse = np.unique(self.departamento, return_inverse=True)
+        totales = np.bincount(inverse, minlength=len(departamentos))
+        completados = np.bincount(inverse, weights=completado, minlength=len(departamentos)).astype(np.int64)
+        by_name = {}
+        for dept_id, dept_total, dept_completados in zip(departamentos.tolist(), totales.tolist(),
+                                                         completados.tolist()):
+            if dept_id == NONE:
+                continue
+            data['by_department_id'][dept_id] = {
+                'total': dept_total,
+                'porcentaje_completados': numeric_percentage(dept_completados, dept_total) or 0,
+            }
+            if dept_id in tree:
+                suma = by_name.setdefault(tree.nombre(dept_id), [0, 0])
+                suma[0] += dept_total
+                suma[1] += dept_completados
+
+        order = self._name_order(tree)
+        for name in sorted(by_name, key=lambda name: order.get(name, len(order))):
+            name_total, name_completados = by_name[name]
+            data['compromisos_por_departamento'].append({'nombre': name, 'total': name_total})
+            data['percentage_completados_por_departamento'].append(
+                {'departamento': name, 'porcentaje_completados': numeric_percentage(name_completados, name_total) or 0})
+        return data
+
+    def persona_aggregates(self):
+        """Counterpart of ReportesRepository.get_persona_aggregates."""
+        n = len(self.persona_labels)
+        estado = self.estado[self.asignacion_pos]
+        totales = np.bincount(self.asignacion_persona, minlength=n)
+        pendientes = np.bincount(self.asignacion_persona, weights=estado == PENDIENTE, minlength=n).astype(np.int64)
+        completados = np.bincount(self.asignacion_persona, weights=estado == COMPLETADO, minlength=n).astype(np.int64)
+        # ORDER BY pendientes DESC, completados DESC
+        order = np.lexsort((-completados, -pendientes)).tolist()
+        pendientes, completados, totales = pendientes.tolist(), completados.tolist(), totales.tolist()
+        return {
+            'personas_mas': [{'persona': self.persona_labels[i], 'pendientes': pendientes[i],
+                              'completados': completados[i]} for i in order[:10]],
+            'percentage_completados_por_persona': [
+                {'persona': self.persona_labels[i],
+                 'porcentaje_completados': numeric_percentage(completados[i], totales[i]) or 0}
+                for i in order
+            ],
+        }
+
+    @staticmethod
+    def _day(day):
+        return None if day == NO_DAY else str(_EPOCH + int(day))
+
+    def daily_series(self, tree, dept_ids=None):
+        """Counterpart of ReportesRepository.get_daily_series."""
+        scope = self._scope(dept_ids)
+        dias = self.dia_creacion[scope]
+        departamentos = self.departamento[scope]
+
+        days, inverse = np.unique(dias, return_inverse=True)
+        totales = np.bincount(inverse, minlength=len(days))
+        # Days without date sort last, as NULL does in ORDER BY
+        rank = np.arange(len(days))
+        if len(days) and days[0] == NO_DAY:
+            rank = (rank - 1) % len(days)
+        by_rank = np.argsort(rank)
+        data = {
+            'compromisos_por_dia': [{'dia': self._day(days[i]), 'total': int(totales[i])} for i in by_rank.tolist()],
+            'compromisos_por_dia_por_departamento': [],
+        }
+
+        # (day, department name) groups, names in the tree (collation) order
+        order = self._name_order(tree)
+        names = list(order)
+        ids = np.unique(departamentos)
+        codes = np.array([order[tree.nombre(dept_id)] if dept_id in tree else -1 for dept_id in ids.tolist()],
+                         dtype=np.int64)
+        codes = codes[np.searchsorted(ids, departamentos)]
+        named = codes >= 0
+        width = max(len(names), 1)
+        groups, counts = np.unique(rank[inverse[named]] * width + codes[named], return_counts=True)
+        for key, total in zip(groups.tolist(), counts.tolist()):
+            day_rank, code = divmod(key, width)
+            data['compromisos_por_dia_por_departamento'].append(
+                {'dia': self._day(days[by_rank[day_rank]]), 'departamento': names[code], 'total': total})
+        return data
+
+    def resumen_compromisos(self, tree, mes=None, area_id=None, year=None, departamento_id=None):
+        """
+        Counterpart of CompromisoRepository.fetch_departamentos_resumen plus the global
+        totals of CompromisoService.get_resumen_compromisos. mes is a month number.
+        """
+        pos = self.resumen_pos
+        mask = self.mes_limite[pos] != 0  # fecha_limite IS NOT NULL
+        if mes and mes != "Todos":
+            mask &= self.mes_limite[pos] == int(mes)
+        if area_id:
+            mask &= self.resumen_area == int(area_id)
+        if year and year != "Todos":
+            mask &= self.anio_limite[pos] == int(year)
+        if departamento_id:
+            mask &= self.departamento[pos] == int(departamento_id)
+        pos = pos[mask]
+        departamentos = self.departamento[pos]
+        estado = self.estado[pos]
+
+        ids, inverse = np.unique(departamentos, return_inverse=True)
+        totales = np.bincount(inverse, minlength=len(ids)).tolist()
+        completados = np.bincount(inverse, weights=estado == COMPLETADO, minlength=len(ids)).astype(np.int64).tolist()
+        pendientes = np.bincount(inverse, weights=(estado == PENDIENTE) | (estado == OTRO),
+                                 minlength=len(ids)).astype(np.int64).tolist()
+        filas = [(dept_id, totales[i], completados[i], pendientes[i])
+                 for i, dept_id in enumerate(ids.tolist()) if dept_id in tree]
+        # ORDER BY d.name
+        filas.sort(key=lambda fila: tree.nodos[fila[0]].orden_nombre)
+        departamentos_resumen = [
+            {'departamento_id': dept_id, 'nombre_departamento': tree.nombre(dept_id),
+             'total_compromisos': total, 'completados': dept_completados, 'pendientes': dept_pendientes}
+            for dept_id, total, dept_completados, dept_pendientes in filas
+        ]
+        return {
+            'total_compromisos': sum(fila[1] for fila in filas),
+            'completados': sum(fila[2] for fila in filas),
+            'pendientes': sum(fila[3] for fila in filas),
+            'departamentos': departamentos_resumen,
+        }
+
+
+def get_facts():
+    """The current extract, reloaded after a report-cache invalidation or the TTL."""
+    generation = report_cache.generation
+    facts = _state['facts']
+    if facts is not None and facts.generation == generation and \
+            time.monotonic() - facts.loaded_at < _settings['ttl']:
+        return facts
+    with _lock:
+        facts = _state['facts']
+        if facts is not None and facts.generation == generation and \
+                time.monotonic() - facts.loaded_at < _settings['ttl']:
+            return facts
+        # Generation read before loading: an invalidation during the load forces another
+        facts = CompromisoFactsRepository().load(generation)
+        _state['facts'] = facts
+        return facts
+
+
+def invalidate():
+    """Drops the extract; the next get_facts() reloads it."""
+    _state['facts'] = None
@@ -0,0 +1,170 @@
+"""
+In-process cache of /api/report_data payloads.
+
+Entries are keyed by the resolved department set of the filtered report
+(a frozenset of dept_ids) or by UNFILTERED. They expire after REPORT_CACHE_TTL
+seconds, and the least recently used entry is evicted past REPORT_CACHE_SIZE.
+
+Writes through the repositories call invalidate_departments() once committed
+(deferred to the unit of work when one is open). That drops every entry whose
+department set contains a changed department, plus the unfiltered one.
+Figures that a filtered payload shares with every scope, such as the global
+per-person percentages or the archived and deleted counters, are refreshed by
+the TTL. The cache is per process; other workers see a change at most TTL
+seconds later, or on their next conditional request: /api/report_data reads the
+data version of the report tables (repositories.datos_version) and
+observe_version() drops every entry once it moves past the last one observed.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from repositories.unit_of_work import current_unit_of_work
+
+UNFILTERED = 'unfiltered'
+
+
+class ReportCache:
+    def __init__(self, maxsize=128, ttl=60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._invalidated = set()
+        self._generation = 0
+        self._data_version = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @property
+    def generation(self):
+        """Changes on every invalidation; set() ignores values computed across one."""
+        return self._generation
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, generation=None):
+        """Stores value unless an invalidation happened since `generation` was read."""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            self._invalidated.discard(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def was_invalidated(self, key):
+        """True if the last entry under key was dropped by an invalidation (not by TTL/LRU)."""
+        with self._lock:
+            return key in self._invalidated
+
+    def invalidate_departments(self, dept_ids=None):
+        """Drops the entries touching dept_ids and the unfiltered entry; everything if None."""
+        dept_ids = None if dept_ids is None else {d for d in dept_ids if d is not None}
+        with self._lock:
+            self._generation += 1
+            if dept_ids is None:
+                dropped = list(self._entries)
+            else:
+                dropped = [key for key in self._entries if key == UNFILTERED or key & dept_ids]
+            for key in dropped:
+                del self._entries[key]
+            self._invalidated.update(dropped)
+            self.invalidations += len(dropped)
+            return len(dropped)
+
+    def observe_version(self, data_version):
+        """
+        Records the data version of the report tables. A newer version than the last
+        one observed (or the first one) may come from a write this process did not
+        invalidate, such as another worker's: every entry is dropped so the next
+        payloads are at least as new as that version. Returns True if they were.
+        """
+        with self._lock:
+            if self._data_version is not None and data_version <= self._data_version:
+                return False
+            self._data_version = data_version
+        # Also moves the generation, so the analytics extract reloads as well
+        self.invalidate_departments()
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._invalidated.clear()
+            self._generation += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': _settings['enabled'],
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 3) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+_settings = {
+    'enabled': os.getenv('REPORT_CACHE', '1') == '1',
+}
+report_cache = ReportCache(int(os.getenv('REPORT_CACHE_SIZE', 128)), float(os.getenv('REPORT_CACHE_TTL', 60)))
+
+
+def configure(enabled=None, ttl=None, maxsize=None):
+    if enabled is not None:
+        _settings['enabled'] = bool(enabled)
+    if ttl is not None:
+        report_cache.ttl = float(ttl)
+    if maxsize is not None:
+        report_cache.maxsize = int(maxsize)
+
+
+def init_app(app):
+    configure(app.config.get('REPORT_CACHE'), app.config.get('REPORT_CACHE_TTL'),
+              app.config.get('REPORT_CACHE_SIZE'))
+
+
+def cache_enabled():
+    return _settings['enabled']
+
+
+def cache_key(dept_ids=None):
+    return frozenset(dept_ids) if dept_ids else UNFILTERED
+
+
+def invalidate_departments(dept_ids=None):
+    """
+    Invalidates the report entries of dept_ids (all entries if None). Inside a unit
+    of work the invalidation waits for its COMMIT and is skipped on rollback.
+    """
+    uow = current_unit_of_work()
+    if uow is not None:
+        uow.al_confirmar(lambda: report_cache.invalidate_departments(dept_ids))
+        return
+    report_cache.invalidate_departments(dept_ids)
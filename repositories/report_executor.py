@@ -0,0 +1,126 @@
+"""
+Execution of the independent report sub-queries.
+
+In sequential mode every sub-query runs on the request connection, one after
+another. In concurrent mode they are submitted to a bounded, process-wide
+thread pool; every worker runs inside its own copy of the request context, so
+it borrows its own pooled connection (replica routing included) and returns it
+when the task finishes. The pool size therefore also caps how many extra
+connections a dashboard can hold at once.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import copy_current_request_context, current_app, g, has_app_context, has_request_context
+
+import database
+
+_settings = {
+    'concurrent': os.getenv('REPORT_CONCURRENT', '0') == '1',
+    'workers': int(os.getenv('REPORT_QUERY_WORKERS', 4)),
+    'consolidated': os.getenv('REPORT_CONSOLIDATED', '1') == '1',
+}
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def configure(concurrent=None, workers=None, consolidated=None):
+    global _pool
+    with _pool_lock:
+        if concurrent is not None:
+            _settings['concurrent'] = bool(concurrent)
+        if consolidated is not None:
+            _settings['consolidated'] = bool(consolidated)
+        if workers is not None and int(workers) != _settings['workers']:
+            _settings['workers'] = int(workers)
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+                _pool = None
+
+
+def init_app(app):
+    configure(app.config.get('REPORT_CONCURRENT'), app.config.get('REPORT_QUERY_WORKERS'),
+              app.config.get('REPORT_CONSOLIDATED'))
+
+
+def consolidated_enabled():
+    """Whether the report is built from the consolidated queries (REPORT_CONSOLIDATED)."""
+    return _settings['consolidated']
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=_settings['workers'], thread_name_prefix='report-query')
+    return _pool
+
+
+def _reset_after_fork():
+    # Pool threads do not survive a fork: the child creates its own on first use
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def _in_own_context(func):
+    """Wraps func so it runs in a worker thread with its own connection."""
+    if has_request_context():
+        recorder = g.get('sql_recorder')
+
+        @copy_current_request_context
+        def run_in_request():
+            # Statements run by the worker still count for the request's X-SQL-* headers
+            if recorder is not None:
+                g.sql_recorder = recorder
+            return _timed(func)
+        return run_in_request
+
+    if has_app_context():
+        app = current_app._get_current_object()
+
+        def run_in_app():
+            with app.app_context():
+                return _timed(func)
+        return run_in_app
+
+    def run_standalone():
+        with database.connection():
+            return _timed(func)
+    return run_standalone
+
+
+class ReportQueryExecutor:
+    """Runs a list of (key, callable) specs and merges the results into a dict."""
+
+    def run(self, specs, concurrent=None):
+        """
+        Returns (results, timings). timings maps each key to its duration in
+        milliseconds, plus '_total' for the whole batch.
+        """
+        if concurrent is None:
+            concurrent = _settings['concurrent']
+        start = time.perf_counter()
+        results, timings = {}, {}
+        if concurrent:
+            futures = [(key, _get_pool().submit(_in_own_context(func))) for key, func in specs]
+            for key, future in futures:
+                results[key], timings[key] = future.result()
+        else:
+            for key, func in specs:
+                results[key], timings[key] = _timed(func)
+        timings['_total'] = (time.perf_counter() - start) * 1000
+        return results, timings
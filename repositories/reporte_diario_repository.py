@@ -0,0 +1,67 @@
+"""
+Daily rollups behind the per-day charts (compromiso_diario, reunion_diaria; DDL in
+migraciones/0003_totales_diarios.sql).
+
+Statement-level triggers on compromiso and reunion keep the rollups current on
+every write, so the report queries read one row per day (and department) instead
+of grouping the base tables. backfill() rebuilds them from the base tables, after
+applying the DDL to an existing database or to repair drift:
+
+    flask --app app reporte-diario-backfill [--desde YYYY-MM-DD]
+"""
+import click
+
+from repositories.base_repository import BaseRepository
+from repositories.report_cache import invalidate_departments
+
+
+class ReporteDiarioRepository(BaseRepository):
+    def backfill(self, desde=None):
+        """
+        Recomputes the daily rollups from the base tables, all days or only from
+        `desde` on. Returns the number of (compromiso, reunion) rollup rows written.
+        """
+        # Rows without fecha_creacion live under '-infinity' and are only rebuilt in full
+        scope = "dia >= %(desde)s" if desde else "TRUE"
+        source_scope = "fecha_creacion >= %(desde)s" if desde else "TRUE"
+        params = {'desde': desde}
+        try:
+            with self.conn.cursor() as cursor:
+                # Blocks writers (and their triggers) until the rollups are rebuilt
+                cursor.execute("LOCK TABLE compromiso, reunion IN SHARE MODE")
+                cursor.execute(f"DELETE FROM compromiso_diario WHERE {scope}", params)
+                cursor.execute(f"""
+                    INSERT INTO compromiso_diario (dia, id_departamento, total, pendientes, completados)
+                    SELECT COALESCE(fecha_creacion::date, '-infinity'), COALESCE(id_departamento, 0), COUNT(*),
+                           COUNT(*) FILTER (WHERE estado = 'Pendiente'),
+                           COUNT(*) FILTER (WHERE estado = 'Completado')
+                    FROM compromiso
+                    WHERE {source_scope}
+                    GROUP BY 1, 2
+                """, params)
+                compromisos = cursor.rowcount
+                cursor.execute(f"DELETE FROM reunion_diaria WHERE {scope}", params)
+                cursor.execute(f"""
+                    INSERT INTO reunion_diaria (dia, total)
+                    SELECT COALESCE(fecha_creacion::date, '-infinity'), COUNT(*)
+                    FROM reunion
+                    WHERE {source_scope}
+                    GROUP BY 1
+                """, params)
+                reuniones = cursor.rowcount
+            self.commit()
+        except Exception:
+            self.rollback()
+            raise
+        invalidate_departments()
+        return compromisos, reuniones
+
+
+def init_app(app):
+    @app.cli.command('reporte-diario-backfill')
+    @click.option('--desde', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+                  help='Only rebuild days from this date (YYYY-MM-DD) on.')
+    def reporte_diario_backfill(desde):
+        """Rebuilds the compromiso_diario and reunion_diaria rollups."""
+        compromisos, reuniones = ReporteDiarioRepository().backfill(desde.date() if desde else None)
+        click.echo(f"compromiso_diario: {compromisos} rows, reunion_diaria: {reuniones} rows")
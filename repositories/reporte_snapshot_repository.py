@@ -0,0 +1,202 @@
+"""
+Precomputed report aggregates (reporte_snapshot_* tables, DDL in migraciones/0001_snapshots_reporte.sql).
+
+Triggers on compromiso and persona_compromiso only record which departments
+changed (reporte_snapshot_pendiente). Before a report is read, ensure_fresh()
+recomputes those departments if the oldest pending change is older than
+REPORT_SNAPSHOT_MAX_STALENESS seconds; otherwise the report is served from the
+snapshot as is, at most that stale. The readers return the same shapes as the
+consolidated queries of ReportesRepository.
+"""
+import logging
+import os
+
+import psycopg2
+
+from repositories.base_repository import BaseRepository, read_only
+
+logger = logging.getLogger(__name__)
+
+_settings = {
+    'enabled': os.getenv('REPORT_SNAPSHOTS', '1') == '1',
+    'max_staleness': float(os.getenv('REPORT_SNAPSHOT_MAX_STALENESS', 60)),
+    # False once the tables turn out to be missing (DDL not applied)
+    'available': True,
+}
+
+# pg_advisory_xact_lock key serializing refreshes across processes
+_REFRESH_LOCK = 0x5347430C
+
+
+def configure(enabled=None, max_staleness=None):
+    if enabled is not None:
+        _settings['enabled'] = bool(enabled)
+        _settings['available'] = True
+    if max_staleness is not None:
+        _settings['max_staleness'] = float(max_staleness)
+
+
+def init_app(app):
+    configure(app.config.get('REPORT_SNAPSHOTS'), app.config.get('REPORT_SNAPSHOT_MAX_STALENESS'))
+
+
+def snapshots_enabled():
+    return _settings['enabled'] and _settings['available']
+
+
+class ReporteSnapshotRepository(BaseRepository):
+    def ensure_fresh(self, max_staleness=None):
+        """
+        Refreshes the pending departments when the oldest pending change exceeds the
+        staleness bound. Returns False when snapshots are disabled or unavailable, so
+        the caller falls back to the live queries.
+        """
+        if not snapshots_enabled():
+            return False
+        if max_staleness is None:
+            max_staleness = _settings['max_staleness']
+        try:
+            with self.conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT EXISTS (
+                        SELECT 1 FROM reporte_snapshot_pendiente
+                        WHERE desde <= clock_timestamp()::timestamp - make_interval(secs => %s)
+                    )
+                """, (max_staleness,))
+                stale = cursor.fetchone()[0]
+            if stale:
+                self.refresh()
+            else:
+                self.rollback()
+            return True
+        except psycopg2.errors.UndefinedTable:
+            self.rollback()
+            _settings['available'] = False
+            logger.warning("Report snapshot tables not found, using live queries")
+            return False
+
+    def refresh(self):
+        """Recomputes every pending department. Returns the refreshed department ids."""
+        try:
+            with self.conn.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_xact_lock(%s)", (_REFRESH_LOCK,))
+                # Claiming the rows waits for writers still holding them (see the triggers)
+                cursor.execute("DELETE FROM reporte_snapshot_pendiente RETURNING id_departamento")
+                dept_ids = [row[0] for row in cursor.fetchall()]
+                if dept_ids:
+                    self._recompute(cursor, dept_ids)
+            self.commit()
+            return dept_ids
+        except Exception:
+            self.rollback()
+            raise
+
+    def rebuild(self):
+        """Marks every department as pending and refreshes them all."""
+        with self.conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO reporte_snapshot_pendiente (id_departamento, desde)
+                SELECT DISTINCT COALESCE(id_departamento, 0), '-infinity'::timestamp FROM compromiso
+                UNION
+                SELECT id_departamento, '-infinity'::timestamp FROM reporte_snapshot_departamento
+                ON CONFLICT (id_departamento) DO NOTHING
+            """)
+        return self.refresh()
+
+    @staticmethod
+    def _recompute(cursor, dept_ids):
+        # Compromisos without a department are stored under id 0
+        scope = "(c.id_departamento = ANY(%(ids)s) OR (c.id_departamento IS NULL AND 0 = ANY(%(ids)s)))"
+        params = {'ids': dept_ids}
+        cursor.execute("DELETE FROM reporte_snapshot_departamento WHERE id_departamento = ANY(%(ids)s)", params)
+        cursor.execute(f"""
+            INSERT INTO reporte_snapshot_departamento (id_departamento, total, pendientes, completados)
+            SELECT COALESCE(c.id_departamento, 0), COUNT(*),
+                   COUNT(*) FILTER (WHERE c.estado = 'Pendiente'),
+                   COUNT(*) FILTER (WHERE c.estado = 'Completado')
+            FROM compromiso c
+            WHERE {scope}
+            GROUP BY 1
+        """, params)
+        cursor.execute("DELETE FROM reporte_snapshot_persona WHERE id_departamento = ANY(%(ids)s)", params)
+        cursor.execute(f"""
+            INSERT INTO reporte_snapshot_persona (id_persona, id_departamento, total, pendientes, completados)
+            SELECT pc.id_persona, COALESCE(c.id_departamento, 0), COUNT(*),
+                   COUNT(*) FILTER (WHERE c.estado = 'Pendiente'),
+                   COUNT(*) FILTER (WHERE c.estado = 'Completado')
+            FROM persona_compromiso pc
+            JOIN compromiso c ON pc.id_compromiso = c.id
+            WHERE {scope}
+            GROUP BY 1, 2
+        """, params)
+
+    @read_only
+    def get_compromiso_aggregates(self, dept_ids=None):
+        """Snapshot counterpart of ReportesRepository.get_compromiso_aggregates."""
+        scope = "s.id_departamento = ANY(%(ids)s)" if dept_ids else "TRUE"
+        params = {'ids': list(dept_ids)} if dept_ids else None
+        data = {
+            'total_compromisos': 0,
+            'pendientes': 0,
+            'completados': 0,
+            'percentage_completados': None,
+            'percentage_pendientes': None,
+            'compromisos_por_departamento': [],
+            'percentage_completados_por_departamento': [],
+            'by_department_id': {},
+        }
+        with self.conn.cursor() as cursor:
+            cursor.execute(f"""
+                SELECT GROUPING(s.id_departamento, d.name) AS grupo, s.id_departamento, d.name,
+                       SUM(s.total) AS total,
+                       SUM(s.completados) * 100.0 / NULLIF(SUM(s.total), 0) AS porcentaje_completados,
+                       COALESCE(SUM(s.total) FILTER (WHERE {scope}), 0) AS total_alcance,
+                       COALESCE(SUM(s.pendientes) FILTER (WHERE {scope}), 0) AS pendientes_alcance,
+                       COALESCE(SUM(s.completados) FILTER (WHERE {scope}), 0) AS completados_alcance,
+                       SUM(s.completados) FILTER (WHERE {scope}) * 100.0
+                           / NULLIF(SUM(s.total) FILTER (WHERE {scope}), 0) AS porcentaje_completados_alcance,
+                       SUM(s.pendientes) FILTER (WHERE {scope}) * 100.0
+                           / NULLIF(SUM(s.total) FILTER (WHERE {scope}), 0) AS porcentaje_pendientes_alcance
+                FROM reporte_snapshot_departamento s
+                LEFT JOIN departamento d ON s.id_departamento = d.id
+                GROUP BY GROUPING SETS ((), (s.id_departamento), (d.name))
+            """, params)
+            for (grupo, dept_id, departamento, total, porcentaje, total_alcance, pendientes, completados,
+                 porcentaje_completados, porcentaje_pendientes) in cursor.fetchall():
+                if grupo == 0b11:
+                    data['total_compromisos'] = total_alcance
+                    data['pendientes'] = pendientes
+                    data['completados'] = completados
+                    data['percentage_completados'] = porcentaje_completados
+                    data['percentage_pendientes'] = porcentaje_pendientes
+                elif grupo == 0b01:
+                    data['by_department_id'][dept_id] = {'total': total, 'porcentaje_completados': porcentaje or 0}
+                elif departamento is not None:
+                    data['compromisos_por_departamento'].append({'nombre': departamento, 'total': total})
+                    data['percentage_completados_por_departamento'].append(
+                        {'departamento': departamento, 'porcentaje_completados': porcentaje or 0})
+
+        return data
+
+    @read_only
+    def get_persona_aggregates(self):
+        """Snapshot counterpart of ReportesRepository.get_persona_aggregates."""
+        query = """
+            SELECT p.name || ' ' || p.lastname as persona,
+                   SUM(s.pendientes) as pendientes,
+                   SUM(s.completados) as completados,
+                   SUM(s.completados) * 100.0 / NULLIF(SUM(s.total), 0) as porcentaje_completados
+            FROM reporte_snapshot_persona s
+            JOIN persona p ON p.id = s.id_persona
+            GROUP BY p.name, p.lastname
+            ORDER BY pendientes DESC, completados DESC
+        """
+        with self.conn.cursor() as cursor:
+            cursor.execute(query)
+            result = cursor.fetchall()
+        return {
+            'personas_mas': [{'persona': row[0], 'pendientes': row[1], 'completados': row[2]} for row in result[:10]],
+            'percentage_completados_por_persona': [
+                {'persona': row[0], 'porcentaje_completados': row[3] or 0} for row in result
+            ],
+        }
@@ -1,56 +1,75 @@
-from database import get_db_connection
+from repositories.base_repository import BaseRepository, read_only
+from repositories.busqueda import condicion_persona, fijar_umbral_persona, patron_persona, texto_persona
+from repositories.filtro_fechas import anios_de, condicion_fechas
 
-class ReportesRepository:
+class ReportesRepository(BaseRepository):
+    # Departments of %(ids)s reachable from a listed root through listed departments only,
+    # with their path from that root (departamento_jerarquia closure table)
+    _ROOTED_PATHS = """
+                SELECT d.id, d.name, d.id_departamento_padre, j.ruta as path
+                FROM departamento_jerarquia j
+                JOIN departamento raiz ON raiz.id = j.id_ancestro
+                JOIN departamento d ON d.id = j.id_descendiente
+                WHERE raiz.id_departamento_padre IS NULL
+                  AND j.id_ancestro = ANY(%(ids)s)
+                  AND j.id_descendiente = ANY(%(ids)s)
+                  AND NOT EXISTS (
+                      SELECT 1 FROM departamento_jerarquia k
+                      WHERE k.id_descendiente = j.id_descendiente
+                        AND k.profundidad < j.profundidad
+                        AND k.id_ancestro <> ALL(%(ids)s)
+                  )"""
+
+    @read_only
     def get_total_compromisos(self):
-        conn = get_db_connection()
         query = "SELECT COUNT(*) FROM compromiso"
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query)
             return cursor.fetchone()[0]
 
+    @read_only
     def get_pendientes(self):
-        conn = get_db_connection()
         query = "SELECT COUNT(*) FROM compromiso WHERE estado = 'Pendiente'"
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query)
             return cursor.fetchone()[0]
 
+    @read_only
     def get_completados(self):
-        conn = get_db_connection()
         query = "SELECT COUNT(*) FROM compromiso WHERE estado = 'Completado'"
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query)
             return cursor.fetchone()[0]
 
+    @read_only
     def get_funcionarios(self):
-        conn = get_db_connection()
         query = "SELECT COUNT(*) FROM persona"
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query)
             return cursor.fetchone()[0]
 
+    @read_only
     def get_departamentos(self):
-        conn = get_db_connection()
         query = "SELECT COUNT(*) FROM departamento"
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query)
             return cursor.fetchone()[0]
 
+    @read_only
     def get_compromisos_por_departamento(self):
-        conn = get_db_connection()
         query = """
             SELECT d.name as nombre, COUNT(c.id) as total
             FROM compromiso c
             JOIN departamento d ON c.id_departamento = d.id
             GROUP BY d.name
         """
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query)
             result = cursor.fetchall()
             return [{'nombre': row[0], 'total': row[1]} for row in result]
 
+    @read_only
     def get_personas_mas(self, search_name=None):
-        conn = get_db_connection()
         query = """
             SELECT p.name || ' ' || p.lastname as persona, 
                    SUM(CASE WHEN c.estado = 'Pendiente' THEN 1 ELSE 0 END) as pendientes,
@@ -60,69 +79,75 @@ class ReportesRepository:
             JOIN compromiso c ON pc.id_compromiso = c.id
         """
         params = []
-        if search_name:
-            query += " WHERE (p.name || ' ' || p.lastname) ILIKE %s"
-            params.append(f'%{search_name}%')
+        search = texto_persona(search_name)
+        if search:
+            # Fuzzy match on persona.full_name (trigram index)
+            query += " WHERE " + condicion_persona()
+            params.extend([patron_persona(search), search])
         query += """
             GROUP BY p.name, p.lastname
             ORDER BY pendientes DESC, completados DESC
             LIMIT 10
         """
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
+            if search:
+                fijar_umbral_persona(cursor)
             cursor.execute(query, tuple(params))
             result = cursor.fetchall()
             return [{'persona': row[0], 'pendientes': row[1], 'completados': row[2]} for row in result]
 
+    # Per-day series read the write-maintained daily rollups (compromiso_diario,
+    # reunion_diaria) instead of grouping the base tables by day on every request.
+    # Rows without fecha_creacion are kept under dia = '-infinity' and come out as None.
+    _DAY = "to_char(NULLIF(s.dia, '-infinity'), 'YYYY-MM-DD')"
+
+    def _day_conditions(self, table, day=None, month=None, year=None, column='dia', alias='s'):
+        """Day/month/year selection on table.column as index range conditions (see filtro_fechas)."""
+        condition, params = condicion_fechas(f"{alias}.{column}", day, month, year,
+                                             lambda: anios_de(self.conn, table, column))
+        return ([condition] if condition else []), params
+
+    @read_only
     def get_compromisos_por_dia(self, day=None, month=None, year=None):
-        conn = get_db_connection()
-        query = """
-            SELECT to_char(c.fecha_creacion, 'YYYY-MM-DD') as dia, COUNT(*) as total
-            FROM compromiso c
+        conditions, params = self._day_conditions('compromiso_diario', day, month, year)
+        query = f"""
+            SELECT {self._DAY} as dia, SUM(s.total) as total
+            FROM compromiso_diario s
+            {"WHERE " + " AND ".join(conditions) if conditions else ""}
+            GROUP BY s.dia
+            HAVING SUM(s.total) > 0
+            ORDER BY 1
         """
-        conditions = []
-        params = []
-        if day:
-            conditions.append("EXTRACT(DAY FROM c.fecha_creacion) = %s")
-            params.append(day)
-        if month:
-            conditions.append("EXTRACT(MONTH FROM c.fecha_creacion) = %s")
-            params.append(month)
-        if year:
-            conditions.append("EXTRACT(YEAR FROM c.fecha_creacion) = %s")
-            params.append(year)
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-        query += " GROUP BY to_char(c.fecha_creacion, 'YYYY-MM-DD') ORDER BY dia"
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query, tuple(params))
             result = cursor.fetchall()
             return [{'dia': row[0], 'total': row[1]} for row in result]
     
+    @read_only
     def get_compromisos_por_dia_por_departamento(self):
-        conn = get_db_connection()
-        query = """
-            SELECT to_char(c.fecha_creacion, 'YYYY-MM-DD') as dia, d.name as departamento, COUNT(*) as total
-            FROM compromiso c
-            JOIN departamento d ON c.id_departamento = d.id
-            GROUP BY to_char(c.fecha_creacion, 'YYYY-MM-DD'), d.name
-            ORDER BY dia
+        query = f"""
+            SELECT {self._DAY} as dia, d.name as departamento, SUM(s.total) as total
+            FROM compromiso_diario s
+            JOIN departamento d ON s.id_departamento = d.id
+            GROUP BY s.dia, d.name
+            HAVING SUM(s.total) > 0
+            ORDER BY 1, 2
         """
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query)
             result = cursor.fetchall()
             return [{'dia': row[0], 'departamento': row[1], 'total': row[2]} for row in result]
     
+    @read_only
     def get_compromisos_por_jerarquia_departamento(self):
-        conn = get_db_connection()
         query = """
-            WITH RECURSIVE dept_hierarchy AS (
-                SELECT id, name, id_departamento_padre
-                FROM departamento
-                WHERE id_departamento_padre IS NULL
-                UNION ALL
+            WITH dept_hierarchy AS (
+                -- Departments reachable from a root (departamento_jerarquia closure table)
                 SELECT d.id, d.name, d.id_departamento_padre
-                FROM departamento d
-                INNER JOIN dept_hierarchy dh ON dh.id = d.id_departamento_padre
+                FROM departamento raiz
+                JOIN departamento_jerarquia j ON j.id_ancestro = raiz.id
+                JOIN departamento d ON d.id = j.id_descendiente
+                WHERE raiz.id_departamento_padre IS NULL
             )
             SELECT dh.id, dh.name as departamento, dh.id_departamento_padre,
                    COUNT(c.id) as total,
@@ -132,34 +157,34 @@ class ReportesRepository:
             GROUP BY dh.id, dh.name, dh.id_departamento_padre
             ORDER BY dh.name
         """
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query)
             result = cursor.fetchall()
             return [{'id': row[0], 'departamento': row[1], 'id_departamento_padre': row[2], 'total': row[3], 'porcentaje_completados': row[4] or 0} for row in result]
 
+    @read_only
     def get_total_reuniones(self):
-        conn = get_db_connection()
         query = "SELECT COUNT(*) FROM reunion"
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query)
             return cursor.fetchone()[0]
 
+    @read_only
     def get_archived_compromisos(self):
-        conn = get_db_connection()
         query = "SELECT COUNT(*) FROM compromisos_archivados"
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query)
             return cursor.fetchone()[0]
 
+    @read_only
     def get_deleted_compromisos(self):
-        conn = get_db_connection()
         query = "SELECT COUNT(*) FROM compromiso_eliminado"
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query)
             return cursor.fetchone()[0]
 
+    @read_only
     def get_avg_compromisos_por_reunion(self):
-        conn = get_db_connection()
         query = """
             SELECT AVG(compromisos_por_reunion) 
             FROM (
@@ -169,34 +194,34 @@ class ReportesRepository:
                 GROUP BY r.id
             ) subquery
         """
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query)
             return cursor.fetchone()[0]
 
+    @read_only
     def get_percentage_completados(self):
-        conn = get_db_connection()
         query = """
             SELECT 
                 (SELECT COUNT(*) FROM compromiso WHERE estado = 'Completado') * 100.0 / 
                 (SELECT COUNT(*) FROM compromiso) AS porcentaje_completados
         """
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query)
             return cursor.fetchone()[0]
 
+    @read_only
     def get_percentage_pendientes(self):
-        conn = get_db_connection()
         query = """
             SELECT 
                 (SELECT COUNT(*) FROM compromiso WHERE estado = 'Pendiente') * 100.0 / 
                 (SELECT COUNT(*) FROM compromiso) AS porcentaje_pendientes
         """
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query)
             return cursor.fetchone()[0]
 
+    @read_only
     def get_percentage_completados_por_persona(self):
-        conn = get_db_connection()
         query = """
             SELECT p.name || ' ' || p.lastname as persona, 
                    (SUM(CASE WHEN c.estado = 'Completado' THEN 1 ELSE 0 END) * 100.0 / NULLIF(COUNT(c.id), 0)) as porcentaje_completados
@@ -205,13 +230,13 @@ class ReportesRepository:
             JOIN compromiso c ON pc.id_compromiso = c.id
             GROUP BY p.name, p.lastname
         """
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query)
             result = cursor.fetchall()
             return [{'persona': row[0], 'porcentaje_completados': row[1] or 0} for row in result]
 
+    @read_only
     def get_percentage_completados_por_departamento(self):
-        conn = get_db_connection()
         query = """
             SELECT d.name as departamento, 
                    (SUM(CASE WHEN c.estado = 'Completado' THEN 1 ELSE 0 END) * 100.0 / NULLIF(COUNT(c.id), 0)) as porcentaje_completados
@@ -219,147 +244,145 @@ class ReportesRepository:
             JOIN departamento d ON c.id_departamento = d.id
             GROUP BY d.name
         """
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query)
             result = cursor.fetchall()
             return [{'departamento': row[0], 'porcentaje_completados': row[1] or 0} for row in result]
     
+    @read_only
     def get_reuniones_por_dia(self, day=None, month=None, year=None):
-        conn = get_db_connection()
-        query = "SELECT to_char(fecha_creacion, 'YYYY-MM-DD') as dia, COUNT(*) as total FROM reunion"
-        conditions = []
-        params = []
-        if day:
-            conditions.append("EXTRACT(DAY FROM fecha_creacion) = %s")
-            params.append(day)
-        if month:
-            conditions.append("EXTRACT(MONTH FROM fecha_creacion) = %s")
-            params.append(month)
-        if year:
-            conditions.append("EXTRACT(YEAR FROM fecha_creacion) = %s")
-            params.append(year)
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-        query += " GROUP BY to_char(fecha_creacion, 'YYYY-MM-DD') ORDER BY dia"
-        with conn.cursor() as cursor:
+        conditions, params = self._day_conditions('reunion_diaria', day, month, year)
+        query = f"""
+            SELECT {self._DAY} as dia, s.total
+            FROM reunion_diaria s
+            WHERE s.total > 0 {"AND " + " AND ".join(conditions) if conditions else ""}
+            ORDER BY 1
+        """
+        with self.conn.cursor() as cursor:
             cursor.execute(query, tuple(params))
             result = cursor.fetchall()
             # Devolver la fecha sin conversión ISO para que JS la formatee según corresponda
             return [{'dia': row[0], 'total': row[1]} for row in result]
 
+    @read_only
+    def get_user_department_ids(self, user_id):
+        """Departments the user belongs to (the hierarchy below them is resolved in memory)."""
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT id_departamento FROM persona_departamento WHERE id_persona = %s", (user_id,))
+            return [row[0] for row in cursor.fetchall()]
+
+    @read_only
     def get_user_department_hierarchy(self, user_id):
         """Get the department hierarchy for a user including their own department and all subordinate departments."""
-        conn = get_db_connection()
         query = """
-            WITH RECURSIVE user_dept AS (
-                -- Get user's department
-                SELECT d.id, d.name
-                FROM departamento d
-                JOIN persona_departamento pd ON d.id = pd.id_departamento
-                WHERE pd.id_persona = %s
-            ), dept_hierarchy AS (
-                -- Start with user's department
-                SELECT d.id, d.name
-                FROM departamento d
-                JOIN user_dept ud ON d.id = ud.id
-                UNION
-                -- Add all subordinate departments
-                SELECT d.id, d.name
-                FROM departamento d
-                JOIN dept_hierarchy dh ON d.id_departamento_padre = dh.id
-            )
-            SELECT * FROM dept_hierarchy
+            -- User's departments (depth 0) and all subordinate departments
+            SELECT d.id, d.name
+            FROM persona_departamento pd
+            JOIN departamento_jerarquia j ON j.id_ancestro = pd.id_departamento
+            JOIN departamento d ON d.id = j.id_descendiente
+            WHERE pd.id_persona = %s
+            GROUP BY d.id, d.name
+            ORDER BY MIN(j.profundidad), d.id
         """
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query, (user_id,))
             result = cursor.fetchall()
             return [{'id': row[0], 'name': row[1]} for row in result]
     
+    @read_only
     def get_total_compromisos_by_dept_hierarchy(self, dept_ids):
         """Get total commitments filtered by department hierarchy."""
         if not dept_ids:
             return self.get_total_compromisos()
             
-        conn = get_db_connection()
         placeholders = ', '.join(['%s'] * len(dept_ids))
         query = f"SELECT COUNT(*) FROM compromiso WHERE id_departamento IN ({placeholders})"
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query, tuple(dept_ids))
             return cursor.fetchone()[0]
     
+    @read_only
     def get_pendientes_by_dept_hierarchy(self, dept_ids):
         """Get pending commitments filtered by department hierarchy."""
         if not dept_ids:
             return self.get_pendientes()
             
-        conn = get_db_connection()
         placeholders = ', '.join(['%s'] * len(dept_ids))
         query = f"SELECT COUNT(*) FROM compromiso WHERE estado = 'Pendiente' AND id_departamento IN ({placeholders})"
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query, tuple(dept_ids))
             return cursor.fetchone()[0]
     
+    @read_only
     def get_completados_by_dept_hierarchy(self, dept_ids):
         """Get completed commitments filtered by department hierarchy."""
         if not dept_ids:
             return self.get_completados()
             
-        conn = get_db_connection()
         placeholders = ', '.join(['%s'] * len(dept_ids))
         query = f"SELECT COUNT(*) FROM compromiso WHERE estado = 'Completado' AND id_departamento IN ({placeholders})"
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query, tuple(dept_ids))
             return cursor.fetchone()[0]
     
+    @read_only
     def get_compromisos_por_departamento_filtered(self, dept_ids):
         """Get commitments by department filtered by department hierarchy with order."""
-        conn = get_db_connection()
-        placeholders = ', '.join(['%s'] * len(dept_ids))
         query = f"""
-            WITH RECURSIVE dept_hierarchy AS (
-                SELECT 
-                    d.id, 
-                    d.name, 
-                    d.id_departamento_padre,
-                    CAST(d.name as VARCHAR) as path
-                FROM departamento d
-                WHERE d.id_departamento_padre IS NULL AND d.id IN ({placeholders})
-                
-                UNION ALL
-                
-                SELECT 
-                    d.id, 
-                    d.name, 
-                    d.id_departamento_padre,
-                    dh.path || ' > ' || d.name
-                FROM departamento d
-                JOIN dept_hierarchy dh ON d.id_departamento_padre = dh.id
-                WHERE d.id IN ({placeholders})
+            WITH dept_hierarchy AS (
+                {self._ROOTED_PATHS}
+            ),
+            counts AS (
+                SELECT c.id_departamento, COUNT(*) as total,
+                       COUNT(*) FILTER (WHERE c.estado = 'Completado') as completados
+                FROM compromiso c
+                WHERE c.id_departamento = ANY(%(ids)s)
+                GROUP BY c.id_departamento
             )
             SELECT 
                 d.id,
                 d.name as nombre, 
-                COUNT(c.id) as total,
+                COALESCE(cc.total, 0) as total,
                 d.path as hierarchy_path,
-                (SUM(CASE WHEN c.estado = 'Completado' THEN 1 ELSE 0 END) * 100.0 / NULLIF(COUNT(c.id), 0)) as porcentaje_completados
+                (cc.completados * 100.0 / NULLIF(cc.total, 0)) as porcentaje_completados
             FROM dept_hierarchy d
-            LEFT JOIN compromiso c ON d.id = c.id_departamento
-            GROUP BY d.id, d.name, d.path
+            LEFT JOIN counts cc ON d.id = cc.id_departamento
             ORDER BY d.path
         """
-        with conn.cursor() as cursor:
-            cursor.execute(query, tuple(dept_ids) + tuple(dept_ids))
+        with self.conn.cursor() as cursor:
+            cursor.execute(query, {'ids': list(dept_ids)})
             result = cursor.fetchall()
             return [{'id': row[0], 'nombre': row[1], 'total': row[2], 'path': row[3], 'porcentaje_completados': row[4] or 0} for row in result]
     
-    def get_personas_mas_by_dept_hierarchy(self, dept_ids, search_name=None):
-        """Get people with most commitments filtered by department hierarchy."""
-        conn = get_db_connection()
+    @read_only
+    def get_personas_mas_by_dept_hierarchy(self, dept_ids, search_name=None, from_snapshot=False):
+        """
+        Get people with most commitments filtered by department hierarchy.
+        from_snapshot reads the per-person counts from reporte_snapshot_persona.
+        """
         placeholders = ', '.join(['%s'] * len(dept_ids))
+        if from_snapshot:
+            counts = f"""
+                SELECT s.id_persona, SUM(s.pendientes) as pendientes, SUM(s.completados) as completados
+                FROM reporte_snapshot_persona s
+                WHERE s.id_departamento IN ({placeholders})
+                GROUP BY s.id_persona
+            """
+        else:
+            counts = f"""
+                SELECT 
+                    pc.id_persona,
+                    SUM(CASE WHEN c.estado = 'Pendiente' THEN 1 ELSE 0 END) as pendientes,
+                    SUM(CASE WHEN c.estado = 'Completado' THEN 1 ELSE 0 END) as completados
+                FROM persona_compromiso pc
+                JOIN compromiso c ON pc.id_compromiso = c.id
+                WHERE c.id_departamento IN ({placeholders})
+                GROUP BY pc.id_persona
+            """
         query = f"""
             WITH personas_departamentos AS (
                 -- Get all people in these departments
-                SELECT DISTINCT p.id, p.name, p.lastname, d.id as dept_id, d.name as dept_name, d.id_departamento_padre
+                SELECT DISTINCT p.id, p.name, p.lastname, p.full_name, d.id as dept_id, d.name as dept_name, d.id_departamento_padre
                 FROM persona p
                 JOIN persona_departamento pd ON p.id = pd.id_persona
                 JOIN departamento d ON pd.id_departamento = d.id
@@ -368,33 +391,16 @@ class ReportesRepository:
             dept_paths AS (
                 -- Get department paths for better display
                 SELECT 
-                    d.id,
-                    (
-                        WITH RECURSIVE dept_path AS (
-                            SELECT d2.id, d2.name, d2.id_departamento_padre
-                            FROM departamento d2
-                            WHERE d2.id = d.id
-                            UNION ALL
-                            SELECT d3.id, d3.name, d3.id_departamento_padre
-                            FROM departamento d3
-                            JOIN dept_path dp ON d3.id = dp.id_departamento_padre
-                        )
-                        SELECT string_agg(name, ' > ' ORDER BY id DESC)
-                        FROM dept_path
-                    ) as path
-                FROM departamento d
-                WHERE d.id IN ({placeholders})
+                    j.id_descendiente as id,
+                    string_agg(a.name, ' > ' ORDER BY a.id DESC) as path
+                FROM departamento_jerarquia j
+                JOIN departamento a ON a.id = j.id_ancestro
+                WHERE j.id_descendiente IN ({placeholders})
+                GROUP BY j.id_descendiente
             ),
             compromiso_counts AS (
                 -- Count commitments per person
-                SELECT 
-                    pc.id_persona,
-                    SUM(CASE WHEN c.estado = 'Pendiente' THEN 1 ELSE 0 END) as pendientes,
-                    SUM(CASE WHEN c.estado = 'Completado' THEN 1 ELSE 0 END) as completados
-                FROM persona_compromiso pc
-                JOIN compromiso c ON pc.id_compromiso = c.id
-                WHERE c.id_departamento IN ({placeholders})
-                GROUP BY pc.id_persona
+                {counts}
             )
             SELECT 
                 pd.id,
@@ -413,9 +419,10 @@ class ReportesRepository:
         conditions = []
         params = list(dept_ids) + list(dept_ids) + list(dept_ids)
         
-        if search_name:
-            conditions.append("(pd.name || ' ' || pd.lastname) ILIKE %s")
-            params.append(f'%{search_name}%')
+        search = texto_persona(search_name)
+        if search:
+            conditions.append(condicion_persona('pd'))
+            params.extend([patron_persona(search), search])
         
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
@@ -428,7 +435,9 @@ class ReportesRepository:
             LIMIT 100
         """
         
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
+            if search:
+                fijar_umbral_persona(cursor)
             cursor.execute(query, tuple(params))
             result = cursor.fetchall()
             return [{'id': row[0], 'persona': row[1], 'pendientes': row[2], 'completados': row[3], 
@@ -436,83 +445,132 @@ class ReportesRepository:
                     'id_departamento_padre': row[6], 'dept_path': row[7]} 
                     for row in result]
     
+    @read_only
+    def get_workload(self, dept_ids=None, search_name=None, after=None, limit=50):
+        """
+        Per-person workload, one row per persona id: open (not completed), overdue (open
+        and past fecha_limite) and completed compromisos from one aggregation over
+        persona_compromiso. With dept_ids only the people of those departments are listed,
+        with all their assignments. Rows are ordered by open DESC, overdue DESC, id; after
+        is the (open, overdue, id) of the last row already returned (keyset pagination).
+        """
+        params = {'ids': list(dept_ids) if dept_ids else None, 'limit': limit}
+        people = ""
+        in_scope = ""
+        if dept_ids:
+            people = """
+                WHERE pc.id_persona IN (
+                    SELECT pd.id_persona FROM persona_departamento pd WHERE pd.id_departamento = ANY(%(ids)s)
+                )"""
+            in_scope = " AND pd.id_departamento = ANY(%(ids)s)"
+        conditions = []
+        if dept_ids:
+            conditions.append("""EXISTS (
+                SELECT 1 FROM persona_departamento pd WHERE pd.id_persona = p.id AND pd.id_departamento = ANY(%(ids)s)
+            )""")
+        search = texto_persona(search_name)
+        if search:
+            conditions.append(condicion_persona('p', '%(pattern)s', '%(search)s'))
+            params.update({'pattern': patron_persona(search), 'search': search})
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        keyset = ""
+        if after:
+            # ORDER BY open DESC, overdue DESC, id as one ascending row comparison
+            keyset = " WHERE (-abiertos, -vencidos, id) > (%(open)s, %(overdue)s, %(id)s)"
+            params.update({'open': -after[0], 'overdue': -after[1], 'id': after[2]})
+        query = f"""
+            WITH carga AS (
+                SELECT pc.id_persona,
+                       COUNT(*) FILTER (WHERE c.estado IS DISTINCT FROM 'Completado') as abiertos,
+                       COUNT(*) FILTER (WHERE c.estado IS DISTINCT FROM 'Completado'
+                                          AND c.fecha_limite < CURRENT_DATE) as vencidos,
+                       COUNT(*) FILTER (WHERE c.estado = 'Completado') as completados
+                FROM persona_compromiso pc
+                JOIN compromiso c ON c.id = pc.id_compromiso{people}
+                GROUP BY pc.id_persona
+            ),
+            personas AS (
+                SELECT p.id, p.name || ' ' || p.lastname as persona,
+                       (SELECT MIN(pd.id_departamento) FROM persona_departamento pd
+                        WHERE pd.id_persona = p.id{in_scope}) as id_departamento,
+                       COALESCE(k.abiertos, 0) as abiertos,
+                       COALESCE(k.vencidos, 0) as vencidos,
+                       COALESCE(k.completados, 0) as completados
+                FROM persona p
+                LEFT JOIN carga k ON k.id_persona = p.id{where}
+            )
+            SELECT id, persona, id_departamento, abiertos, vencidos, completados
+            FROM personas{keyset}
+            ORDER BY abiertos DESC, vencidos DESC, id
+            LIMIT %(limit)s
+        """
+        with self.conn.cursor() as cursor:
+            if search:
+                fijar_umbral_persona(cursor)
+            cursor.execute(query, params)
+            result = cursor.fetchall()
+        return [{'id': row[0], 'persona': row[1], 'id_departamento': row[2], 'abiertos': row[3],
+                 'vencidos': row[4], 'completados': row[5]} for row in result]
+
+    @read_only
     def get_compromisos_por_dia_by_dept_hierarchy(self, dept_ids, day=None, month=None, year=None):
         """Get commitments by day filtered by department hierarchy."""
-        conn = get_db_connection()
-        query = """
-            SELECT to_char(c.fecha_creacion, 'YYYY-MM-DD') as dia, COUNT(*) as total
-            FROM compromiso c
-            WHERE c.id_departamento IN ({})
-        """
-        conditions = ["c.id_departamento IN ({})"]
-        params = list(dept_ids)
-        if day:
-            conditions.append("EXTRACT(DAY FROM c.fecha_creacion) = %s")
-            params.append(day)
-        if month:
-            conditions.append("EXTRACT(MONTH FROM c.fecha_creacion) = %s")
-            params.append(month)
-        if year:
-            conditions.append("EXTRACT(YEAR FROM c.fecha_creacion) = %s")
-            params.append(year)
-            
-        query = """
-            SELECT to_char(c.fecha_creacion, 'YYYY-MM-DD') as dia, COUNT(*) as total
-            FROM compromiso c
-            WHERE """ + " AND ".join(conditions).format(', '.join(['%s'] * len(dept_ids))) + """
-            GROUP BY to_char(c.fecha_creacion, 'YYYY-MM-DD') 
-            ORDER BY dia
+        conditions, params = self._day_conditions('compromiso_diario', day, month, year)
+        query = f"""
+            SELECT {self._DAY} as dia, SUM(s.total) as total
+            FROM compromiso_diario s
+            WHERE {" AND ".join(["s.id_departamento = ANY(%s)"] + conditions)}
+            GROUP BY s.dia
+            HAVING SUM(s.total) > 0
+            ORDER BY 1
         """
-        with conn.cursor() as cursor:
-            cursor.execute(query, tuple(params))
+        with self.conn.cursor() as cursor:
+            cursor.execute(query, (list(dept_ids), *params))
             result = cursor.fetchall()
             return [{'dia': row[0], 'total': row[1]} for row in result]
     
+    @read_only
     def get_compromisos_por_dia_por_departamento_filtered(self, dept_ids):
         """Get commitments by day and department filtered by department hierarchy."""
-        conn = get_db_connection()
-        placeholders = ', '.join(['%s'] * len(dept_ids))
         query = f"""
-            SELECT to_char(c.fecha_creacion, 'YYYY-MM-DD') as dia, d.name as departamento, COUNT(*) as total
-            FROM compromiso c
-            JOIN departamento d ON c.id_departamento = d.id
-            WHERE c.id_departamento IN ({placeholders})
-            GROUP BY to_char(c.fecha_creacion, 'YYYY-MM-DD'), d.name
-            ORDER BY dia
+            SELECT {self._DAY} as dia, d.name as departamento, SUM(s.total) as total
+            FROM compromiso_diario s
+            JOIN departamento d ON s.id_departamento = d.id
+            WHERE s.id_departamento = ANY(%s)
+            GROUP BY s.dia, d.name
+            HAVING SUM(s.total) > 0
+            ORDER BY 1, 2
         """
-        with conn.cursor() as cursor:
-            cursor.execute(query, tuple(dept_ids))
+        with self.conn.cursor() as cursor:
+            cursor.execute(query, (list(dept_ids),))
             result = cursor.fetchall()
             return [{'dia': row[0], 'departamento': row[1], 'total': row[2]} for row in result]
     
+    @read_only
     def get_compromisos_por_jerarquia_departamento_filtered(self, dept_ids):
         """Get commitments by department hierarchy filtered by department hierarchy."""
-        conn = get_db_connection()
         placeholders = ', '.join(['%s'] * len(dept_ids))
         query = f"""
-            WITH RECURSIVE dept_hierarchy AS (
-                -- Find all departments that are either in our list or have parents in our list
-                SELECT 
-                    d.id, 
-                    d.name, 
-                    d.id_departamento_padre,
-                    ARRAY[d.id] as path_ids,
-                    CAST(d.name as VARCHAR) as path,
-                    0 as level
-                FROM departamento d
-                WHERE d.id IN ({placeholders})
-                
-                UNION ALL
-                
+            WITH dept_hierarchy AS (
+                -- Every department in our list and everything below it, once per listed ancestor
                 SELECT 
                     d.id, 
                     d.name, 
                     d.id_departamento_padre,
-                    dh.path_ids || d.id,
-                    dh.path || ' > ' || d.name,
-                    dh.level + 1
-                FROM departamento d
-                JOIN dept_hierarchy dh ON d.id_departamento_padre = dh.id
+                    j.id_ancestro,
+                    j.ruta as path,
+                    j.profundidad as level
+                FROM departamento_jerarquia j
+                JOIN departamento d ON d.id = j.id_descendiente
+                WHERE j.id_ancestro IN ({placeholders})
+            ),
+            counts AS (
+                -- Counted once per department, then repeated for each listed ancestor
+                SELECT c.id_departamento, COUNT(*) as total,
+                       COUNT(*) FILTER (WHERE c.estado = 'Completado') as completados
+                FROM compromiso c
+                WHERE c.id_departamento IN (SELECT id FROM dept_hierarchy)
+                GROUP BY c.id_departamento
             )
             SELECT 
                 dh.id, 
@@ -520,23 +578,27 @@ class ReportesRepository:
                 dh.id_departamento_padre,
                 dh.path,
                 dh.level,
-                COUNT(c.id) as total,
-                (SUM(CASE WHEN c.estado = 'Completado' THEN 1 ELSE 0 END) * 100.0 / NULLIF(COUNT(c.id), 0)) as porcentaje_completados
+                COALESCE(cc.total, 0) as total,
+                (cc.completados * 100.0 / NULLIF(cc.total, 0)) as porcentaje_completados
             FROM dept_hierarchy dh
-            LEFT JOIN compromiso c ON dh.id = c.id_departamento
-            GROUP BY dh.id, dh.name, dh.id_departamento_padre, dh.path, dh.path_ids, dh.level
+            LEFT JOIN counts cc ON dh.id = cc.id_departamento
             ORDER BY dh.path, dh.level
         """
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query, tuple(dept_ids))
             result = cursor.fetchall()
             return [{'id': row[0], 'departamento': row[1], 'id_departamento_padre': row[2], 
                     'path': row[3], 'level': row[4], 'total': row[5], 'porcentaje_completados': row[6] or 0} 
                     for row in result]
 
+    @read_only
     def get_reuniones_por_dia_filtered_by_dept(self, dept_ids, day=None, month=None, year=None):
-        """Get meetings by day filtered by departments that participated."""
-        conn = get_db_connection()
+        """
+        Get meetings by day filtered by departments that participated.
+
+        Stays on the base tables: a meeting with compromisos of several departments
+        counts once, which per-department daily totals cannot express.
+        """
         placeholders = ', '.join(['%s'] * len(dept_ids))
         
         query = f"""
@@ -548,29 +610,24 @@ class ReportesRepository:
         """
         params = list(dept_ids)
         
-        if day:
-            query += " AND EXTRACT(DAY FROM r.fecha_creacion) = %s"
-            params.append(day)
-        if month:
-            query += " AND EXTRACT(MONTH FROM r.fecha_creacion) = %s"
-            params.append(month)
-        if year:
-            query += " AND EXTRACT(YEAR FROM r.fecha_creacion) = %s"
-            params.append(year)
+        conditions, date_params = self._day_conditions('reunion', day, month, year, 'fecha_creacion', 'r')
+        for condition in conditions:
+            query += " AND " + condition
+        params.extend(date_params)
             
         query += " GROUP BY to_char(r.fecha_creacion, 'YYYY-MM-DD') ORDER BY dia"
         
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query, tuple(params))
             result = cursor.fetchall()
             return [{'dia': row[0], 'total': row[1]} for row in result]
 
+    @read_only
     def get_funcionarios_by_dept_hierarchy(self, dept_ids):
         """Get the number of employees within the specified department hierarchy."""
         if not dept_ids:
             return self.get_funcionarios()
             
-        conn = get_db_connection()
         placeholders = ', '.join(['%s'] * len(dept_ids))
         query = f"""
             SELECT COUNT(DISTINCT p.id)
@@ -578,6 +635,155 @@ class ReportesRepository:
             JOIN persona_departamento pd ON p.id = pd.id_persona
             WHERE pd.id_departamento IN ({placeholders})
         """
-        with conn.cursor() as cursor:
+        with self.conn.cursor() as cursor:
             cursor.execute(query, tuple(dept_ids))
             return cursor.fetchone()[0]
+
+    # --- Consolidated report engine -------------------------------------------------
+    # The methods below feed /api/report_data with a handful of statements instead of
+    # one query per key. The service maps their output onto the same JSON keys.
+
+    @read_only
+    def get_compromiso_aggregates(self, dept_ids=None):
+        """
+        All per-department compromiso aggregates of the report in a single pass over
+        compromiso (the per-day series come from get_daily_series).
+
+        With dept_ids, totals only count compromisos of those departments (the
+        filtered report); per-department figures always cover every compromiso, as
+        the individual queries did.
+        """
+        scope = "c.id_departamento = ANY(%s)" if dept_ids else "TRUE"
+        query = f"""
+            WITH base AS (
+                SELECT c.id_departamento, d.name AS departamento,
+                       c.estado, {scope} AS en_alcance
+                FROM compromiso c
+                LEFT JOIN departamento d ON c.id_departamento = d.id
+            )
+            SELECT GROUPING(id_departamento, departamento) AS grupo,
+                   id_departamento, departamento,
+                   COUNT(*) AS total,
+                   COUNT(*) FILTER (WHERE en_alcance) AS total_alcance,
+                   COUNT(*) FILTER (WHERE en_alcance AND estado = 'Pendiente') AS pendientes_alcance,
+                   COUNT(*) FILTER (WHERE en_alcance AND estado = 'Completado') AS completados_alcance,
+                   COUNT(*) FILTER (WHERE estado = 'Completado') * 100.0 / NULLIF(COUNT(*), 0) AS porcentaje_completados,
+                   COUNT(*) FILTER (WHERE en_alcance AND estado = 'Completado') * 100.0
+                       / NULLIF(COUNT(*) FILTER (WHERE en_alcance), 0) AS porcentaje_completados_alcance,
+                   COUNT(*) FILTER (WHERE en_alcance AND estado = 'Pendiente') * 100.0
+                       / NULLIF(COUNT(*) FILTER (WHERE en_alcance), 0) AS porcentaje_pendientes_alcance
+            FROM base
+            GROUP BY GROUPING SETS ((), (id_departamento), (departamento))
+        """
+        # GROUPING() bitmask over (id_departamento, departamento): 1 = not grouped
+        ALL, BY_ID, BY_NAME = 0b11, 0b01, 0b10
+        data = {
+            'compromisos_por_departamento': [],
+            'percentage_completados_por_departamento': [],
+            'by_department_id': {},
+        }
+        with self.conn.cursor() as cursor:
+            cursor.execute(query, (list(dept_ids),) if dept_ids else ())
+            rows = cursor.fetchall()
+
+        for (grupo, dept_id, departamento, total, total_alcance, pendientes, completados,
+             porcentaje, porcentaje_completados, porcentaje_pendientes) in rows:
+            if grupo == ALL:
+                data['total_compromisos'] = total_alcance
+                data['pendientes'] = pendientes
+                data['completados'] = completados
+                data['percentage_completados'] = porcentaje_completados
+                data['percentage_pendientes'] = porcentaje_pendientes
+            elif grupo == BY_ID:
+                if dept_id is not None:
+                    data['by_department_id'][dept_id] = {'total': total, 'porcentaje_completados': porcentaje or 0}
+            elif grupo == BY_NAME:
+                if departamento is not None:
+                    data['compromisos_por_departamento'].append({'nombre': departamento, 'total': total})
+                    data['percentage_completados_por_departamento'].append(
+                        {'departamento': departamento, 'porcentaje_completados': porcentaje or 0})
+        return data
+
+    @read_only
+    def get_daily_series(self, dept_ids=None):
+        """
+        compromisos_por_dia and compromisos_por_dia_por_departamento in one statement
+        over the compromiso_diario rollup, limited to dept_ids when given.
+        """
+        scope = "s.id_departamento = ANY(%s)" if dept_ids else "TRUE"
+        query = f"""
+            SELECT GROUPING(d.name) AS por_dia, {self._DAY} AS dia, d.name, SUM(s.total) AS total
+            FROM compromiso_diario s
+            LEFT JOIN departamento d ON s.id_departamento = d.id
+            WHERE {scope}
+            GROUP BY GROUPING SETS ((s.dia), (s.dia, d.name))
+            HAVING SUM(s.total) > 0
+            ORDER BY 2, 3
+        """
+        data = {'compromisos_por_dia': [], 'compromisos_por_dia_por_departamento': []}
+        with self.conn.cursor() as cursor:
+            cursor.execute(query, (list(dept_ids),) if dept_ids else ())
+            for por_dia, dia, departamento, total in cursor.fetchall():
+                if por_dia:
+                    data['compromisos_por_dia'].append({'dia': dia, 'total': total})
+                elif departamento is not None:
+                    data['compromisos_por_dia_por_departamento'].append(
+                        {'dia': dia, 'departamento': departamento, 'total': total})
+        return data
+
+    @read_only
+    def get_persona_aggregates(self):
+        """Per-person counters behind personas_mas and percentage_completados_por_persona."""
+        query = """
+            SELECT p.name || ' ' || p.lastname as persona,
+                   COUNT(*) FILTER (WHERE c.estado = 'Pendiente') as pendientes,
+                   COUNT(*) FILTER (WHERE c.estado = 'Completado') as completados,
+                   COUNT(*) FILTER (WHERE c.estado = 'Completado') * 100.0 / NULLIF(COUNT(c.id), 0) as porcentaje_completados
+            FROM persona p
+            JOIN persona_compromiso pc ON p.id = pc.id_persona
+            JOIN compromiso c ON pc.id_compromiso = c.id
+            GROUP BY p.name, p.lastname
+            ORDER BY pendientes DESC, completados DESC
+        """
+        with self.conn.cursor() as cursor:
+            cursor.execute(query)
+            result = cursor.fetchall()
+        return {
+            'personas_mas': [{'persona': row[0], 'pendientes': row[1], 'completados': row[2]} for row in result[:10]],
+            'percentage_completados_por_persona': [
+                {'persona': row[0], 'porcentaje_completados': row[3] or 0} for row in result
+            ],
+        }
+
+    @read_only
+    def get_report_counters(self, dept_ids=None):
+        """The scalar counters of the report (outside compromiso) in one round trip."""
+        if dept_ids:
+            funcionarios = """
+                (SELECT COUNT(DISTINCT p.id)
+                 FROM persona p
+                 JOIN persona_departamento pd ON p.id = pd.id_persona
+                 WHERE pd.id_departamento = ANY(%s))
+            """
+            params = (list(dept_ids),)
+        else:
+            funcionarios = "(SELECT COUNT(*) FROM persona)"
+            params = ()
+        query = f"""
+            SELECT {funcionarios} AS funcionarios,
+                   (SELECT COUNT(*) FROM departamento) AS departamentos,
+                   (SELECT COUNT(*) FROM reunion) AS total_reuniones,
+                   (SELECT COUNT(*) FROM compromisos_archivados) AS archived_compromisos,
+                   (SELECT COUNT(*) FROM compromiso_eliminado) AS deleted_compromisos,
+                   (SELECT AVG(compromisos_por_reunion)
+                    FROM (
+                        SELECT COUNT(rc.id_compromiso) as compromisos_por_reunion
+                        FROM reunion r
+                        LEFT JOIN reunion_compromiso rc ON r.id = rc.id_reunion
+                        GROUP BY r.id
+                    ) subquery) AS avg_compromisos_por_reunion
+        """
+        with self.conn.cursor() as cursor:
+            cursor.execute(query, params)
+            row = cursor.fetchone()
+            return dict(zip([col[0] for col in cursor.description], row))
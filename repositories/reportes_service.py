@@ -1,43 +1,280 @@
+import functools
+import threading
+import time
+
+from .departamento_tree import get_arbol
+from .datos_version import TABLAS_REPORTE, DatosVersionRepository
+from .report_analytics import analytics_enabled, get_facts
+from .report_cache import cache_enabled, cache_key, report_cache
+from .report_executor import ReportQueryExecutor, consolidated_enabled
+from .reporte_snapshot_repository import ReporteSnapshotRepository
 from .reportes_repository import ReportesRepository
 
+# Sub-queries of the global report: (key, repository method)
+REPORT_QUERIES = [
+    ('total_compromisos', 'get_total_compromisos'),
+    ('pendientes', 'get_pendientes'),
+    ('completados', 'get_completados'),
+    ('funcionarios', 'get_funcionarios'),
+    ('departamentos', 'get_departamentos'),
+    ('compromisos_por_departamento', 'get_compromisos_por_departamento'),
+    ('personas_mas', 'get_personas_mas'),
+    ('compromisos_por_dia', 'get_compromisos_por_dia'),
+    ('total_reuniones', 'get_total_reuniones'),
+    ('archived_compromisos', 'get_archived_compromisos'),
+    ('deleted_compromisos', 'get_deleted_compromisos'),
+    ('avg_compromisos_por_reunion', 'get_avg_compromisos_por_reunion'),
+    ('percentage_completados', 'get_percentage_completados'),
+    ('percentage_pendientes', 'get_percentage_pendientes'),
+    ('percentage_completados_por_persona', 'get_percentage_completados_por_persona'),
+    ('percentage_completados_por_departamento', 'get_percentage_completados_por_departamento'),
+    ('compromisos_por_dia_por_departamento', 'get_compromisos_por_dia_por_departamento'),
+    ('reuniones_por_dia', 'get_reuniones_por_dia'),  # New key for meetings by day data
+    ('compromisos_por_jerarquia_departamento', 'get_compromisos_por_jerarquia_departamento'),  # New key for commitments by department hierarchy data
+]
+
+# Sub-queries of the filtered report: (key, repository method, filtered by dept_ids)
+FILTERED_REPORT_QUERIES = [
+    ('total_compromisos', 'get_total_compromisos_by_dept_hierarchy', True),
+    ('pendientes', 'get_pendientes_by_dept_hierarchy', True),
+    ('completados', 'get_completados_by_dept_hierarchy', True),
+    ('funcionarios', 'get_funcionarios_by_dept_hierarchy', True),  # Now filtered by department hierarchy
+    ('compromisos_por_departamento', 'get_compromisos_por_departamento_filtered', True),
+    ('personas_mas', 'get_personas_mas_by_dept_hierarchy', True),
+    ('compromisos_por_dia', 'get_compromisos_por_dia_by_dept_hierarchy', True),
+    ('total_reuniones', 'get_total_reuniones', False),  # Could be filtered but difficult to associate meetings with departments
+    ('archived_compromisos', 'get_archived_compromisos', False),  # Could be filtered but not necessary
+    ('deleted_compromisos', 'get_deleted_compromisos', False),  # Could be filtered but not necessary
+    ('avg_compromisos_por_reunion', 'get_avg_compromisos_por_reunion', False),  # Could be filtered but not necessary
+    ('percentage_completados_por_persona', 'get_percentage_completados_por_persona', False),  # Could be filtered but not necessary
+    ('percentage_completados_por_departamento', 'get_percentage_completados_por_departamento', False),  # Could be filtered but not necessary
+    ('compromisos_por_dia_por_departamento', 'get_compromisos_por_dia_por_departamento_filtered', True),
+    ('reuniones_por_dia', 'get_reuniones_por_dia_filtered_by_dept', True),
+    ('compromisos_por_jerarquia_departamento', 'get_compromisos_por_jerarquia_departamento_filtered', True),
+]
+
+# Exportable datasets of the report: (key, column header) in file order. A column
+# missing from the rows (unfiltered vs filtered shapes) is left out of the file.
+REPORT_EXPORTS = {
+    'indicadores': [('indicador', 'Indicador'), ('valor', 'Valor')],
+    'compromisos_por_departamento': [('nombre', 'Departamento'), ('path', 'Ruta'), ('total', 'Total'),
+                                     ('porcentaje_completados', '% Completados')],
+    'compromisos_por_jerarquia_departamento': [('departamento', 'Departamento'), ('path', 'Ruta'), ('level', 'Nivel'),
+                                               ('total', 'Total'), ('porcentaje_completados', '% Completados')],
+    'personas_mas': [('persona', 'Persona'), ('nombre_departamento', 'Departamento'), ('dept_path', 'Ruta'),
+                     ('pendientes', 'Pendientes'), ('completados', 'Completados')],
+    'percentage_completados_por_persona': [('persona', 'Persona'), ('porcentaje_completados', '% Completados')],
+    'percentage_completados_por_departamento': [('departamento', 'Departamento'),
+                                                ('porcentaje_completados', '% Completados')],
+    'compromisos_por_dia': [('dia', 'Día'), ('total', 'Total')],
+    'compromisos_por_dia_por_departamento': [('dia', 'Día'), ('departamento', 'Departamento'), ('total', 'Total')],
+    'reuniones_por_dia': [('dia', 'Día'), ('total', 'Total')],
+}
+
+# Scalar report keys exported as the 'indicadores' dataset: (key, label)
+REPORT_INDICATORS = [
+    ('total_compromisos', 'Total de compromisos'),
+    ('pendientes', 'Pendientes'),
+    ('completados', 'Completados'),
+    ('percentage_pendientes', '% Pendientes'),
+    ('percentage_completados', '% Completados'),
+    ('funcionarios', 'Funcionarios'),
+    ('departamentos', 'Departamentos'),
+    ('total_reuniones', 'Total de reuniones'),
+    ('avg_compromisos_por_reunion', 'Promedio de compromisos por reunión'),
+    ('archived_compromisos', 'Compromisos archivados'),
+    ('deleted_compromisos', 'Compromisos eliminados'),
+]
+
+# Workload report page size (default and cap)
+WORKLOAD_PAGE_SIZE = 50
+WORKLOAD_MAX_PAGE_SIZE = 500
+
+
+def parse_workload_cursor(cursor):
+    """(open, overdue, id) of a workload page cursor ("open.overdue.id"); ValueError if malformed."""
+    parts = cursor.split('.')
+    if len(parts) != 3:
+        raise ValueError(f"Invalid workload cursor: {cursor}")
+    return tuple(int(part) for part in parts)
+
+
 class ReportesService:
     def __init__(self):
         self.repo = ReportesRepository()
+        self.snapshots = ReporteSnapshotRepository()
+        self.versions = DatosVersionRepository()
+        self.executor = ReportQueryExecutor()
+        # Per-sub-query timings (ms) of the last report built in this thread
+        self._local = threading.local()
+
+    @property
+    def last_timings(self):
+        return getattr(self._local, 'timings', {})
+
+    def _run(self, specs, concurrent=None):
+        """Runs (key, callable) specs through the executor and keeps the timings."""
+        results, timings = self.executor.run(specs, concurrent)
+        self._local.timings = timings
+        return results
+
+    def get_data_version(self):
+        """(version, last modified) of the tables behind the report, for ETag / Last-Modified."""
+        return self.versions.fetch_version(TABLAS_REPORTE)
+
+    def _cached(self, dept_ids, use_cache, build, data_version=None):
+        """
+        Returns the report of the dept_ids scope from the report cache, or computes it
+        with build(max_staleness) and stores it. A scope dropped by a write is rebuilt
+        from up-to-date snapshots so the invalidation is not undone by a stale one.
+        With a data_version (from get_data_version) the payload is at least as new as
+        that version: the cache drops entries older than it and builds skip stale snapshots.
+        """
+        if data_version is not None:
+            report_cache.observe_version(data_version)
+        if use_cache is None:
+            use_cache = cache_enabled()
+        if not use_cache:
+            return build(None if data_version is None else 0)
+        key = cache_key(dept_ids)
+        start = time.perf_counter()
+        cached = report_cache.get(key)
+        if cached is not None:
+            self._local.timings = {'cache': 'hit', '_total': round((time.perf_counter() - start) * 1000, 2)}
+            return dict(cached)
+        generation = report_cache.generation
+        data = build(0 if data_version is not None or report_cache.was_invalidated(key) else None)
+        report_cache.set(key, dict(data), generation)
+        return data
+
+    @staticmethod
+    def _department_tree(tree, dept_ids=None):
+        """
+        Shape of compromisos_por_jerarquia_departamento without the counts, from the
+        in-memory department tree: from the roots ordered by name, or (with dept_ids)
+        from each given department with path and level.
+        """
+        if not dept_ids:
+            nodes = [node for node in tree.nodos.values() if tree.es_raiz(node.ancestros[0])]
+            return [{'id': node.id, 'departamento': node.name, 'id_departamento_padre': node.padre}
+                    for node in sorted(nodes, key=lambda node: node.orden_nombre)]
+        pairs = [(ancestor, dept_id) for ancestor in dept_ids if ancestor in tree
+                 for dept_id in tree.descendientes(ancestor)]
+        pairs.sort(key=lambda pair: tree.orden_ruta(*pair))
+        return [{'id': dept_id, 'departamento': tree.nombre(dept_id), 'id_departamento_padre': tree.padre(dept_id),
+                 'path': tree.ruta(dept_id, ancestor),
+                 'level': tree.profundidad(dept_id) - tree.profundidad(ancestor)}
+                for ancestor, dept_id in pairs]
+
+    @staticmethod
+    def _department_paths(tree, dept_ids):
+        """
+        Shape of compromisos_por_departamento (filtered) without the counts: the given
+        departments reachable from a given root through given departments only.
+        """
+        ids = set(dept_ids)
+        rooted = [dept_id for dept_id in ids
+                  if dept_id in tree and tree.es_raiz(tree.ancestros(dept_id)[0])
+                  and ids.issuperset(tree.ancestros(dept_id))]
+        rooted.sort(key=lambda dept_id: tree.orden_ruta(tree.ancestros(dept_id)[0], dept_id))
+        return [{'id': dept_id, 'nombre': tree.nombre(dept_id), 'path': tree.ruta(dept_id)} for dept_id in rooted]
 
-    def get_report_data(self, user_id=None):
+    def _run_consolidated(self, dept_ids=None, concurrent=None, max_staleness=None):
+        """
+        Builds the report and maps it onto the keys of REPORT_QUERIES /
+        FILTERED_REPORT_QUERIES. The aggregates come, in order of precedence, from the
+        in-memory compromiso extract (REPORT_ANALYTICS, off by default), the report
+        snapshots (REPORT_SNAPSHOTS) or the consolidated queries (one pass over
+        compromiso plus a few small statements). Outside the extract, the per-day
+        series come from the daily rollups.
+        """
+        repo = self.repo
+        # Tree and paths come from the in-memory department tree
+        tree = get_arbol()
+        if analytics_enabled():
+            # The extract reloads after every write that invalidates the report cache, so
+            # max_staleness needs no handling here
+            facts = get_facts()
+            from_snapshot = False
+            specs = [
+                ('compromisos', functools.partial(facts.compromiso_aggregates, tree, dept_ids)),
+                ('personas', facts.persona_aggregates),
+                ('daily', functools.partial(facts.daily_series, tree, dept_ids)),
+            ]
+        else:
+            # Precomputed aggregates when available (refreshed first if past the staleness bound)
+            from_snapshot = self.snapshots.ensure_fresh(max_staleness)
+            aggregates = self.snapshots if from_snapshot else repo
+            specs = [
+                ('compromisos', functools.partial(aggregates.get_compromiso_aggregates, dept_ids)),
+                ('personas', aggregates.get_persona_aggregates),
+                ('daily', functools.partial(repo.get_daily_series, dept_ids)),
+            ]
+        if dept_ids:
+            specs += [
+                ('personas_mas', functools.partial(repo.get_personas_mas_by_dept_hierarchy, dept_ids,
+                                                   from_snapshot=from_snapshot)),
+                ('counters', functools.partial(repo.get_report_counters, dept_ids)),
+                ('reuniones_por_dia', functools.partial(repo.get_reuniones_por_dia_filtered_by_dept, dept_ids)),
+            ]
+        else:
+            specs += [
+                ('counters', repo.get_report_counters),
+                ('reuniones_por_dia', repo.get_reuniones_por_dia),
+            ]
+        results = self._run(specs, concurrent)
+
+        data = dict(results['compromisos'])
+        counts = data.pop('by_department_id')
+        empty = {'total': 0, 'porcentaje_completados': 0}
+        data['compromisos_por_jerarquia_departamento'] = [
+            {**dept, **counts.get(dept['id'], empty)} for dept in self._department_tree(tree, dept_ids)
+        ]
+        data.update(results['personas'])
+        data.update(results['counters'])
+        data.update(results['daily'])
+        data['reuniones_por_dia'] = results['reuniones_por_dia']
+        if dept_ids:
+            data['personas_mas'] = results['personas_mas']
+            data['compromisos_por_departamento'] = [
+                {'id': dept['id'], 'nombre': dept['nombre'], 'total': counts.get(dept['id'], empty)['total'],
+                 'path': dept['path'],
+                 'porcentaje_completados': counts.get(dept['id'], empty)['porcentaje_completados']}
+                for dept in self._department_paths(tree, dept_ids)
+            ]
+        return data
+
+    def get_report_data(self, user_id=None, concurrent=None, consolidated=None, use_cache=None, data_version=None):
         # If user_id is provided, filter by department hierarchy
+        # concurrent: None uses the REPORT_CONCURRENT setting
+        # consolidated: None uses the REPORT_CONSOLIDATED setting
+        # use_cache: None uses the REPORT_CACHE setting
+        # data_version: version from get_data_version() the payload must be at least as new as
         if user_id:
-            return self.get_filtered_report_data(user_id)
+            return self.get_filtered_report_data(user_id, concurrent, consolidated, use_cache, data_version)
         # Otherwise, return all data (for admin/director)
-        return {
-            'total_compromisos': self.repo.get_total_compromisos(),
-            'pendientes': self.repo.get_pendientes(),
-            'completados': self.repo.get_completados(),
-            'funcionarios': self.repo.get_funcionarios(),
-            'departamentos': self.repo.get_departamentos(),
-            'compromisos_por_departamento': self.repo.get_compromisos_por_departamento(),
-            'personas_mas': self.repo.get_personas_mas(),
-            'compromisos_por_dia': self.repo.get_compromisos_por_dia(),
-            'total_reuniones': self.repo.get_total_reuniones(),
-            'archived_compromisos': self.repo.get_archived_compromisos(),
-            'deleted_compromisos': self.repo.get_deleted_compromisos(),
-            'avg_compromisos_por_reunion': self.repo.get_avg_compromisos_por_reunion(),
-            'percentage_completados': self.repo.get_percentage_completados(),
-            'percentage_pendientes': self.repo.get_percentage_pendientes(),
-            'percentage_completados_por_persona': self.repo.get_percentage_completados_por_persona(),
-            'percentage_completados_por_departamento': self.repo.get_percentage_completados_por_departamento(),
-            'compromisos_por_dia_por_departamento': self.repo.get_compromisos_por_dia_por_departamento(),
-            'reuniones_por_dia': self.repo.get_reuniones_por_dia(),  # New key for meetings by day data
-            'compromisos_por_jerarquia_departamento': self.repo.get_compromisos_por_jerarquia_departamento(),  # New key for commitments by department hierarchy data
-            'user_is_filtered': False
-        }
+        if consolidated is None:
+            consolidated = consolidated_enabled()
+
+        def build(max_staleness):
+            if consolidated:
+                data = self._run_consolidated(concurrent=concurrent, max_staleness=max_staleness)
+            else:
+                data = self._run([(key, getattr(self.repo, method)) for key, method in REPORT_QUERIES], concurrent)
+            data['user_is_filtered'] = False
+            return data
+
+        return self._cached(None, use_cache, build, data_version)
     
-    def get_filtered_report_data(self, user_id):
-        # Get user's department hierarchy
-        dept_hierarchy = self.repo.get_user_department_hierarchy(user_id)
+    def get_filtered_report_data(self, user_id, concurrent=None, consolidated=None, use_cache=None, data_version=None):
+        # Get user's department hierarchy (subordinate departments from the in-memory tree)
+        tree = get_arbol()
+        dept_hierarchy = [{'id': dept_id, 'name': tree.nombre(dept_id)}
+                          for dept_id in tree.subordinados(self.repo.get_user_department_ids(user_id))]
         if not dept_hierarchy:
             # If user doesn't belong to any department, return all data
-            data = self.get_report_data()
+            data = self.get_report_data(concurrent=concurrent, consolidated=consolidated, use_cache=use_cache,
+                                        data_version=data_version)
             data['user_is_filtered'] = False
             return data
             
@@ -45,40 +282,72 @@ class ReportesService:
         dept_ids = [d['id'] for d in dept_hierarchy]
         
         # Get filtered data
-        total_compromisos = self.repo.get_total_compromisos_by_dept_hierarchy(dept_ids)
-        pendientes = self.repo.get_pendientes_by_dept_hierarchy(dept_ids)
-        completados = self.repo.get_completados_by_dept_hierarchy(dept_ids)
-        
-        # Calculate percentages
-        percentage_pendientes = (pendientes * 100.0 / total_compromisos) if total_compromisos > 0 else 0
-        percentage_completados = (completados * 100.0 / total_compromisos) if total_compromisos > 0 else 0
-        
-        # Get number of employees in the department hierarchy
-        funcionarios_by_dept = self.repo.get_funcionarios_by_dept_hierarchy(dept_ids)
-        
-        return {
-            'total_compromisos': total_compromisos,
-            'pendientes': pendientes,
-            'completados': completados,
-            'funcionarios': funcionarios_by_dept,  # Now filtered by department hierarchy
-            'departamentos': len(dept_hierarchy),
-            'compromisos_por_departamento': self.repo.get_compromisos_por_departamento_filtered(dept_ids),
-            'personas_mas': self.repo.get_personas_mas_by_dept_hierarchy(dept_ids),
-            'compromisos_por_dia': self.repo.get_compromisos_por_dia_by_dept_hierarchy(dept_ids),
-            'total_reuniones': self.repo.get_total_reuniones(),  # Could be filtered but difficult to associate meetings with departments
-            'archived_compromisos': self.repo.get_archived_compromisos(),  # Could be filtered but not necessary
-            'deleted_compromisos': self.repo.get_deleted_compromisos(),  # Could be filtered but not necessary
-            'avg_compromisos_por_reunion': self.repo.get_avg_compromisos_por_reunion(),  # Could be filtered but not necessary
-            'percentage_completados': percentage_completados,
-            'percentage_pendientes': percentage_pendientes,
-            'percentage_completados_por_persona': self.repo.get_percentage_completados_por_persona(),  # Could be filtered but not necessary
-            'percentage_completados_por_departamento': self.repo.get_percentage_completados_por_departamento(),  # Could be filtered but not necessary
-            'compromisos_por_dia_por_departamento': self.repo.get_compromisos_por_dia_por_departamento_filtered(dept_ids),
-            'reuniones_por_dia': self.repo.get_reuniones_por_dia_filtered_by_dept(dept_ids),
-            'compromisos_por_jerarquia_departamento': self.repo.get_compromisos_por_jerarquia_departamento_filtered(dept_ids),
-            'user_dept_hierarchy': dept_hierarchy,
-            'user_is_filtered': True
-        }
+        if consolidated is None:
+            consolidated = consolidated_enabled()
+
+        def build(max_staleness):
+            if consolidated:
+                data = self._run_consolidated(dept_ids, concurrent, max_staleness)
+            else:
+                specs = []
+                for key, method, by_dept in FILTERED_REPORT_QUERIES:
+                    func = getattr(self.repo, method)
+                    specs.append((key, functools.partial(func, dept_ids) if by_dept else func))
+                data = self._run(specs, concurrent)
+
+            # Calculate percentages
+            total_compromisos = data['total_compromisos']
+            data['percentage_pendientes'] = (data['pendientes'] * 100.0 / total_compromisos) if total_compromisos > 0 else 0
+            data['percentage_completados'] = (data['completados'] * 100.0 / total_compromisos) if total_compromisos > 0 else 0
+            data['departamentos'] = len(dept_hierarchy)
+            data['user_is_filtered'] = True
+            return data
+
+        # Cached per department set; the hierarchy itself is the caller's
+        data = self._cached(dept_ids, use_cache, build, data_version)
+        data['user_dept_hierarchy'] = dept_hierarchy
+        return data
+
+    def get_report_export(self, dataset, user_id=None, use_cache=None):
+        """
+        Returns (columns, rows) of one report dataset for a file export, built from the
+        same (cached) report as get_report_data. Raises ValueError for an unknown dataset.
+        """
+        if dataset not in REPORT_EXPORTS:
+            raise ValueError(f"Unknown report dataset: {dataset}")
+        data = self.get_report_data(user_id, use_cache=use_cache)
+        if dataset == 'indicadores':
+            rows = [{'indicador': label, 'valor': data.get(key)} for key, label in REPORT_INDICATORS]
+        else:
+            rows = data.get(dataset) or []
+        present = set(rows[0]) if rows else set()
+        columns = [column for column in REPORT_EXPORTS[dataset] if column[0] in present] or REPORT_EXPORTS[dataset]
+        return columns, rows
+
+    def get_workload(self, user_id=None, search_name=None, after=None, limit=None):
+        """
+        One page of the per-person workload report (open, overdue and completed
+        compromisos), for the user's department hierarchy or, without user_id or
+        departments, for everyone. after is the cursor of the previous page. Returns
+        {'personas': [...], 'siguiente': cursor of the next page or None}.
+        """
+        limit = max(1, min(limit or WORKLOAD_PAGE_SIZE, WORKLOAD_MAX_PAGE_SIZE))
+        tree = get_arbol()
+        dept_ids = tree.subordinados(self.repo.get_user_department_ids(user_id)) if user_id else []
+        # One extra row tells whether there is a next page
+        rows = self.repo.get_workload(dept_ids, search_name, parse_workload_cursor(after) if after else None,
+                                      limit + 1)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = f"{last['abiertos']}.{last['vencidos']}.{last['id']}"
+        for row in rows:
+            dept_id = row['id_departamento']
+            known = dept_id in tree
+            row['departamento'] = tree.nombre(dept_id) if known else None
+            row['dept_path'] = tree.ruta(dept_id) if known else None
+        return {'personas': rows, 'siguiente': next_cursor}
 
     def get_reuniones_por_dia_filtered(self, day=None, month=None, year=None):
         return self.repo.get_reuniones_por_dia(day, month, year)
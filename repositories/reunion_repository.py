@@ -1,11 +1,10 @@
 # /repositories/reunion_repository.py
-from database import get_db_connection
 from psycopg2.extras import RealDictCursor
+from repositories.base_repository import BaseRepository
+from repositories.departamento_tree import get_arbol
 import logging
 
-class ReunionRepository:
-    def __init__(self):
-        self.conn = get_db_connection()
+class ReunionRepository(BaseRepository):
 
     def fetch_user_info(self, user_id):
         try:
@@ -300,6 +299,22 @@ class ReunionRepository:
             self.conn.rollback()
             raise e
 
+    def fetch_compromisos_con_reunion(self, compromiso_ids):
+        """Devuelve el conjunto de ids (de entre `compromiso_ids`) asociados a alguna reunión."""
+        if not compromiso_ids:
+            return set()
+        try:
+            with self.conn.cursor() as cursor:
+                cursor.execute("""
+                    SELECT DISTINCT id_compromiso
+                    FROM reunion_compromiso
+                    WHERE id_compromiso = ANY(%s)
+                """, (list(compromiso_ids),))
+                return {row[0] for row in cursor.fetchall()}
+        except Exception as e:
+            self.conn.rollback()
+            raise e
+
     def fetch_origen_name(self, origen_id):
         try:
             with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
@@ -380,9 +395,8 @@ class ReunionRepository:
     def fetch_areas_by_departamento(self, departamento_id):
         try:
             with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                # Obtener el departamento padre (primer dígito seguido de dos ceros)
-                # Ejemplo: si departamento_id es 320, el padre sería 300
-                parent_dept_id = (departamento_id // 100) * 100
+                # Departamento padre según la jerarquía (árbol en memoria, sin consulta)
+                parent_dept_id = get_arbol().padre(departamento_id)
                 
                 # Incluir áreas del departamento actual, del departamento padre y globales
                 cursor.execute("""
@@ -403,9 +417,8 @@ class ReunionRepository:
     def fetch_origenes_by_departamento(self, departamento_id):
         try:
             with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                # Obtener el departamento padre (primer dígito seguido de dos ceros)
-                # Ejemplo: si departamento_id es 320, el padre sería 300
-                parent_dept_id = (departamento_id // 100) * 100
+                # Departamento padre según la jerarquía (árbol en memoria, sin consulta)
+                parent_dept_id = get_arbol().padre(departamento_id)
                 
                 # Incluir orígenes del departamento actual, del departamento padre y globales
                 cursor.execute("""
@@ -425,13 +438,8 @@ class ReunionRepository:
 
     def commit(self):
         try:
-            self.conn.commit()
+            super().commit()
         except Exception as e:
-            self.conn.rollback()
+            self.rollback()
             raise e
 
-    def rollback(self):
-        self.conn.rollback()
-
-    def close(self):
-        self.conn.close()
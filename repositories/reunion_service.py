@@ -1,3 +1,5 @@
+from repositories.datos_version import TABLAS_AREAS, TABLAS_ORIGENES, DatosVersionRepository
+from repositories.report_cache import invalidate_departments
 from repositories.reunion_repository import ReunionRepository
 from datetime import datetime
 
@@ -5,6 +7,7 @@ from datetime import datetime
 class ReunionService:
     def __init__(self):
         self.repo = ReunionRepository()
+        self.versions = DatosVersionRepository()
 
     def get_origen_id(self, form, request_data):
         new_origen = request_data.get('new_origen')
@@ -152,6 +155,7 @@ class ReunionService:
         )
 
         # Iterar sobre la lista de formularios de compromisos
+        departamentos = set()
         for i, compromiso_form in enumerate(form.compromisos):
             # Obtener los valores específicos de origen y área para este compromiso desde el formulario
             index = i + 1  # Los índices de los compromisos empiezan en 1
@@ -169,12 +173,15 @@ class ReunionService:
                 compromiso_area_id
             )
             self.repo.associate_reunion_compromiso(reunion_id, compromiso_id)
+            departamentos.add(int(compromiso_form.departamento.data))
 
             # Acceder a los referentes correctamente como IDs
             for referente_id in compromiso_form.referentes.data:
                 self.repo.associate_persona_compromiso(referente_id, compromiso_id)
 
         self.repo.commit()
+        # Los reportes de esos departamentos ya no son válidos
+        invalidate_departments(departamentos)
 
     # Nueva función para crear compromisos con origen y área
     def create_compromiso_con_origen_area(self, compromiso_form, origen_id, area_id):
@@ -236,6 +243,9 @@ class ReunionService:
 
     def get_reunion_by_compromiso_id(self, compromiso_id):
         return self.repo.fetch_reunion_by_compromiso_id(compromiso_id)
+
+    def get_compromisos_con_reunion(self, compromiso_ids):
+        return self.repo.fetch_compromisos_con_reunion(compromiso_ids)
     
     def get_reunion_by_id(self, reunion_id):
         return self.repo.fetch_reunion_by_id(reunion_id)
@@ -257,3 +267,15 @@ class ReunionService:
         Obtener orígenes asociados a un departamento específico
         """
         return self.repo.fetch_origenes_by_departamento(departamento_id)
+
+    def get_areas_version(self):
+        """
+        Versión (version, modificado) de los datos de las listas de áreas, para ETag.
+        """
+        return self.versions.fetch_version(TABLAS_AREAS)
+
+    def get_origenes_version(self):
+        """
+        Versión (version, modificado) de los datos de las listas de orígenes, para ETag.
+        """
+        return self.versions.fetch_version(TABLAS_ORIGENES)
@@ -0,0 +1,95 @@
+# /repositories/unit_of_work.py
+import threading
+from contextlib import contextmanager
+
+from flask import g, has_app_context
+
+from database import get_db_connection
+
+# Unidad de trabajo activa fuera de un contexto de Flask
+_local = threading.local()
+
+
+class UnitOfWork:
+    """
+    Agrupa todas las escrituras de un request en una sola transacción.
+
+    Mientras la unidad está abierta, `BaseRepository.commit()` no confirma: el
+    único COMMIT se emite al cerrar el bloque más externo. Un error en
+    cualquier punto deja la unidad marcada para rollback y no se confirma nada.
+    También recuerda qué modificaciones ya se auditaron para no insertar dos
+    veces el mismo registro en `compromiso_modificaciones`, y qué acciones
+    (invalidar cachés) deben correr sólo si el COMMIT llega a ejecutarse.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.depth = 0
+        self.rollback_only = False
+        self._auditados = set()
+        self._al_confirmar = []
+
+    def marcar_auditado(self, compromiso_id, user_id):
+        """Devuelve True la primera vez que se audita el par (compromiso, usuario)."""
+        clave = (int(compromiso_id), user_id)
+        if clave in self._auditados:
+            return False
+        self._auditados.add(clave)
+        return True
+
+    def al_confirmar(self, accion):
+        """Registra una acción a ejecutar después del COMMIT (se descarta si hay rollback)."""
+        self._al_confirmar.append(accion)
+
+    def rollback(self):
+        self.rollback_only = True
+        self.conn.rollback()
+
+    def _finalizar(self):
+        if self.rollback_only:
+            self.conn.rollback()
+        else:
+            self.conn.commit()
+            for accion in self._al_confirmar:
+                accion()
+        self._al_confirmar = []
+
+
+def current_unit_of_work():
+    """Devuelve la unidad de trabajo abierta en el request/hilo actual, o None."""
+    if has_app_context():
+        return g.get('unit_of_work')
+    return getattr(_local, 'uow', None)
+
+
+def _set_current(uow):
+    if has_app_context():
+        if uow is None:
+            g.pop('unit_of_work', None)
+        else:
+            g.unit_of_work = uow
+    else:
+        _local.uow = uow
+
+
+@contextmanager
+def unit_of_work():
+    """
+    Abre (o se une a) la unidad de trabajo del request. Los bloques anidados
+    comparten la misma transacción; sólo el externo hace COMMIT o ROLLBACK.
+    """
+    uow = current_unit_of_work()
+    if uow is None:
+        uow = UnitOfWork(get_db_connection())
+        _set_current(uow)
+    uow.depth += 1
+    try:
+        yield uow
+    except Exception:
+        uow.rollback_only = True
+        raise
+    finally:
+        uow.depth -= 1
+        if uow.depth == 0:
+            _set_current(None)
+            uow._finalizar()
@@ -5,10 +5,11 @@ from flask import Blueprint, render_template, redirect, url_for, session, reques
 from forms import LoginForm
 from database import get_db_connection, get_user_by_username
 from repositories.compromiso_service import CompromisoService
+from utils.lazy_service import LazyService
 
 auth = Blueprint('auth', __name__)
 
-compromiso_service = CompromisoService()
+compromiso_service = LazyService(CompromisoService)
 
 from functools import wraps
 from flask import redirect, url_for, session, flash
@@ -89,7 +90,6 @@ def login():
             set_alert('RUT inválido o no registrado.', 'danger')
 
         cursor.close()
-        conn.close()
 
     alert = session.pop('alert', None)  # Retrieve the alert again after setting it
     print(f"Alert retrieved at end: {alert}")  # Debugging statement
@@ -1,18 +1,43 @@
+from datetime import date
+
 from flask import Blueprint, render_template, request, flash, redirect, url_for, session, jsonify
 from repositories.compromiso_service import CompromisoService
+from exceptions.departamento_exceptions import JerarquiaCiclicaError
 from .auth_routes import not_funcionario_required
 from repositories.gestion_service import GestionService
-from repositories.reportes_service import ReportesService
+from repositories.reportes_service import ReportesService, parse_workload_cursor
+from utils.condicional import respuesta_condicional
+from utils.exportacion import respuesta_exportacion
+from utils.lazy_service import LazyService
 from routes.auth_routes import not_funcionario_required  # Asegúrate de importar el decorador
 
 director_bp = Blueprint('director', __name__)
-compromiso_service = CompromisoService()
-gestion_service = GestionService()
-reportes_service = ReportesService()
+compromiso_service = LazyService(CompromisoService)
+gestion_service = LazyService(GestionService)
+reportes_service = LazyService(ReportesService)
 
 def set_alert(message, alert_type='info'):
     session['alert'] = {'message': message, 'type': alert_type}
 
+COLUMNAS_RESUMEN = [
+    ('nombre_departamento', 'Departamento'),
+    ('total_compromisos', 'Total'),
+    ('completados', 'Completados'),
+    ('pendientes', 'Pendientes'),
+]
+
+COLUMNAS_COMPROMISOS = [
+    ('compromiso_id', 'ID'),
+    ('descripcion', 'Descripción'),
+    ('estado', 'Estado'),
+    ('prioridad', 'Prioridad'),
+    ('avance', 'Avance (%)'),
+    ('fecha_limite', 'Fecha límite'),
+    ('referentes', 'Referentes'),
+    ('comentario', 'Comentario'),
+    ('comentario_direccion', 'Comentario dirección'),
+]
+
 
 @director_bp.route('/director/resumen_compromisos', methods=['GET', 'POST'])
 @not_funcionario_required
@@ -42,6 +67,24 @@ def resumen_compromisos():
                          selected_departamento=departamento_id,
                          alert=alert)
 
+@director_bp.route('/director/resumen_compromisos/exportar', methods=['GET'])
+@not_funcionario_required
+def exportar_resumen_compromisos():
+    mes = request.args.get('month', 'Todos')
+    area_id = request.args.get('area_id')
+    year = request.args.get('year', 'Todos')
+    departamento_id = request.args.get('departamento_id', '')
+    formato = request.args.get('formato', 'csv')
+    if formato not in ('csv', 'xlsx'):
+        return jsonify({'error': 'Formato no soportado'}), 400
+
+    resumen = compromiso_service.get_resumen_compromisos(mes, int(area_id) if area_id else None, year,
+                                                         int(departamento_id) if departamento_id else '')
+    filas = list(resumen['departamentos'])
+    filas.append({'nombre_departamento': 'Total', 'total_compromisos': resumen['total_compromisos'],
+                  'completados': resumen['completados'], 'pendientes': resumen['pendientes']})
+    return respuesta_exportacion(filas, COLUMNAS_RESUMEN, 'resumen_compromisos', formato, hoja='Resumen')
+
 @director_bp.route('/director/ver_compromisos', methods=['GET', 'POST'])
 @not_funcionario_required
 def ver_compromisos_director():
@@ -76,6 +119,26 @@ def ver_compromisos_director():
 
     return render_template('director_ver_compromisos.html', compromisos=compromisos, todos_referentes=todos_referentes, alert=alert)
 
+@director_bp.route('/director/ver_compromisos/exportar', methods=['GET'])
+@not_funcionario_required
+def exportar_compromisos_director():
+    mes = request.args.get('month')
+    departamento_id = request.args.get('departamento_id')
+    year = request.args.get('year') or 'Todos'
+    formato = request.args.get('formato', 'csv')
+
+    if not mes or not departamento_id:
+        set_alert("Faltan parámetros para filtrar los compromisos.", "danger")
+        return redirect(url_for('director.resumen_compromisos'))
+    if formato not in ('csv', 'xlsx'):
+        return jsonify({'error': 'Formato no soportado'}), 400
+
+    mes_numero = 'Todos' if mes == 'Todos' else compromiso_service.convert_month_to_number(mes)
+    # Las filas se leen de un cursor del servidor mientras se escribe la respuesta
+    filas = compromiso_service.iter_compromisos_by_mes_departamento(mes_numero, departamento_id, year)
+    return respuesta_exportacion(filas, COLUMNAS_COMPROMISOS, f'compromisos_departamento_{int(departamento_id)}',
+                                 formato, hoja='Compromisos')
+
 @director_bp.route('/director/compromisos_por_mes', methods=['GET', 'POST'])
 @not_funcionario_required
 def resumen_compromisos_por_mes():
@@ -194,7 +257,11 @@ def editar_departamento(departamento_id):
         name = request.form.get('name')
         id_departamento_padre = request.form.get('id_departamento_padre')
 
-        gestion_service.update_departamento(departamento_id, name, id_departamento_padre)
+        try:
+            gestion_service.update_departamento(departamento_id, name, id_departamento_padre)
+        except JerarquiaCiclicaError as e:
+            set_alert(e.message, 'danger')
+            return redirect(url_for('director.editar_departamento', departamento_id=departamento_id))
         set_alert('Departamento actualizado con éxito.', 'success')
         return redirect(url_for('director.departamentos'))
 
@@ -208,16 +275,78 @@ def get_report_data():
         user_id = session.get('user_id')
         # Check if request wants unfiltered data (for admin/director)
         unfiltered = request.args.get('unfiltered', 'false').lower() == 'true'
-        
-        if unfiltered:
-            report_data = reportes_service.get_report_data()
-        else:
-            report_data = reportes_service.get_report_data(user_id)
-        
-        return jsonify(report_data)
+        # Optional override of REPORT_CONCURRENT (?concurrent=true|false)
+        concurrent = request.args.get('concurrent')
+        if concurrent is not None:
+            concurrent = concurrent.lower() == 'true'
+        # Optional override of REPORT_CONSOLIDATED (?consolidated=true|false)
+        consolidated = request.args.get('consolidated')
+        if consolidated is not None:
+            consolidated = consolidated.lower() == 'true'
+        # Optional bypass of the report cache (?cache=false)
+        use_cache = request.args.get('cache')
+        if use_cache is not None:
+            use_cache = use_cache.lower() == 'true'
+        # Per-sub-query timing breakdown, only when requested (?timings=true)
+        timings = request.args.get('timings', 'false').lower() == 'true'
+
+        def build(data_version=None):
+            if unfiltered:
+                report_data = reportes_service.get_report_data(concurrent=concurrent, consolidated=consolidated,
+                                                               use_cache=use_cache, data_version=data_version)
+            else:
+                report_data = reportes_service.get_report_data(user_id, concurrent=concurrent,
+                                                               consolidated=consolidated, use_cache=use_cache,
+                                                               data_version=data_version)
+            if timings:
+                report_data['timings'] = reportes_service.last_timings
+            return jsonify(report_data)
+
+        if timings:
+            return build()
+        # ETag from the data version of the report tables: an unchanged report is a 304
+        # without building it. The payload depends on the user's departments.
+        version, modificado = reportes_service.get_data_version()
+        return respuesta_condicional(version, modificado, lambda: build(version),
+                                     None if unfiltered else user_id, request.query_string)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@director_bp.route('/api/carga_trabajo', methods=['GET'])
+@not_funcionario_required
+def get_carga_trabajo():
+    # Workload per person, paginated with ?despues=<cursor> and filtered with ?buscar=
+    unfiltered = request.args.get('unfiltered', 'false').lower() == 'true'
+    user_id = None if unfiltered else session.get('user_id')
+    buscar = request.args.get('buscar', '').strip() or None
+    despues = request.args.get('despues') or None
+    limite = request.args.get('limite', type=int)
+    try:
+        if despues:
+            parse_workload_cursor(despues)
+        version, modificado = reportes_service.get_data_version()
+        # Overdue counts also change with the date
+        return respuesta_condicional(
+            version, modificado,
+            lambda: jsonify(reportes_service.get_workload(user_id, buscar, despues, limite)),
+            user_id, request.query_string, date.today())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@director_bp.route('/api/report_data/exportar', methods=['GET'])
+@not_funcionario_required
+def exportar_report_data():
+    dataset = request.args.get('dataset', 'indicadores')
+    formato = request.args.get('formato', 'csv')
+    unfiltered = request.args.get('unfiltered', 'false').lower() == 'true'
+    try:
+        columnas, filas = reportes_service.get_report_export(dataset, None if unfiltered else session.get('user_id'))
+        return respuesta_exportacion(filas, columnas, f'reporte_{dataset}', formato, hoja=dataset)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
 @director_bp.route('/director/reportes', methods=['GET'])
 @not_funcionario_required
 def reportes():
@@ -5,6 +5,10 @@ from flask_login import login_required
 from repositories.compromiso_service import CompromisoService
 from repositories.reunion_service import ReunionService
 from repositories.persona_comp_service import PersonaCompService
+from repositories.busqueda import consulta_texto
+from repositories.paginacion import PaginaCompromisos
+from utils.condicional import respuesta_condicional
+from utils.lazy_service import LazyService
 from .auth_routes import login_required
 from forms import CompromisoForm, CreateCompromisoForm
 from exceptions.compromiso_exceptions import ResponsablePrincipalError
@@ -16,9 +20,9 @@ import psycopg2  # Añadir esta importación
 from psycopg2 import extras  # También necesitamos importar extras
 
 home = Blueprint('home', __name__)
-compromiso_service = CompromisoService()
-reunion_service = ReunionService()
-persona_comp_service = PersonaCompService()
+compromiso_service = LazyService(CompromisoService)
+reunion_service = LazyService(ReunionService)
+persona_comp_service = LazyService(PersonaCompService)
 
 # Configurar extensiones permitidas para archivos
 ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'jpg', 'jpeg', 'png', 'zip'}
@@ -61,6 +65,33 @@ def home_view():
 def set_alert(message, alert_type='info'):
     session['alert'] = {'message': message, 'type': alert_type}
 
+def pagina_desde_request(descendente=False, search='', orden_por_defecto=None):
+    """
+    Página del listado pedida en la URL (orden, despues/antes y total ya contado).
+    Con búsqueda el orden por defecto es la relevancia, siempre descendente; sin
+    búsqueda no hay relevancia y se ordena por fecha límite. Un cursor u orden
+    inválido vuelve a la primera página en el orden por defecto.
+    """
+    hay_busqueda = consulta_texto(search) is not None
+    if orden_por_defecto is None:
+        orden_por_defecto = 'relevancia'
+    if orden_por_defecto == 'relevancia' and not hay_busqueda:
+        orden_por_defecto = 'fecha_limite'
+    orden = request.args.get('orden') or orden_por_defecto
+    if orden == 'relevancia' and not hay_busqueda:
+        orden = orden_por_defecto
+    try:
+        pagina = PaginaCompromisos(
+            orden=orden,
+            descendente=descendente or orden == 'relevancia',
+            despues=request.args.get('despues'),
+            antes=request.args.get('antes'),
+        )
+    except ValueError:
+        pagina = PaginaCompromisos(orden=orden_por_defecto, descendente=descendente or orden_por_defecto == 'relevancia')
+    total = request.args.get('total', type=int)
+    return pagina, total
+
 @home.route('/ver_compromisos', methods=['GET', 'POST'])
 @login_required
 def ver_compromisos():
@@ -120,18 +151,26 @@ def ver_compromisos():
     estado = request.args.get('estado', '')
     fecha_limite = request.args.get('fecha_limite', '')
 
+    direccion = request.args.get('direccion', '')
+
+    # Sólo se lee la página pedida; el total se cuenta en la primera y viaja en los enlaces
+    pagina, total = pagina_desde_request(descendente=direccion == 'desc', search=search)
     if es_director:
-        compromisos = compromiso_service.get_compromisos_by_departamento(compromiso_service.get_director_info(user_id)['id_departamento'], search, prioridad, estado, fecha_limite)
-    elif the_big_boss:
-        compromisos = compromiso_service.get_compromisos_by_user(user_id, search, prioridad, estado, fecha_limite)
+        resultado = compromiso_service.get_pagina_compromisos_by_departamento(compromiso_service.get_director_info(user_id)['id_departamento'], pagina, search, prioridad, estado, fecha_limite, total)
     else:
-        compromisos = compromiso_service.get_compromisos_by_user(user_id, search, prioridad, estado, fecha_limite)
+        resultado = compromiso_service.get_pagina_compromisos_by_user(user_id, pagina, search, prioridad, estado, fecha_limite, total)
 
     todos_referentes = compromiso_service.get_referentes()
 
+    filtros = {
+        'search': search, 'prioridad': prioridad, 'estado': estado, 'fecha_limite': fecha_limite,
+        'orden': pagina.orden, 'direccion': direccion, 'total': resultado['total'],
+    }
     return render_template(
         'ver_compromisos.html',
-        compromisos=compromisos,
+        compromisos=resultado['compromisos'],
+        pagina=resultado,
+        filtros=filtros,
         todos_referentes=todos_referentes,
         es_director=es_director,
         the_big_boss=the_big_boss,
@@ -155,16 +194,26 @@ def ver_compromisos_compartidos():
     avance = request.args.get('avance', '')
     fecha_limite = request.args.get('fecha_limite', '')
 
-    # Obtener compromisos compartidos con filtros aplicados
-    compromisos_compartidos = compromiso_service.get_compromisos_compartidos(user_id, the_big_boss or es_director, search, estado, avance, fecha_limite)
+    # Obtener la página pedida de compromisos compartidos con filtros aplicados; al buscar
+    # se ordena por relevancia salvo que se haya elegido ordenar por fecha límite
+    orden = 'relevancia' if consulta_texto(search) and not fecha_limite else 'fecha_limite'
+    pagina, total = pagina_desde_request(descendente=fecha_limite == 'desc', search=search, orden_por_defecto=orden)
+    resultado = compromiso_service.get_pagina_compromisos_compartidos(user_id, the_big_boss or es_director, pagina, search, estado, avance, total)
+    compromisos_compartidos = resultado['compromisos']
+    # Una sola consulta para saber qué compromisos tienen reunión (evita N+1)
+    con_reunion = reunion_service.get_compromisos_con_reunion([c['compromiso_id'] for c in compromisos_compartidos])
     for comp in compromisos_compartidos:
-        reunion_item = reunion_service.get_reunion_by_compromiso_id(comp['compromiso_id'])
-        comp['tiene_reunion'] = bool(reunion_item)
+        comp['tiene_reunion'] = comp['compromiso_id'] in con_reunion
         # Establecer permisos de edición y derivación
         comp['permiso_editar'] = user['nivel_jerarquico'] == 'DIRECTOR DE SERVICIO' or user['nivel_jerarquico'] == 'SUBDIRECTOR/A' or user['nivel_jerarquico'] == 'JEFE/A DE DEPARTAMENTO' or user['nivel_jerarquico'] == 'JEFE/A DE UNIDAD'
         comp['permiso_derivar'] = user['nivel_jerarquico'] == 'DIRECTOR DE SERVICIO' or user['nivel_jerarquico'] == 'SUBDIRECTOR/A' or user['nivel_jerarquico'] == 'JEFE/A DE DEPARTAMENTO' or user['nivel_jerarquico'] == 'JEFE/A DE UNIDAD'
     
-    return render_template('ver_compromisos_compartidos.html', compromisos=compromisos_compartidos, user=user, alert=alert)
+    filtros = {
+        'search': search, 'estado': estado, 'avance': avance, 'fecha_limite': fecha_limite,
+        'orden': pagina.orden, 'total': resultado['total'],
+    }
+    return render_template('ver_compromisos_compartidos.html', compromisos=compromisos_compartidos, pagina=resultado,
+                           filtros=filtros, user=user, alert=alert)
 
 @home.route('/editar_compromiso/<int:compromiso_id>', methods=['GET', 'POST'])
 @login_required
@@ -710,6 +759,19 @@ def eliminar_verificador(verificador_id, compromiso_id):
     
     return redirect(url_for('home.ver_verificadores', compromiso_id=compromiso_id))
 
+@home.route('/buscar_referentes', methods=['GET'])
+@login_required
+def buscar_referentes():
+    # Buscador de referentes de los formularios: ?q=<nombre aproximado>
+    texto = request.args.get('q', '')
+    limite = min(request.args.get('limite', 20, type=int), 100)
+    try:
+        referentes = compromiso_service.buscar_referentes(texto, limite)
+        return jsonify([{'id': id_persona, 'nombre': nombre} for id_persona, nombre in referentes])
+    except Exception as e:
+        print(f"Error en buscar_referentes: {e}")
+        return jsonify({'error': str(e)}), 500
+
 @home.route('/get_areas_by_departamento', methods=['GET'])
 @login_required
 def get_areas_by_departamento():
@@ -718,8 +780,11 @@ def get_areas_by_departamento():
         return jsonify([])
     
     try:
-        areas = compromiso_service.get_areas_by_departamento(departamento_id)
-        return jsonify(areas)
+        # Con la versión de las tablas de áreas el formulario recibe un 304 si no cambiaron
+        version, modificado = reunion_service.get_areas_version()
+        return respuesta_condicional(version, modificado,
+                                     lambda: jsonify(compromiso_service.get_areas_by_departamento(departamento_id)),
+                                     departamento_id)
     except Exception as e:
         print(f"Error en get_areas_by_departamento: {e}")
         return jsonify({'error': str(e)}), 500
@@ -732,10 +797,15 @@ def get_origenes_by_departamento():
         return jsonify([])
     
     try:
-        print(f"Obteniendo orígenes para departamento ID: {departamento_id}")
-        origenes = compromiso_service.get_origenes_by_departamento(departamento_id)
-        print(f"Orígenes obtenidos: {origenes}")
-        return jsonify(origenes)
+        version, modificado = reunion_service.get_origenes_version()
+
+        def construir():
+            print(f"Obteniendo orígenes para departamento ID: {departamento_id}")
+            origenes = compromiso_service.get_origenes_by_departamento(departamento_id)
+            print(f"Orígenes obtenidos: {origenes}")
+            return jsonify(origenes)
+
+        return respuesta_condicional(version, modificado, construir, departamento_id)
     except Exception as e:
         print(f"Error en get_origenes_by_departamento: {e}")
         return jsonify({'error': str(e)}), 500
@@ -5,6 +5,8 @@ from flask import Blueprint, render_template, redirect, url_for, flash, session,
 from .auth_routes import login_required
 from repositories.reunion_service import ReunionService
 from validators.reunion_validator import ReunionValidator
+from utils.condicional import respuesta_condicional
+from utils.lazy_service import LazyService
 from werkzeug.utils import secure_filename
 from forms import CreateMeetingForm
 import os
@@ -15,7 +17,7 @@ from .auth_routes import login_required
 import logging
 
 reunion = Blueprint('reunion', __name__)
-service = ReunionService()
+service = LazyService(ReunionService)
 
 UPLOAD_FOLDER = 'uploads/'  # Changed from 'uploads/actas/'
 ALLOWED_EXTENSIONS = {'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx', 'zip', 'ppt', 'pptx', 'xls', 'xlsx', 'pbix'}
@@ -249,8 +251,11 @@ def get_areas_by_departamento():
     if not departamento_id:
         return jsonify([])
     
-    areas = service.get_areas_by_departamento(departamento_id)
-    return jsonify(areas)
+    # Las listas cambian poco: con la versión de sus tablas el formulario recibe un 304
+    version, modificado = service.get_areas_version()
+    return respuesta_condicional(version, modificado,
+                                 lambda: jsonify(service.get_areas_by_departamento(departamento_id)),
+                                 departamento_id)
 
 @reunion.route('/get_origenes_by_departamento', methods=['GET'])
 @login_required
@@ -259,7 +264,10 @@ def get_origenes_by_departamento():
     if not departamento_id:
         return jsonify([])
     
-    origenes = service.get_origenes_by_departamento(departamento_id)
-    return jsonify(origenes)
+    # Las listas cambian poco: con la versión de sus tablas el formulario recibe un 304
+    version, modificado = service.get_origenes_version()
+    return respuesta_condicional(version, modificado,
+                                 lambda: jsonify(service.get_origenes_by_departamento(departamento_id)),
+                                 departamento_id)
 
 
@@ -0,0 +1,48 @@
+"""
+Fixtures comunes de las pruebas.
+
+Las pruebas que necesitan PostgreSQL usan la base de TEST_DATABASE_URL (p. ej.
+postgresql://postgres@/sgc?host=/tmp/pgdata) y se omiten si no está definida;
+nunca se usa la configuración por omisión de database.DB_CONFIG.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEST_DATABASE_URL = os.getenv('TEST_DATABASE_URL')
+
+
+@pytest.fixture
+def database_url():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL no está definida")
+    return TEST_DATABASE_URL
+
+
+@pytest.fixture
+def app(database_url, monkeypatch):
+    import database
+    from app import create_app
+    from config import Config
+
+    # Conexiones fuera del engine (migraciones, pool psycopg2) también a la base de pruebas
+    monkeypatch.setattr(database, 'DB_CONFIG', {'dsn': database_url})
+
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = database_url
+        # Se prueba el cálculo de los reportes, no la caché
+        REPORT_CACHE = False
+        SQL_INSTRUMENTATION = True
+
+    app = create_app(TestConfig)
+    yield app
+    database.use_engine(None)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,308 @@
+"""Migraciones versionadas del esquema (ver migraciones/__init__.py)."""
+import uuid
+
+import psycopg2
+import pytest
+
+from exceptions.database_exceptions import MigracionError
+from migraciones import cargar_migraciones, estado, migrar, sentencias
+from repositories.busqueda import (
+    condicion_persona, fijar_umbral_persona, patron_persona, similitud_persona, texto_persona,
+)
+
+
+def test_sentencias_separa_por_punto_y_coma():
+    assert sentencias("SELECT 1; SELECT 2;\nSELECT 3") == ["SELECT 1", "SELECT 2", "SELECT 3"]
+
+
+def test_sentencias_respeta_cuerpos_con_dolares():
+    funcion = (
+        "CREATE FUNCTION f() RETURNS INT AS $$\n"
+        "BEGIN\n    PERFORM 1;\n    RETURN 2;\nEND;\n"
+        "$$ LANGUAGE plpgsql"
+    )
+    etiquetada = "DO $cuerpo$ BEGIN EXECUTE 'SELECT $$;$$'; END $cuerpo$"
+    assert sentencias(f"{funcion};\n{etiquetada};\nSELECT 3;") == [funcion, etiquetada, "SELECT 3"]
+
+
+def test_sentencias_no_confunde_parametros_con_dolares():
+    sql = "PREPARE p AS SELECT $1; SELECT 2"
+    assert sentencias(sql) == ["PREPARE p AS SELECT $1", "SELECT 2"]
+
+
+def test_sentencias_ignora_punto_y_coma_en_textos_e_identificadores():
+    sql = """INSERT INTO t VALUES ('a;b', 'it''s; ok'); SELECT "col;rara" FROM t"""
+    assert sentencias(sql) == [
+        "INSERT INTO t VALUES ('a;b', 'it''s; ok')",
+        'SELECT "col;rara" FROM t',
+    ]
+
+
+def test_sentencias_ignora_punto_y_coma_en_comentarios():
+    sql = (
+        "-- primero; no es una sentencia\n"
+        "SELECT 1; -- fin; de línea\n"
+        "/* bloque;\n   de varias líneas; */ SELECT 2;"
+    )
+    assert sentencias(sql) == [
+        "-- primero; no es una sentencia\nSELECT 1",
+        "-- fin; de línea\n/* bloque;\n   de varias líneas; */ SELECT 2",
+    ]
+
+
+def test_sentencias_descarta_vacias_y_solo_comentarios():
+    assert sentencias(";;\n-- nada\n;/* tampoco */;  \n") == []
+
+
+def test_cargar_migraciones_ordena_y_detecta_sin_transaccion(tmp_path):
+    (tmp_path / "0002_indice.sql").write_text("-- sin transaccion\nCREATE INDEX CONCURRENTLY i ON t (a);\n")
+    (tmp_path / "0001_tabla.sql").write_text("CREATE TABLE t (a INT);\n")
+    (tmp_path / "notas.txt").write_text("no es una migración")
+
+    migraciones = cargar_migraciones(str(tmp_path))
+
+    assert [repr(m) for m in migraciones] == ["0001_tabla", "0002_indice"]
+    assert [m.en_transaccion for m in migraciones] == [True, False]
+
+
+def test_cargar_migraciones_rechaza_versiones_repetidas(tmp_path):
+    (tmp_path / "0001_una.sql").write_text("SELECT 1;\n")
+    (tmp_path / "0001_otra.sql").write_text("SELECT 2;\n")
+
+    with pytest.raises(MigracionError):
+        cargar_migraciones(str(tmp_path))
+
+
+def test_migraciones_del_repositorio():
+    migraciones = cargar_migraciones()
+
+    assert [int(m.version) for m in migraciones] == list(range(1, len(migraciones) + 1))
+    for migracion in migraciones:
+        # CREATE INDEX CONCURRENTLY no puede correr dentro de una transacción
+        if 'CONCURRENTLY' in migracion.sql.upper():
+            assert not migracion.en_transaccion, migracion
+
+
+@pytest.fixture
+def conexion(database_url):
+    """Conexión con un esquema propio, para no tocar schema_migraciones de la base de pruebas."""
+    esquema = f"prueba_migraciones_{uuid.uuid4().hex[:8]}"
+    conn = psycopg2.connect(database_url)
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA {esquema}")
+        cursor.execute(f"SET search_path TO {esquema}")
+    yield conn
+    conn.rollback()
+    conn.autocommit = True
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP SCHEMA {esquema} CASCADE")
+    conn.close()
+
+
+def _escribir(directorio, archivo, sql):
+    (directorio / archivo).write_text(sql, encoding='utf-8')
+
+
+def _situaciones(conn, directorio):
+    return {repr(m): situacion for m, situacion in estado(conn, cargar_migraciones(str(directorio)))}
+
+
+def test_migrar_aplica_las_pendientes_una_vez(conexion, tmp_path):
+    _escribir(tmp_path, "0001_tabla.sql", "CREATE TABLE t (a INT);\nINSERT INTO t VALUES (1);\n")
+    _escribir(tmp_path, "0002_indice.sql", "-- sin transaccion\nCREATE INDEX CONCURRENTLY IF NOT EXISTS idx_t ON t (a);\n")
+
+    assert _situaciones(conexion, tmp_path) == {"0001_tabla": "pendiente", "0002_indice": "pendiente"}
+    aplicadas = migrar(conexion, cargar_migraciones(str(tmp_path)))
+
+    assert [repr(m) for m in aplicadas] == ["0001_tabla", "0002_indice"]
+    assert _situaciones(conexion, tmp_path) == {"0001_tabla": "aplicada", "0002_indice": "aplicada"}
+    assert migrar(conexion, cargar_migraciones(str(tmp_path))) == []
+    with conexion.cursor() as cursor:
+        cursor.execute("SELECT count(*) FROM t")
+        assert cursor.fetchone() == (1,)
+
+
+def test_migracion_modificada_se_informa_y_no_se_repite(conexion, tmp_path):
+    _escribir(tmp_path, "0001_tabla.sql", "CREATE TABLE t (a INT);\n")
+    migrar(conexion, cargar_migraciones(str(tmp_path)))
+
+    # Volver a ejecutarla fallaría: la tabla ya existe
+    _escribir(tmp_path, "0001_tabla.sql", "CREATE TABLE t (a INT, b INT);\n")
+    _escribir(tmp_path, "0002_datos.sql", "INSERT INTO t (a) VALUES (1);\n")
+
+    assert _situaciones(conexion, tmp_path) == {"0001_tabla": "modificada", "0002_datos": "pendiente"}
+    aplicadas = migrar(conexion, cargar_migraciones(str(tmp_path)))
+
+    assert [repr(m) for m in aplicadas] == ["0002_datos"]
+    assert _situaciones(conexion, tmp_path) == {"0001_tabla": "modificada", "0002_datos": "aplicada"}
+
+
+def test_migracion_fallida_no_queda_registrada(conexion, tmp_path):
+    _escribir(tmp_path, "0001_tabla.sql", "CREATE TABLE t (a INT);\n")
+    _escribir(tmp_path, "0002_falla.sql", "INSERT INTO t VALUES (1);\nINSERT INTO no_existe VALUES (1);\n")
+
+    with pytest.raises(MigracionError, match="0002_falla"):
+        migrar(conexion, cargar_migraciones(str(tmp_path)))
+
+    assert _situaciones(conexion, tmp_path) == {"0001_tabla": "aplicada", "0002_falla": "pendiente"}
+    with conexion.cursor() as cursor:
+        # La transacción de la migración fallida se deshizo completa
+        cursor.execute("SELECT count(*) FROM t")
+        assert cursor.fetchone() == (0,)
+
+
+# Columnas de las tablas base que usan los triggers de las migraciones
+_TABLAS_BASE = """
+    CREATE TABLE departamento (id SERIAL PRIMARY KEY, name VARCHAR(255), id_departamento_padre INT);
+    CREATE TABLE persona (id SERIAL PRIMARY KEY, name VARCHAR(255), lastname VARCHAR(255), rut VARCHAR(20));
+    CREATE TABLE compromiso (
+        id SERIAL PRIMARY KEY, descripcion TEXT, comentario TEXT, comentario_direccion TEXT,
+        estado VARCHAR(50), fecha_creacion TIMESTAMP, id_departamento INT REFERENCES departamento (id)
+    );
+    CREATE TABLE persona_compromiso (
+        id_persona INT, id_compromiso INT REFERENCES compromiso (id), PRIMARY KEY (id_persona, id_compromiso)
+    );
+    CREATE TABLE reunion (id SERIAL PRIMARY KEY, fecha_creacion TIMESTAMP);
+"""
+
+
+def _migrar_del_repositorio(conn, *versiones):
+    """Crea las tablas base en el esquema de la prueba y le aplica esas migraciones del repositorio."""
+    with conn.cursor() as cursor:
+        cursor.execute(_TABLAS_BASE)
+    migrar(conn, [m for m in cargar_migraciones() if m.version in versiones])
+
+
+def _consultar(conn, sql):
+    with conn.cursor() as cursor:
+        cursor.execute(sql)
+        return cursor.fetchall()
+
+
+def test_jerarquia_departamentos_se_mantiene(conexion):
+    _migrar_del_repositorio(conexion, '0002')
+    jerarquia = "SELECT id_ancestro, id_descendiente, ruta FROM departamento_jerarquia ORDER BY 1, 2"
+
+    with conexion.cursor() as cursor:
+        cursor.execute("INSERT INTO departamento (id, name) VALUES (1, 'Dirección')")
+        cursor.execute("INSERT INTO departamento (id, name, id_departamento_padre) VALUES (2, 'Finanzas', 1)")
+    assert _consultar(conexion, jerarquia) == [
+        (1, 1, 'Dirección'), (1, 2, 'Dirección > Finanzas'), (2, 2, 'Finanzas'),
+    ]
+
+    with conexion.cursor() as cursor:
+        cursor.execute("UPDATE departamento SET name = 'Presupuesto' WHERE id = 2")
+    assert _consultar(conexion, jerarquia) == [
+        (1, 1, 'Dirección'), (1, 2, 'Dirección > Presupuesto'), (2, 2, 'Presupuesto'),
+    ]
+
+    with conexion.cursor() as cursor:
+        cursor.execute("DELETE FROM departamento WHERE id = 2")
+    assert _consultar(conexion, jerarquia) == [(1, 1, 'Dirección')]
+
+    with conexion.cursor() as cursor:
+        cursor.execute("TRUNCATE departamento CASCADE")
+    assert _consultar(conexion, jerarquia) == []
+
+
+def test_totales_diarios_se_vacian_con_truncate(conexion):
+    _migrar_del_repositorio(conexion, '0003')
+    totales = """
+        SELECT (SELECT COALESCE(SUM(total), 0) FROM compromiso_diario),
+               (SELECT COALESCE(SUM(total), 0) FROM reunion_diaria)
+    """
+    with conexion.cursor() as cursor:
+        cursor.execute("INSERT INTO compromiso (estado, fecha_creacion) SELECT 'Pendiente', now() FROM generate_series(1, 5)")
+        cursor.execute("INSERT INTO reunion (fecha_creacion) SELECT now() FROM generate_series(1, 3)")
+    assert _consultar(conexion, totales) == [(5, 3)]
+
+    # Como el generador de datos: vaciar y volver a cargar en una transacción
+    conexion.autocommit = False
+    with conexion.cursor() as cursor:
+        cursor.execute("TRUNCATE compromiso, reunion CASCADE")
+        cursor.execute("INSERT INTO compromiso (estado, fecha_creacion) VALUES ('Completado', now())")
+    conexion.commit()
+    assert _consultar(conexion, totales) == [(1, 0)]
+
+
+def test_snapshots_reporte_se_vacian_con_truncate(conexion):
+    _migrar_del_repositorio(conexion, '0001')
+    snapshots = """
+        SELECT (SELECT COUNT(*) FROM reporte_snapshot_departamento),
+               (SELECT COUNT(*) FROM reporte_snapshot_persona)
+    """
+    with conexion.cursor() as cursor:
+        cursor.execute("INSERT INTO reporte_snapshot_departamento VALUES (0, 2, 1, 1)")
+        cursor.execute("INSERT INTO reporte_snapshot_persona VALUES (7, 0, 2, 1, 1)")
+
+        # Sin referentes cambian los agregados por persona, no los del departamento
+        cursor.execute("TRUNCATE persona_compromiso")
+        assert _consultar(conexion, snapshots) == [(1, 0)]
+
+        cursor.execute("INSERT INTO reporte_snapshot_persona VALUES (7, 0, 2, 1, 1)")
+        cursor.execute("TRUNCATE compromiso CASCADE")
+        assert _consultar(conexion, snapshots) == [(0, 0)]
+
+
+def _pg_trgm_disponible(conn):
+    return bool(_consultar(conn, "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"))
+
+
+def test_migracion_sin_pg_trgm_explica_el_requisito(conexion):
+    if _pg_trgm_disponible(conexion):
+        pytest.skip("el servidor tiene pg_trgm")
+    _migrar_del_repositorio(conexion, '0007')
+
+    with pytest.raises(MigracionError, match="pg_trgm no está instalada") as error:
+        migrar(conexion, [m for m in cargar_migraciones() if m.version == '0009'])
+    assert "postgresql-contrib" in str(error.value)
+
+
+def _buscar_personas(conn, texto):
+    """Nombres de las personas que encuentra condicion_persona(), de la más parecida a la menos."""
+    texto = texto_persona(texto)
+    with conn.cursor() as cursor:
+        fijar_umbral_persona(cursor)
+        cursor.execute(f"""
+            SELECT p.name FROM persona p
+            WHERE {condicion_persona()}
+            ORDER BY {similitud_persona()} DESC, p.name
+        """, (patron_persona(texto), texto, texto))
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def test_busqueda_aproximada_de_personas(conexion):
+    if not _pg_trgm_disponible(conexion):
+        pytest.skip("el servidor no tiene pg_trgm")
+    with conexion.cursor() as cursor:
+        # Si la extensión ya está creada en la base, sus operadores están en public
+        cursor.execute("SELECT set_config('search_path', current_schema() || ', public', false)")
+    _migrar_del_repositorio(conexion, '0007', '0009', '0010')
+    with conexion.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO persona (name, lastname) VALUES
+                ('Ana', 'Pérez Soto'), ('Luis', 'Muñoz Rojas'), ('María', 'González'), ('Pedro', 'Díaz')
+        """)
+    # fijar_umbral_persona() vale para la transacción, como en los repositorios
+    conexion.autocommit = False
+
+    assert _buscar_personas(conexion, 'perez') == ['Ana']
+    assert _buscar_personas(conexion, 'peres') == ['Ana']
+    assert _buscar_personas(conexion, '  MUNOZ ') == ['Luis']
+    assert _buscar_personas(conexion, 'gonzales') == ['María']
+    assert _buscar_personas(conexion, 'pedro diaz') == ['Pedro']
+    assert _buscar_personas(conexion, '%') == []
+
+    # full_name es una columna generada: sigue a los cambios de nombre
+    with conexion.cursor() as cursor:
+        cursor.execute("UPDATE persona SET lastname = 'Peña' WHERE name = 'Pedro'")
+    assert _buscar_personas(conexion, 'pena')[0] == 'Pedro'
+
+    # Las dos ramas de la condición pueden usar el índice trigram
+    with conexion.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute(f"EXPLAIN SELECT id FROM persona p WHERE {condicion_persona()}", ('%ana%', 'ana'))
+        plan = '\n'.join(fila[0] for fila in cursor.fetchall())
+    assert 'Seq Scan' not in plan
+    assert 'idx_persona_full_name_trgm' in plan
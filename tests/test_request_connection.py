@@ -0,0 +1,47 @@
+"""Un request de reportes toma una sola conexión del pool (ver database.get_db_connection)."""
+import pytest
+from sqlalchemy import event
+
+import database
+from extensions import db
+
+
+@pytest.fixture
+def checkouts(app, monkeypatch):
+    """Cuenta las conexiones que se toman del pool y del engine durante la prueba."""
+    contador = {'pool': 0, 'engine': 0}
+    pool = database.get_pool()
+    getconn = pool.getconn
+
+    def contar_getconn(*args, **kwargs):
+        contador['pool'] += 1
+        return getconn(*args, **kwargs)
+
+    monkeypatch.setattr(pool, 'getconn', contar_getconn)
+
+    def contar_checkout(*args):
+        contador['engine'] += 1
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'checkout', contar_checkout)
+    yield contador
+    event.remove(engine, 'checkout', contar_checkout)
+
+
+@pytest.fixture
+def director(client):
+    with client.session_transaction() as sesion:
+        sesion['user_id'] = 1
+        sesion['user'] = {'id': 1, 'nivel_jerarquico': 'DIRECTOR DE SERVICIO'}
+    return client
+
+
+@pytest.mark.parametrize('query', ['unfiltered=true', 'unfiltered=true&consolidated=false', ''])
+def test_report_data_usa_una_conexion(director, checkouts, query):
+    respuesta = director.get(f'/api/report_data?{query}')
+
+    assert respuesta.status_code == 200, respuesta.get_data(as_text=True)
+    assert checkouts['pool'] == 1
+    # Tampoco se abren conexiones por fuera del pool de database (p. ej. con la sesión de SQLAlchemy)
+    assert checkouts['engine'] <= 1
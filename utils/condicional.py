@@ -0,0 +1,44 @@
+# /utils/condicional.py
+"""
+GET condicionales (ETag / Last-Modified) para respuestas JSON.
+
+La ruta obtiene primero la versión de los datos que usa la respuesta
+(repositories.datos_version, una consulta de una fila). Si el cliente ya tiene
+esa versión (If-None-Match, o If-Modified-Since sin ETag) se responde 304 sin
+calcular el contenido; si no, se calcula y se entrega con su ETag.
+"""
+import hashlib
+
+from flask import current_app, request
+from werkzeug.http import is_resource_modified
+
+
+def etag_version(version, *variantes):
+    """ETag de una versión de datos; `variantes` distingue respuestas de la misma versión."""
+    clave = '|'.join(str(parte) for parte in (version, *variantes))
+    return hashlib.sha1(clave.encode('utf-8')).hexdigest()[:20]
+
+
+def respuesta_condicional(version, modificado, construir, *variantes):
+    """
+    Devuelve 304 si la versión del cliente coincide con (version, variantes); si no,
+    la respuesta de construir() (cualquier valor de retorno de una vista), ambas con
+    ETag, Last-Modified y Cache-Control: private, no-cache para que el navegador
+    revalide en cada uso.
+    """
+    etag = etag_version(version, *variantes)
+    if modificado is not None:
+        # Las fechas HTTP no llevan fracciones de segundo
+        modificado = modificado.replace(microsecond=0)
+    if is_resource_modified(request.environ, etag=etag, last_modified=modificado):
+        respuesta = current_app.make_response(construir())
+        if respuesta.status_code != 200:
+            return respuesta
+    else:
+        respuesta = current_app.response_class(status=304)
+    respuesta.set_etag(etag)
+    if modificado is not None:
+        respuesta.last_modified = modificado
+    respuesta.cache_control.private = True
+    respuesta.cache_control.no_cache = True
+    return respuesta
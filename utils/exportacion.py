@@ -0,0 +1,115 @@
+# /utils/exportacion.py
+"""
+Exportación de tablas a CSV o XLSX como respuestas en streaming.
+
+Las filas (diccionarios) se consumen de un iterable a medida que se escribe la
+respuesta, de modo que un generador de `BaseRepository.iterar()` mantiene la
+memoria constante sin importar el número de filas.
+
+- CSV: la cabecera sale de inmediato y las filas se envían en bloques de
+  ~64 KB. Lleva BOM UTF-8 para que Excel reconozca los acentos.
+- XLSX: openpyxl en modo write-only escribe las filas a disco sin mantenerlas
+  en memoria; el archivo se envía al terminar, porque el formato zip necesita
+  el índice final antes de poder abrirse.
+
+Los textos que empiezan con =, +, -, @ no deben ejecutarse como fórmulas: en
+CSV se les antepone un apóstrofo y en XLSX se escriben como celdas de texto.
+"""
+import csv
+import io
+import tempfile
+from datetime import date
+
+from flask import Response, stream_with_context
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+
+FORMATOS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+_TAMANO_BLOQUE = 64 * 1024
+_INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _texto(valor):
+    if isinstance(valor, (list, tuple)):
+        return ', '.join(str(v) for v in valor if v is not None)
+    return valor
+
+
+def _celda_csv(valor):
+    valor = _texto(valor)
+    if valor is None:
+        return ''
+    if isinstance(valor, str) and valor.startswith(_INICIO_FORMULA):
+        return "'" + valor
+    return valor
+
+
+def _celda_xlsx(hoja, valor):
+    valor = _texto(valor)
+    if not isinstance(valor, str):
+        return valor
+    celda = WriteOnlyCell(hoja, ILLEGAL_CHARACTERS_RE.sub('', valor))
+    # Siempre texto, aunque empiece con '='
+    celda.data_type = 's'
+    return celda
+
+
+def _generar_csv(filas, columnas):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([titulo for _, titulo in columnas])
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+    for fila in filas:
+        writer.writerow([_celda_csv(fila.get(clave)) for clave, _ in columnas])
+        if buffer.tell() >= _TAMANO_BLOQUE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _generar_xlsx(filas, columnas, hoja):
+    libro = Workbook(write_only=True)
+    # Excel limita el nombre de la hoja a 31 caracteres
+    hoja = libro.create_sheet(title=hoja[:31])
+    hoja.append([titulo for _, titulo in columnas])
+    for fila in filas:
+        hoja.append([_celda_xlsx(hoja, fila.get(clave)) for clave, _ in columnas])
+    with tempfile.TemporaryFile() as archivo:
+        libro.save(archivo)
+        archivo.seek(0)
+        while bloque := archivo.read(_TAMANO_BLOQUE):
+            yield bloque
+
+
+def respuesta_exportacion(filas, columnas, nombre, formato='csv', hoja=None):
+    """
+    Response en streaming con `filas` (iterable de diccionarios) en el formato
+    pedido. `columnas` es una lista de (clave, título) en el orden del archivo.
+    El archivo se descarga como "<nombre>_<fecha>.<formato>".
+    Lanza ValueError si el formato no es csv ni xlsx.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de exportación no soportado: {formato}")
+    if formato == 'csv':
+        contenido = _generar_csv(filas, columnas)
+    else:
+        contenido = _generar_xlsx(filas, columnas, hoja or nombre)
+    archivo = f"{nombre}_{date.today().isoformat()}.{formato}"
+    return Response(
+        stream_with_context(contenido),
+        mimetype=FORMATOS[formato],
+        headers={
+            'Content-Disposition': f'attachment; filename="{archivo}"',
+            # Evita que un proxy (nginx) acumule la respuesta completa
+            'X-Accel-Buffering': 'no',
+        },
+    )
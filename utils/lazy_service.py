@@ -0,0 +1,48 @@
+# /utils/lazy_service.py
+import os
+import threading
+
+
+class LazyService:
+    """
+    Proxy de un servicio que se construye en el primer uso, una vez por proceso.
+
+    Los blueprints declaran sus servicios a nivel de módulo
+    (`compromiso_service = LazyService(CompromisoService)`), pero importar la
+    aplicación ya no construye nada. Si el proceso se bifurca (workers de
+    gunicorn con --preload, multiprocessing), el hijo detecta el cambio de PID y
+    construye su propia instancia en vez de reutilizar la del padre.
+    """
+
+    def __init__(self, factory, *args, **kwargs):
+        self._factory = factory
+        self._args = args
+        self._kwargs = kwargs
+        self._instance = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        pid = os.getpid()
+        if self._instance is None or self._pid != pid:
+            if self._pid is not None and self._pid != pid:
+                # Proceso hijo: el lock heredado pudo quedar tomado por un hilo del padre
+                self._lock = threading.Lock()
+            with self._lock:
+                if self._instance is None or self._pid != pid:
+                    self._instance = self._factory(*self._args, **self._kwargs)
+                    self._pid = pid
+        return self._instance
+
+    def reset(self):
+        """Descarta la instancia actual; la próxima llamada construye una nueva."""
+        with self._lock:
+            self._instance = None
+            self._pid = None
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+    def __repr__(self):
+        estado = 'construido' if self._instance is not None else 'pendiente'
+        return f'<LazyService {getattr(self._factory, "__name__", self._factory)} ({estado})>'
@@ -0,0 +1,183 @@
+# /utils/prepared_statements.py
+"""
+Caché de sentencias preparadas del lado del servidor.
+
+`execute_prepared(cursor, query, params)` reemplaza a `cursor.execute` en las
+consultas más frecuentes: la primera vez que una conexión ve una forma de
+consulta ejecuta `PREPARE`, y desde entonces sólo `EXECUTE`, con lo que
+PostgreSQL se ahorra el parseo y la planificación. La caché es por conexión
+(las sentencias preparadas viven en la sesión) y está acotada con LRU.
+
+Las sentencias preparadas no son transaccionales: sobreviven a un ROLLBACK,
+por lo que la caché sigue siendo válida mientras la conexión viva en el pool.
+PostgreSQL vuelve a planificarlas solo si cambia el esquema, salvo que cambie
+el tipo del resultado (una columna nueva en un SELECT *, p. ej. tras una
+migración): EXECUTE falla con "cached plan must not change result type". La
+sentencia se libera y se prepara de nuevo; si no había una transacción en curso
+se reintenta en el acto, y si la había el error se propaga (la transacción ya
+quedó abortada) y se prepara de nuevo en el siguiente uso.
+"""
+import hashlib
+import re
+import threading
+import weakref
+from collections import OrderedDict
+
+import psycopg2
+import psycopg2.errors
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+_PLACEHOLDER = re.compile(r'%%|%s|%\(')
+_ESPACIOS = re.compile(r'\s+')
+
+_settings = {
+    'enabled': True,
+    'max_per_connection': 64,
+}
+# Sentencia preparada cuyo plan quedó invalidado: se libera y se prepara de nuevo al usarla
+_OBSOLETA = 'obsoleta'
+# conexión -> OrderedDict(nombre -> True | False | _OBSOLETA); False = no se pudo preparar
+_caches = weakref.WeakKeyDictionary()
+_lock = threading.Lock()
+
+
+def configure(enabled=None, max_per_connection=None):
+    if enabled is not None:
+        _settings['enabled'] = bool(enabled)
+    if max_per_connection is not None:
+        _settings['max_per_connection'] = int(max_per_connection)
+
+
+def init_app(app):
+    configure(
+        app.config.get('DB_PREPARED_STATEMENTS'),
+        app.config.get('DB_PREPARED_STATEMENTS_MAX'),
+    )
+
+
+def _canonical(query):
+    """Forma canónica de la consulta (sólo para el nombre): espacios colapsados."""
+    return _ESPACIOS.sub(' ', query).strip()
+
+
+def _to_server_placeholders(query):
+    """
+    Convierte los placeholders de psycopg2 (%s) a los de PostgreSQL ($1, $2...).
+    Devuelve (consulta, número de parámetros) o (None, 0) si usa parámetros
+    con nombre, que no se preparan.
+    """
+    contador = 0
+    con_nombre = False
+
+    def reemplazo(m):
+        nonlocal contador, con_nombre
+        token = m.group(0)
+        if token == '%%':
+            return '%'
+        if token == '%(':
+            con_nombre = True
+            return token
+        contador += 1
+        return f'${contador}'
+
+    convertida = _PLACEHOLDER.sub(reemplazo, query)
+    if con_nombre:
+        return None, 0
+    return convertida, contador
+
+
+def _statement_name(canonical):
+    return 'ps_' + hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:20]
+
+
+def _cache_for(conn):
+    with _lock:
+        cache = _caches.get(conn)
+        if cache is None:
+            cache = _caches[conn] = OrderedDict()
+        return cache
+
+
+def _prepare(cursor, cache, nombre, texto):
+    """PREPARE dentro de un savepoint para no abortar la transacción si falla."""
+    conn = cursor.connection
+    en_transaccion = not conn.autocommit
+    if en_transaccion:
+        cursor.execute("SAVEPOINT prepared_stmt")
+    try:
+        cursor.execute(f"PREPARE {nombre} AS {texto}")
+    except psycopg2.Error:
+        if en_transaccion:
+            cursor.execute("ROLLBACK TO SAVEPOINT prepared_stmt")
+        # No se pudo inferir algún tipo, etc.: esta forma se ejecuta ad hoc
+        cache[nombre] = False
+        return False
+    if en_transaccion:
+        cursor.execute("RELEASE SAVEPOINT prepared_stmt")
+    cache[nombre] = True
+    while len(cache) > _settings['max_per_connection']:
+        viejo, preparado = cache.popitem(last=False)
+        if preparado:
+            cursor.execute(f"DEALLOCATE {viejo}")
+    return True
+
+
+def _execute(cursor, nombre, params):
+    if not params:
+        return cursor.execute(f"EXECUTE {nombre}")
+    return cursor.execute(f"EXECUTE {nombre} ({', '.join(['%s'] * len(params))})", params)
+
+
+def _reprepare(cursor, cache, nombre, query):
+    """Libera la sentencia obsoleta del servidor y la prepara con el esquema actual."""
+    cursor.execute(f"DEALLOCATE {nombre}")
+    del cache[nombre]
+    return _prepare(cursor, cache, nombre, _to_server_placeholders(query)[0])
+
+
+def execute_prepared(cursor, query, params=None):
+    """
+    Ejecuta `query` como sentencia preparada en la conexión del cursor.
+    Cae a `cursor.execute` si la caché está desactivada o la forma no se puede
+    preparar.
+    """
+    if not _settings['enabled']:
+        return cursor.execute(query, params)
+    canonical = _canonical(query)
+    nombre = _statement_name(canonical)
+    conn = cursor.connection
+    cache = _cache_for(conn)
+    estado = cache.get(nombre)
+    if estado is None:
+        texto, n_params = _to_server_placeholders(query)
+        if texto is None or n_params != len(params or ()):
+            cache[nombre] = False
+            return cursor.execute(query, params)
+        estado = _prepare(cursor, cache, nombre, texto)
+    elif estado == _OBSOLETA:
+        estado = _reprepare(cursor, cache, nombre, query)
+    else:
+        cache.move_to_end(nombre)
+    if not estado:
+        return cursor.execute(query, params)
+    params = tuple(params or ())
+    # Sin transacción en curso un fallo del EXECUTE no pierde trabajo previo: se puede reintentar
+    reintentable = conn.autocommit or conn.get_transaction_status() == TRANSACTION_STATUS_IDLE
+    try:
+        return _execute(cursor, nombre, params)
+    except psycopg2.errors.FeatureNotSupported:
+        # "cached plan must not change result type": el esquema cambió desde el PREPARE
+        if not reintentable:
+            cache[nombre] = _OBSOLETA
+            raise
+    if not conn.autocommit:
+        conn.rollback()
+    if not _reprepare(cursor, cache, nombre, query):
+        return cursor.execute(query, params)
+    return _execute(cursor, nombre, params)
+
+
+def forget(conn):
+    """Olvida las sentencias de una conexión (p. ej. tras DISCARD ALL)."""
+    with _lock:
+        _caches.pop(conn, None)
@@ -0,0 +1,168 @@
+# /utils/sql_instrumentation.py
+"""
+Instrumentación de SQL por request.
+
+Con SQL_INSTRUMENTATION (desactivada por omisión: sólo para desarrollo y
+pruebas) las conexiones se crean con `InstrumentedConnection`, que envuelve
+cualquier cursor (incluido RealDictCursor) para registrar, por cada sentencia:
+el texto normalizado, la forma de los parámetros, la duración y las filas
+afectadas. El resumen se expone en las cabeceras X-SQL-* de la respuesta y se
+emite un warning cuando una misma sentencia se repite más de
+SQL_N_PLUS_ONE_THRESHOLD veces en un request (patrón N+1).
+"""
+import re
+import threading
+import time
+from collections import Counter
+
+import psycopg2.extensions
+from flask import current_app, g, has_app_context, request
+
+_ESPACIOS = re.compile(r'\s+')
+# Listas de placeholders de largo variable (IN (%s, %s, ...)) cuentan como una sola forma
+_LISTA_PLACEHOLDERS = re.compile(r'%s(?:\s*,\s*%s)+')
+_MAX_LARGO_SENTENCIA = 500
+
+
+def _normalizar_sentencia(query, conn):
+    if isinstance(query, bytes):
+        query = query.decode('utf-8', 'replace')
+    elif not isinstance(query, str):
+        # psycopg2.sql.Composed / SQL
+        query = query.as_string(conn)
+    query = _ESPACIOS.sub(' ', query).strip()
+    query = _LISTA_PLACEHOLDERS.sub('%s, ...', query)
+    return query[:_MAX_LARGO_SENTENCIA]
+
+
+def _forma_parametros(params):
+    if params is None:
+        return ''
+    if isinstance(params, dict):
+        return '{' + ', '.join(f'{k}: {type(v).__name__}' for k, v in params.items()) + '}'
+    return '(' + ', '.join(type(v).__name__ for v in params) + ')'
+
+
+class SQLRecorder:
+    """Acumula las sentencias ejecutadas durante un request."""
+
+    def __init__(self):
+        self.queries = []
+        self.shapes = Counter()
+        self.total_time = 0.0
+        # Los reportes concurrentes registran desde varios hilos
+        self._lock = threading.Lock()
+
+    def record(self, statement, params_shape, duration, rowcount):
+        with self._lock:
+            self.queries.append({
+                'statement': statement,
+                'params': params_shape,
+                'duration': duration,
+                'rowcount': rowcount,
+            })
+            self.shapes[statement] += 1
+            self.total_time += duration
+
+    def repeated(self, threshold):
+        """Sentencias que se repitieron más de `threshold` veces."""
+        return [(stmt, n) for stmt, n in self.shapes.most_common() if n > threshold]
+
+    def summary(self):
+        return {
+            'queries': len(self.queries),
+            'total_time_ms': round(self.total_time * 1000, 2),
+            'distinct_statements': len(self.shapes),
+            'statements': [
+                {'statement': stmt, 'count': n}
+                for stmt, n in self.shapes.most_common()
+            ],
+        }
+
+
+def current_recorder():
+    """Devuelve el recorder del request actual, o None si no hay instrumentación."""
+    if not has_app_context():
+        return None
+    return g.get('sql_recorder')
+
+
+class InstrumentedCursorMixin:
+    """Mezcla para cualquier clase de cursor psycopg2: mide execute/executemany."""
+
+    def execute(self, query, vars=None):
+        recorder = current_recorder()
+        if recorder is None:
+            return super().execute(query, vars)
+        inicio = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            recorder.record(_normalizar_sentencia(query, self.connection), _forma_parametros(vars),
+                            time.perf_counter() - inicio, self.rowcount)
+
+    def executemany(self, query, vars_list):
+        recorder = current_recorder()
+        if recorder is None:
+            return super().executemany(query, vars_list)
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            recorder.record(_normalizar_sentencia(query, self.connection), 'executemany',
+                            time.perf_counter() - inicio, self.rowcount)
+
+
+_cursor_classes = {}
+
+
+def instrumented_cursor_class(cursor_class):
+    """Devuelve (y cachea) la subclase instrumentada de `cursor_class`."""
+    cls = _cursor_classes.get(cursor_class)
+    if cls is None:
+        cls = type('Instrumented' + cursor_class.__name__, (InstrumentedCursorMixin, cursor_class), {})
+        _cursor_classes[cursor_class] = cls
+    return cls
+
+
+class InstrumentedConnection(psycopg2.extensions.connection):
+    """Conexión psycopg2 cuyos cursores quedan instrumentados."""
+
+    def cursor(self, *args, **kwargs):
+        factory = kwargs.get('cursor_factory') or self.cursor_factory or psycopg2.extensions.cursor
+        kwargs['cursor_factory'] = instrumented_cursor_class(factory)
+        return super().cursor(*args, **kwargs)
+
+
+def _start_request():
+    g.sql_recorder = SQLRecorder()
+
+
+def _finish_request(response):
+    recorder = g.pop('sql_recorder', None)
+    if recorder is None:
+        return response
+    threshold = current_app.config.get('SQL_N_PLUS_ONE_THRESHOLD', 10)
+    repetidas = recorder.repeated(threshold)
+    for statement, n in repetidas:
+        current_app.logger.warning("Posible N+1 en %s: %d ejecuciones de: %s", request.path, n, statement)
+    response.headers['X-SQL-Queries'] = str(len(recorder.queries))
+    response.headers['X-SQL-Time-Ms'] = f'{recorder.total_time * 1000:.2f}'
+    response.headers['X-SQL-Repeated'] = str(len(repetidas))
+    current_app.logger.debug("SQL en %s: %s", request.path, recorder.summary())
+    return response
+
+
+def init_app(app):
+    """
+    Activa la instrumentación si SQL_INSTRUMENTATION está habilitado: el engine de
+    SQLAlchemy crea sus conexiones con InstrumentedConnection (por eso se llama
+    antes de db.init_app) y database.init_app hace lo mismo con sus pools.
+    """
+    if not app.config.get('SQL_INSTRUMENTATION', False):
+        return
+    opciones = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    opciones['connect_args'] = {**opciones.get('connect_args', {}), 'connection_factory': InstrumentedConnection}
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = opciones
+    app.before_request(_start_request)
+    app.after_request(_finish_request)